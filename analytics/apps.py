@@ -7,5 +7,9 @@ class ApiConfig(AppConfig):
 
 
 class AnalyticsConfig(AppConfig):
+    default = True
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
+
+    def ready(self):
+        from . import signals  # noqa: F401
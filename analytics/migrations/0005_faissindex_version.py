@@ -0,0 +1,23 @@
+# Generated by Django 4.1 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_faissindex_json_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faissindex',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='faissindex',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.1 on 2026-10-18 09:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_blobs_to_segments(apps, schema_editor):
+    FAISSIndex = apps.get_model('analytics', 'FAISSIndex')
+    FAISSSegment = apps.get_model('analytics', 'FAISSSegment')
+    for faiss_index in FAISSIndex.objects.exclude(index_data=b'').iterator(chunk_size=1):
+        data = bytes(faiss_index.index_data)
+        FAISSSegment.objects.create(index=faiss_index, index_data=data, nbytes=len(data))
+        FAISSIndex.objects.filter(pk=faiss_index.pk).update(index_data=b'')
+
+
+def move_segments_to_blobs(apps, schema_editor):
+    # Only single segment indexes can be restored without FAISS, compact the others first
+    FAISSIndex = apps.get_model('analytics', 'FAISSIndex')
+    FAISSSegment = apps.get_model('analytics', 'FAISSSegment')
+    for faiss_index in FAISSIndex.objects.all():
+        segments = list(FAISSSegment.objects.filter(index=faiss_index)[:2])
+        if len(segments) == 1:
+            FAISSIndex.objects.filter(pk=faiss_index.pk).update(index_data=bytes(segments[0].index_data))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_faissindex_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FAISSSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index_data', models.BinaryField()),
+                ('doc_count', models.PositiveIntegerField(default=0)),
+                ('nbytes', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('index', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='analytics.faissindex')),
+            ],
+        ),
+        migrations.RunPython(move_blobs_to_segments, move_segments_to_blobs),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.1 on 2026-10-18 09:25
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+import pickle
+
+
+def index_segment_texts(apps, schema_editor):
+    from django.contrib.postgres.search import SearchVector
+
+    FAISSSegment = apps.get_model('analytics', 'FAISSSegment')
+    FAISSChunk = apps.get_model('analytics', 'FAISSChunk')
+    for segment in FAISSSegment.objects.iterator(chunk_size=1):
+        _, docstore, index_to_docstore_id = pickle.loads(bytes(segment.index_data))
+        FAISSChunk.objects.bulk_create([
+            FAISSChunk(index_id=segment.index_id, segment=segment, content=docstore.search(doc_id).page_content)
+            for doc_id in index_to_docstore_id.values()
+        ], batch_size=1000)
+    FAISSChunk.objects.update(search_vector=SearchVector('content', config='english'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_faisssegment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FAISSChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+                ('index', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='analytics.faissindex')),
+                ('segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='analytics.faisssegment')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='faisschunk_search_gin')],
+            },
+        ),
+        migrations.RunPython(index_segment_texts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.1 on 2026-10-18 15:02
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def merge_duplicate_indexes(apps, schema_editor):
+    # Concurrent first uploads could create two rows for one (tenant, name), their segments are kept on the oldest
+    FAISSIndex = apps.get_model('analytics', 'FAISSIndex')
+    FAISSSegment = apps.get_model('analytics', 'FAISSSegment')
+    FAISSChunk = apps.get_model('analytics', 'FAISSChunk')
+    duplicates = (
+        FAISSIndex.objects.exclude(tenant=None).values('tenant_id', 'name')
+        .annotate(rows=Count('id')).filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        rows = FAISSIndex.objects.filter(tenant_id=duplicate['tenant_id'], name=duplicate['name']).order_by('id')
+        keep, others = rows[0], [row.pk for row in rows[1:]]
+        version = rows.aggregate(version=Max('version'))['version']
+        FAISSSegment.objects.filter(index_id__in=others).update(index=keep)
+        FAISSChunk.objects.filter(index_id__in=others).update(index=keep)
+        FAISSIndex.objects.filter(pk__in=others).delete()
+        # Caches keyed by (index, version) must not serve the pre-merge contents
+        FAISSIndex.objects.filter(pk=keep.pk).update(version=version + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0007_faisschunk'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_indexes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='faissindex',
+            constraint=models.UniqueConstraint(fields=('tenant', 'name'), name='faissindex_tenant_name_uniq'),
+        ),
+    ]
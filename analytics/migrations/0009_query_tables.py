@@ -0,0 +1,74 @@
+# Generated by Django 4.1 on 2026-10-18 18:40
+
+from django.db import migrations
+
+# Tables of analytics.plan_cache, analytics.sql_sandbox and analytics.rollup, read and written with raw SQL
+# through the admin pool. IF NOT EXISTS: deployments that ran them before this migration already have them.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0008_faissindex_tenant_name_uniq'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS sql_plan_cache (
+                    cache_key CHAR(64) PRIMARY KEY,
+                    tenant_id TEXT,
+                    schema_version CHAR(64) NOT NULL,
+                    prompt_template TEXT NOT NULL,
+                    sql_template TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    last_used_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS sql_plan_cache",
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS sql_query_log (
+                    id BIGSERIAL PRIMARY KEY,
+                    tenant_id TEXT,
+                    sql TEXT NOT NULL,
+                    plan JSONB,
+                    estimated_cost DOUBLE PRECISION,
+                    runtime_ms DOUBLE PRECISION,
+                    row_count INTEGER,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS sql_query_log",
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS daily_metrics (
+                    tenant_id TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    day DATE NOT NULL,
+                    dimension TEXT NOT NULL DEFAULT '',
+                    count BIGINT NOT NULL,
+                    amount NUMERIC(16, 2) NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (tenant_id, metric, day, dimension)
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS daily_metrics",
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS daily_metrics_built (
+                    tenant_id TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    built_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (tenant_id, metric)
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS daily_metrics_built",
+        ),
+    ]
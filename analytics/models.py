@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from tenant.models import Tenant
 
 class Customer(models.Model):
@@ -15,9 +17,32 @@ class CLTV(models.Model):
 
 class FAISSIndex(models.Model):
     name = models.CharField(max_length=100)
-    index_data = models.BinaryField()
+    index_data = models.BinaryField()  # legacy single blob, the data lives in FAISSSegment rows
     json_data = models.JSONField(null=True, blank=True)
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True)
+    version = models.PositiveIntegerField(default=1)  # bumped on every update, see helpers.faiss_registry
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['tenant', 'name'], name='faissindex_tenant_name_uniq')]
+
+class FAISSSegment(models.Model):
+    # Immutable piece of a FAISSIndex, the index's segments together are its manifest
+    index = models.ForeignKey(FAISSIndex, on_delete=models.CASCADE, related_name='segments')
+    index_data = models.BinaryField()
+    doc_count = models.PositiveIntegerField(default=0)
+    nbytes = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class FAISSChunk(models.Model):
+    # Text of every document in a FAISSSegment, searched lexically next to the vectors (helpers.hybrid_search)
+    index = models.ForeignKey(FAISSIndex, on_delete=models.CASCADE, related_name='chunks')
+    segment = models.ForeignKey(FAISSSegment, on_delete=models.CASCADE, related_name='chunks')
+    content = models.TextField()
+    search_vector = SearchVectorField(null=True)
+
+    class Meta:
+        indexes = [GinIndex(fields=['search_vector'], name='faisschunk_search_gin')]
 
 class userData(models.Model):
     name = models.CharField(max_length=50, null=True, blank=True)
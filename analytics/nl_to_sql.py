@@ -0,0 +1,168 @@
+import re
+
+from helpers import llm
+from .schema_context import schema_context
+
+SQL_MODEL = "gpt-3.5-turbo"
+
+
+_STAGE_WORDS = re.compile(r"\b(stages?|status(es)?|pipeline)\b", re.IGNORECASE)
+_MOST_WORDS = re.compile(r"\b(most|max|maximum|highest|largest|biggest|greatest)\b", re.IGNORECASE)
+_MOST_ENTITIES = re.compile(
+    r"\b(most|max|maximum|highest|largest|biggest|greatest)\s+(number\s+of\s+|count\s+of\s+|no\.?\s+of\s+)?"
+    r"(leads?|opportunit(y|ies)|deals?)\b",
+    re.IGNORECASE,
+)
+_RECENT = re.compile(r"\bmost\s+recent(ly)?\b", re.IGNORECASE)
+
+
+def classify_intent(prompt):
+    """
+    Local stand-in for the "stage with the most leads/opportunities" LLM call.
+    Returns 'stage_most' or 'other' when the wording is clear, None when the
+    LLM has to decide.
+    """
+    if not _STAGE_WORDS.search(prompt) or not _MOST_WORDS.search(prompt):
+        return 'other'
+    if _MOST_ENTITIES.search(prompt) and not _RECENT.search(prompt):
+        return 'stage_most'
+    return None
+
+
+def stage_most_sql(prompt):
+    # Determine if the prompt is specifically about leads, opportunities, or both
+    if 'lead' in prompt.lower():
+        return (
+            "SELECT stage_stage.status, COUNT(leads_lead.stage_id) as lead_count "
+            "FROM leads_lead "
+            "JOIN stage_stage ON leads_lead.stage_id = stage_stage.id "
+            "WHERE stage_stage.model_name = 'lead' AND stage_stage.tenant_id = %s "
+            "GROUP BY stage_stage.status "
+            "ORDER BY lead_count DESC "
+            "LIMIT 1;"
+        )
+    if 'opportunit' in prompt.lower():
+        return (
+            "SELECT stage_stage.status, COUNT(opportunities_opportunity.stage_id) as opportunity_count "
+            "FROM opportunities_opportunity "
+            "JOIN stage_stage ON opportunities_opportunity.stage_id = stage_stage.id "
+            "WHERE stage_stage.model_name = 'opportunity' AND stage_stage.tenant_id = %s "
+            "GROUP BY stage_stage.status "
+            "ORDER BY opportunity_count DESC "
+            "LIMIT 1;"
+        )
+    # Handle the case where both leads and opportunities are mentioned
+    return (
+        "SELECT stage_stage.status, "
+        "SUM(CASE WHEN leads_lead.stage_id IS NOT NULL THEN 1 ELSE 0 END) as lead_count, "
+        "SUM(CASE WHEN opportunities_opportunity.stage_id IS NOT NULL THEN 1 ELSE 0 END) as opportunity_count "
+        "FROM stage_stage "
+        "LEFT JOIN leads_lead ON leads_lead.stage_id = stage_stage.id "
+        "LEFT JOIN opportunities_opportunity ON opportunities_opportunity.stage_id = stage_stage.id "
+        "WHERE stage_stage.model_name IN ('lead', 'opportunity') AND stage_stage.tenant_id = %s "
+        "GROUP BY stage_stage.status "
+        "ORDER BY (lead_count + opportunity_count) DESC "
+        "LIMIT 1;"
+    )
+
+
+def table_messages(prompt_with_tenant, tables):
+    tables = " ,".join(f"'{table}'" for table in tables)
+    return [
+        {"role": "system", "content": f"Extract the table name from the user prompt out of one of the following: {tables}"},
+        {"role": "user", "content": prompt_with_tenant}
+    ]
+
+
+def stage_most_messages(prompt_with_tenant):
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are an assistant that determines whether a user prompt is asking for the stage with the most "
+                "number of leads or opportunities. If the prompt is asking for this, respond with 'yes', otherwise respond with 'no'."
+                "If the prompt only has leads or lead, respond 'no'."
+                "If the prompt is about something other than the stage with the most, return 'no' (e.g., 'leads with assigned' or 'opportunity with qualification')."
+            ),
+        },
+        {"role": "user", "content": prompt_with_tenant},
+    ]
+
+
+def sql_messages(table_name, prompt_with_tenant, tenant_id):
+    structure = schema_context.snippet(tenant_id, table_name)
+    if structure is None:
+        raise ValueError(f"Unknown table: {table_name}")
+    if 'lead' in table_name.lower() or 'opportunity' in table_name.lower():
+        # Leads and opportunities get their status from stage_stage
+        model_name = 'lead' if 'lead' in table_name.lower() else 'opportunity'
+        system = (
+            f"RESPOND ONLY WITH THE SQL QUERY without padding or anything. "
+            f"Generate a PostgreSQL query for the '{table_name}' table. The query should join with the 'stage_stage' table "
+            f"to get the status of {model_name}s. The prompt is: {prompt_with_tenant}\n\n"
+            f"Only include the following fields: all fields from '{table_name}' "
+            f"and the 'status' field from 'stage_stage'. Exclude the 'model_name' field in the result.\n\n"
+            f"Table structure (column type, -> foreign key):\n\n{structure}\n"
+            f"{schema_context.snippet(tenant_id, 'stage_stage')}"
+        )
+    else:
+        system = (
+            f"RESPOND ONLY WITH THE SQL QUERY without padding or anything. Convert the following natural language "
+            f"request to a PostgreSQL query for {table_name}:\n\n{prompt_with_tenant}\n\n"
+            f"Table structure (column type, -> foreign key):\n\n{structure}"
+        )
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt_with_tenant}
+    ]
+
+
+def prompt_to_sql(prompt, tenant_id):
+    """
+    Translate a natural language prompt into SQL, as a small DAG:
+
+        classify_intent (local) --stage_most--> fixed SQL
+              | unclear                 | other
+              v                         v
+        table name + stage check    table name
+        (concurrent LLM calls)      (one LLM call)
+              |                         |
+              +----> SQL generation with the table's schema_context snippet
+
+    The "stage with the most leads" question is answered without any LLM
+    call when its wording is clear.
+    """
+    # Modify the prompt to include tenant information
+    prompt_with_tenant = f"{prompt} (Tenant ID: {tenant_id})"
+    params = {'model': SQL_MODEL, 'tenant_id': tenant_id, 'max_tokens': 50, 'temperature': 0.7}
+
+    intent = classify_intent(prompt)
+    print(f"Local intent: {intent}")
+    if intent == 'stage_most':
+        sql_query = stage_most_sql(prompt)
+        print(f"Generated SQL query for most leads/opportunities in stage: {sql_query}")
+        return sql_query
+
+    tables = schema_context.tables(tenant_id)
+    if intent is None:
+        # Neither call depends on the other, so they run at the same time
+        table_name, is_stage_most = llm.chat_many(
+            [table_messages(prompt_with_tenant, tables), stage_most_messages(prompt_with_tenant)], **params
+        )
+        for result in (table_name, is_stage_most):
+            if isinstance(result, Exception):
+                raise result
+        print(is_stage_most)
+        if 'yes' in is_stage_most.strip().lower():
+            sql_query = stage_most_sql(prompt)
+            print(f"Generated SQL query for most leads/opportunities in stage: {sql_query}")
+            return sql_query
+    else:
+        table_name = llm.chat(table_messages(prompt_with_tenant, tables), **params)
+
+    table_name = schema_context.resolve(tenant_id, table_name)
+    print(table_name)
+
+    sql_query = llm.chat(sql_messages(table_name, prompt_with_tenant, tenant_id), **dict(params, max_tokens=1024)).strip()
+    print(f"Generated SQL query for {table_name}: {sql_query}")
+    return sql_query
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from helpers.embedding_cache import normalize_text
+from helpers.tables import get_db_connection
+from .schema_context import schema_context
+
+PLAN_CACHE_SETTINGS = {
+    'PLAN_TTL': 7 * 24 * 60 * 60,   # seconds a generated SQL plan is reused
+    'RESULT_TTL': 30,               # seconds a result set is served again, for dashboards polling the same question
+    'MEMORY_ENTRIES': 1000,         # plans kept in process
+    'RESULT_ENTRIES': 200,          # result sets kept in process
+    'MAX_RESULT_ROWS': 5000,        # bigger results are not cached
+}
+PLAN_CACHE_SETTINGS.update(getattr(settings, 'PLAN_CACHE', {}))
+
+# Created by the analytics migrations
+TABLE = "sql_plan_cache"
+
+# Literals that become parameters of a plan, dates first so their digits are not taken as numbers
+_LITERAL = r"\d{4}-\d{2}-\d{2}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|\d+(?:\.\d+)?"
+_LITERALS = re.compile(rf"\b({_LITERAL})\b")
+
+# Number/date literals of the SQL in a value position: compared to, a LIMIT/OFFSET/BETWEEN bound, a
+# date/timestamp literal or the quantity of an interval literal
+_VALUE_LITERALS = re.compile(
+    rf"(?:(?:<>|!=|<=|>=|=|<|>)\s*|\b(?:limit|offset|between|and|date|timestamp)\s+)'?(?P<value>{_LITERAL})(?![\w.])"
+    rf"|\binterval\s*'\s*(?P<interval>{_LITERAL})(?![\w.])",
+    re.IGNORECASE,
+)
+
+
+def normalize_prompt(prompt):
+    """
+    (template, literals): the prompt with case, whitespace and trailing
+    punctuation normalized and its number/date literals replaced by <p0>, <p1>...
+    """
+    text = normalize_text(prompt).casefold().rstrip(" ?!.")
+    literals = []
+
+    def replace(match):
+        literals.append(match.group(0))
+        return f"<p{len(literals) - 1}>"
+
+    return _LITERALS.sub(replace, text), literals
+
+
+def _literal_pattern(literal):
+    return re.compile(r"(?<![\w.])" + re.escape(literal) + r"(?![\w.])")
+
+
+def _value_literals(sql):
+    """{start offset: literal} of the literals of sql in a value position."""
+    found = {}
+    for match in _VALUE_LITERALS.finditer(sql):
+        group = 'value' if match.group('value') is not None else 'interval'
+        found[match.start(group)] = match.group(group)
+    return found
+
+
+def parameterize(sql, literals):
+    """
+    The SQL with every literal of the prompt replaced by a {{pN}} marker, or
+    None when the generated SQL cannot be reused for other values: a literal
+    does not appear exactly once, or not in a value position, or the SQL has
+    other number/date values, which may have been derived from the prompt's
+    ("last 2 weeks" -> interval '14 days').
+    """
+    value_literals = _value_literals(sql)
+    matched = set()
+    for literal in literals:
+        occurrences = [match.start() for match in _literal_pattern(literal).finditer(sql)]
+        if len(occurrences) != 1 or occurrences[0] not in value_literals:
+            return None
+        matched.add(occurrences[0])
+    if set(value_literals) - matched:
+        return None
+    for i, literal in enumerate(literals):
+        sql = _literal_pattern(literal).sub(f"{{{{p{i}}}}}", sql)
+    return sql
+
+
+def render(sql_template, literals):
+    # Literals only ever match _LITERALS (digits, '.', '-', '/'), so inlining them is safe
+    for i, literal in enumerate(literals):
+        sql_template = sql_template.replace(f"{{{{p{i}}}}}", literal)
+    return sql_template
+
+
+class PlanCache:
+    """
+    NL->SQL plans per tenant, so repeated dashboard questions skip prompt_to_sql.
+
+    A plan is stored only after its SQL executed successfully. When the
+    prompt's number/date literals map one to one onto literals of the SQL,
+    the plan is stored parameterized and serves the same question with other
+    values too; otherwise it is stored for the exact prompt only. Keys include
+    the tenant's schema_context version (applied migrations + dynamic
+    entities), so plans generated against an older schema are never used.
+
+    Plans live in a bounded in-process LRU in front of a Postgres table, like
+    the embedding cache. Result sets are only kept in process, for RESULT_TTL.
+    """
+
+    def __init__(self):
+        self.table = TABLE
+        self._plans = OrderedDict()    # key -> (sql_template, expires_at)
+        self._results = OrderedDict()  # (tenant, sql) -> (rows, expires_at)
+        self._lock = threading.Lock()
+        self.plan_hits = 0
+        self.plan_misses = 0
+        self.result_hits = 0
+
+    def _keys(self, tenant_id, prompt):
+        template, literals = normalize_prompt(prompt)
+        version = schema_context.version(tenant_id)
+        # Parameterized plans are found by template, exact plans by the full normalized prompt
+        keys = [
+            hashlib.sha256(json.dumps([str(tenant_id), version, 'template', template]).encode("utf-8")).hexdigest(),
+            hashlib.sha256(json.dumps([str(tenant_id), version, 'exact', template, literals]).encode("utf-8")).hexdigest(),
+        ]
+        return keys, template, literals, version
+
+    def _remember(self, key, sql_template, expires_at):
+        with self._lock:
+            self._plans[key] = (sql_template, expires_at)
+            self._plans.move_to_end(key)
+            while len(self._plans) > PLAN_CACHE_SETTINGS['MEMORY_ENTRIES']:
+                self._plans.popitem(last=False)
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._plans.get(key)
+            if entry is not None and entry[1] > now:
+                self._plans.move_to_end(key)
+                return entry[0]
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        UPDATE {self.table} SET hits = hits + 1, last_used_at = now()
+                        WHERE cache_key = %s AND created_at > now() - make_interval(secs => %s)
+                        RETURNING sql_template, extract(epoch FROM created_at)
+                        """,
+                        [key, PLAN_CACHE_SETTINGS['PLAN_TTL']]
+                    )
+                    row = cursor.fetchone()
+        except Exception as e:
+            print(f"Plan cache lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+        self._remember(key, row[0], float(row[1]) + PLAN_CACHE_SETTINGS['PLAN_TTL'])
+        return row[0]
+
+    def get_sql(self, tenant_id, prompt):
+        """The cached SQL for prompt, or None."""
+        keys, _, literals, _ = self._keys(tenant_id, prompt)
+        for key in keys:
+            sql_template = self._lookup(key)
+            if sql_template is not None:
+                with self._lock:
+                    self.plan_hits += 1
+                return render(sql_template, literals)
+        with self._lock:
+            self.plan_misses += 1
+        return None
+
+    def store(self, tenant_id, prompt, sql):
+        """Store the validated (successfully executed) SQL generated for prompt."""
+        keys, template, literals, version = self._keys(tenant_id, prompt)
+        sql_template = parameterize(sql, literals)
+        if sql_template is not None:
+            key = keys[0]
+        else:
+            key, sql_template = keys[1], sql
+        self._remember(key, sql_template, time.time() + PLAN_CACHE_SETTINGS['PLAN_TTL'])
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        INSERT INTO {self.table} (cache_key, tenant_id, schema_version, prompt_template, sql_template)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT (cache_key) DO UPDATE SET
+                            sql_template = EXCLUDED.sql_template, created_at = now(), last_used_at = now()
+                        """,
+                        [key, tenant_id, version, template, sql_template]
+                    )
+        except Exception as e:
+            print(f"Plan cache store failed: {e}")
+
+    def invalidate(self, tenant_id, prompt):
+        """Forget the plans of prompt, e.g. when its cached SQL stopped working."""
+        keys = self._keys(tenant_id, prompt)[0]
+        with self._lock:
+            for key in keys:
+                self._plans.pop(key, None)
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"DELETE FROM {self.table} WHERE cache_key = ANY(%s)", [keys])
+        except Exception as e:
+            print(f"Plan cache invalidation failed: {e}")
+
+    def get_result(self, tenant_id, sql):
+        key = (str(tenant_id), sql)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._results[key]
+                return None
+            self._results.move_to_end(key)
+            self.result_hits += 1
+            return entry[0]
+
+    def store_result(self, tenant_id, sql, rows):
+        if len(rows) > PLAN_CACHE_SETTINGS['MAX_RESULT_ROWS']:
+            return
+        with self._lock:
+            self._results[(str(tenant_id), sql)] = (rows, time.monotonic() + PLAN_CACHE_SETTINGS['RESULT_TTL'])
+            while len(self._results) > PLAN_CACHE_SETTINGS['RESULT_ENTRIES']:
+                self._results.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.plan_hits + self.plan_misses
+            return {
+                'plan_hits': self.plan_hits,
+                'plan_misses': self.plan_misses,
+                'plan_hit_ratio': round(self.plan_hits / lookups, 4) if lookups else 0.0,
+                'result_hits': self.result_hits,
+                'plans_in_memory': len(self._plans),
+                'results_in_memory': len(self._results),
+            }
+
+
+plan_cache = PlanCache()
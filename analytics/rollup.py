@@ -0,0 +1,314 @@
+import threading
+import time
+from datetime import datetime, time as day_time, timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from helpers.tables import get_db_connection
+
+ROLLUP_SETTINGS = {
+    'FLUSH_DELAY': 2,   # seconds changes are collected before their days are recomputed
+}
+ROLLUP_SETTINGS.update(getattr(settings, 'ROLLUP', {}))
+
+# Created by the analytics migrations
+TABLE = "daily_metrics"
+BUILT_TABLE = "daily_metrics_built"
+
+# metric -> model, the date the row is counted on, the dimension it is split by, the summed amount, a filter
+METRICS = {
+    'leads_by_stage': {
+        'model': 'leads.Lead', 'date': 'createdOn', 'dimension': 'stage_id', 'amount': 'opportunity_amount',
+    },
+    'pipeline_by_stage': {
+        'model': 'opportunities.Opportunity', 'date': 'createdOn', 'dimension': 'stage_id', 'amount': 'amount',
+    },
+    'closed_won': {
+        'model': 'opportunities.Opportunity', 'date': 'closedOn', 'dimension': None, 'amount': 'amount',
+        'filter': Q(stage__status='CLOSED WON'),
+    },
+    'campaign_cost': {
+        'model': 'campaign.Campaign', 'date': 'start_date', 'dimension': None, 'amount': 'actual_cost',
+    },
+    'campaign_revenue': {
+        'model': 'campaign.Campaign', 'date': 'start_date', 'dimension': None, 'amount': 'expected_revenue',
+    },
+    'interactions_by_type': {
+        'model': 'interaction.Interaction', 'date': 'interaction_datetime', 'dimension': 'interaction_type', 'amount': None,
+    },
+}
+
+
+def metrics_for(model):
+    label = model._meta.label
+    return [name for name, metric in METRICS.items() if metric['model'] == label]
+
+
+def metric_model(metric):
+    return apps.get_model(METRICS[metric]['model'])
+
+
+def _is_datetime(metric):
+    return metric_model(metric)._meta.get_field(METRICS[metric]['date']).get_internal_type() == 'DateTimeField'
+
+
+def day_of(value):
+    """The rollup day of a date or datetime, in the current time zone."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def _day_filter(metric, days):
+    date_field = METRICS[metric]['date']
+    if not _is_datetime(metric):
+        return Q(**{f'{date_field}__in': list(days)})
+    # Ranges instead of __date lookups, so an index on the column can be used
+    q = Q()
+    for day in days:
+        start = timezone.make_aware(datetime.combine(day, day_time.min))
+        q |= Q(**{f'{date_field}__gte': start, f'{date_field}__lt': start + timedelta(days=1)})
+    return q
+
+
+def compute(metric, tenant_id, days=None):
+    """[(day, dimension, count, amount)] of the tenant's rows on days (all days when None)."""
+    definition = METRICS[metric]
+    queryset = metric_model(metric).objects.filter(tenant_id=tenant_id).exclude(**{f"{definition['date']}__isnull": True})
+    if definition.get('filter') is not None:
+        queryset = queryset.filter(definition['filter'])
+    if days is not None:
+        queryset = queryset.filter(_day_filter(metric, days))
+
+    group = ['rollup_day'] + ([definition['dimension']] if definition['dimension'] else [])
+    aggregates = {'rollup_count': Count('pk')}
+    if definition['amount']:
+        aggregates['rollup_amount'] = Sum(definition['amount'])
+    rows = queryset.annotate(rollup_day=TruncDate(definition['date'])).values(*group).annotate(**aggregates).order_by()
+    return [
+        (
+            row['rollup_day'],
+            '' if not definition['dimension'] or row[definition['dimension']] is None else str(row[definition['dimension']]),
+            row['rollup_count'],
+            row.get('rollup_amount') or Decimal(0),
+        )
+        for row in rows
+    ]
+
+
+class Rollup:
+    """
+    Per-tenant daily fact table: (tenant, metric, day, dimension) -> count, amount.
+
+    A day of a metric is always recomputed from its rows as a whole, so
+    updates are idempotent and a stage change, a moved close date or a
+    delete only touches the days involved. Model signals mark days dirty
+    once their transaction commits; a background thread collects them for
+    FLUSH_DELAY seconds and recomputes each day once. The rollup_metrics
+    command recomputes the days of recently created or dated rows, for
+    writes that bypass signals (bulk_create, raw SQL), or rebuilds everything.
+
+    A (tenant, metric) is built from all its rows the first time it is read,
+    unless a rebuild recorded it in the built table already. Refreshes of
+    the same (tenant, metric) take turns on an advisory lock and read the
+    rows only once they hold it, so the last writer stores the newest data.
+
+    The table is written and read through the admin pool, like the caches.
+    """
+
+    def __init__(self):
+        self.table = TABLE
+        self.built_table = BUILT_TABLE
+        self._dirty = set()   # (metric, tenant_id, day), day None rebuilds the whole metric
+        self._built = set()   # (metric, tenant_id) known to be built
+        self._lock = threading.Lock()
+        self._flushing = False
+
+    def _is_built(self, cursor, metric, tenant_id):
+        cursor.execute(f"SELECT 1 FROM {self.built_table} WHERE tenant_id = %s AND metric = %s", [str(tenant_id), metric])
+        return cursor.fetchone() is not None
+
+    def refresh(self, metric, tenant_id, days=None, unless_built=False):
+        """
+        Recompute the tenant's metric on days, or rebuild it when days is
+        None. With unless_built, a metric built in the meantime is left as is.
+        """
+        if days is not None:
+            days = sorted(set(days))
+            if not days:
+                return 0
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f"{self.table}|{tenant_id}|{metric}"])
+                if unless_built and self._is_built(cursor, metric, tenant_id):
+                    rows = None
+                else:
+                    rows = compute(metric, tenant_id, days)
+                    if days is None:
+                        cursor.execute(f"DELETE FROM {self.table} WHERE tenant_id = %s AND metric = %s", [str(tenant_id), metric])
+                    else:
+                        cursor.execute(
+                            f"DELETE FROM {self.table} WHERE tenant_id = %s AND metric = %s AND day = ANY(%s)",
+                            [str(tenant_id), metric, days]
+                        )
+                    if rows:
+                        cursor.executemany(
+                            f"INSERT INTO {self.table} (tenant_id, metric, day, dimension, count, amount) VALUES (%s, %s, %s, %s, %s, %s)",
+                            [(str(tenant_id), metric, day, dimension, count, amount) for day, dimension, count, amount in rows]
+                        )
+                    if days is None:
+                        cursor.execute(
+                            f"""
+                            INSERT INTO {self.built_table} (tenant_id, metric) VALUES (%s, %s)
+                            ON CONFLICT (tenant_id, metric) DO UPDATE SET built_at = now()
+                            """,
+                            [str(tenant_id), metric]
+                        )
+        if days is None:
+            with self._lock:
+                self._built.add((metric, str(tenant_id)))
+        return len(rows or ())
+
+    def ensure_built(self, metric, tenant_id):
+        """Build the tenant's metric from all its rows if that never happened."""
+        key = (metric, str(tenant_id))
+        with self._lock:
+            if key in self._built:
+                return
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                built = self._is_built(cursor, metric, tenant_id)
+        if built:
+            with self._lock:
+                self._built.add(key)
+            return
+        # Until now only the days changed since the deploy were recorded
+        self.refresh(metric, tenant_id, unless_built=True)
+        with self._lock:
+            self._built.add(key)
+
+    def mark(self, metric, tenant_id, day):
+        """Schedule the tenant's metric on day (every day when None) for recomputation."""
+        if tenant_id is None:
+            return
+        with self._lock:
+            self._dirty.add((metric, str(tenant_id), day))
+            if self._flushing:
+                return
+            self._flushing = True
+        threading.Thread(target=self._flush_later, name="rollup-flush", daemon=True).start()
+
+    def _flush_later(self):
+        try:
+            while True:
+                time.sleep(ROLLUP_SETTINGS['FLUSH_DELAY'])
+                self.flush()
+                with self._lock:
+                    # Days marked while the last batch was written get another round
+                    if not self._dirty:
+                        self._flushing = False
+                        return
+        except Exception as e:
+            print(f"Rollup flush failed: {e}")
+            with self._lock:
+                self._flushing = False
+        finally:
+            connections.close_all()
+
+    def flush(self):
+        """Recompute every dirty day now. Returns the number of (metric, tenant) refreshed."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        grouped = {}  # (metric, tenant_id) -> days, None for a rebuild
+        for metric, tenant_id, day in dirty:
+            key = (metric, tenant_id)
+            if day is None:
+                grouped[key] = None
+            elif grouped.get(key, ()) is not None:
+                grouped.setdefault(key, set()).add(day)
+        for (metric, tenant_id), days in grouped.items():
+            try:
+                self.refresh(metric, tenant_id, days)
+            except Exception as e:
+                print(f"Rollup of {metric} for tenant {tenant_id} failed: {e}")
+        return len(grouped)
+
+    def delta_days(self, metric, since):
+        """
+        {tenant_id: {days}} to recompute for rows created or dated since
+        `since`, for the periodic job.
+        """
+        definition = METRICS[metric]
+        model = metric_model(metric)
+        date_field = definition['date']
+        since_value = since if _is_datetime(metric) else since.date()
+        recent = Q(**{f'{date_field}__gte': since_value})
+        if any(field.name == 'createdOn' for field in model._meta.fields):
+            # Rows created lately may still be dated (closed, held) long ago
+            recent |= Q(createdOn__gte=since)
+        pairs = (
+            model.objects.filter(recent).exclude(tenant_id=None).exclude(**{f'{date_field}__isnull': True})
+            .annotate(rollup_day=TruncDate(date_field)).values_list('tenant_id', 'rollup_day').distinct()
+        )
+        result = {}
+        for tenant_id, day in pairs:
+            result.setdefault(str(tenant_id), set()).add(day)
+        # Days that lost all their rows since are found through the rollup itself
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT tenant_id, day FROM {self.table} WHERE metric = %s AND day >= %s",
+                    [metric, day_of(since)]
+                )
+                for tenant_id, day in cursor.fetchall():
+                    result.setdefault(tenant_id, set()).add(day)
+        return result
+
+    def totals(self, tenant_id, metric, start=None, end=None, by_dimension=False):
+        """
+        Sum of count and amount of the metric over days start..end
+        (inclusive, open when None); {dimension: {...}} when by_dimension.
+        The tenant's metric is built first if it never was.
+        """
+        if tenant_id is None:
+            # Rows without a tenant are never marked or refreshed, see mark()
+            raise ValueError("Rollup totals need a tenant")
+        self.ensure_built(metric, tenant_id)
+        conditions = ["tenant_id = %s", "metric = %s"]
+        params = [str(tenant_id), metric]
+        if start is not None:
+            conditions.append("day >= %s")
+            params.append(start)
+        if end is not None:
+            conditions.append("day <= %s")
+            params.append(end)
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT dimension, coalesce(sum(count), 0)::bigint, coalesce(sum(amount), 0) FROM {self.table}
+                    WHERE {' AND '.join(conditions)}
+                    GROUP BY dimension
+                    """,
+                    params
+                )
+                rows = cursor.fetchall()
+        if by_dimension:
+            return {dimension: {'count': count, 'amount': amount} for dimension, count, amount in rows}
+        return {
+            'count': sum(row[1] for row in rows),
+            'amount': sum((row[2] for row in rows), Decimal(0)),
+        }
+
+
+rollup = Rollup()
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+
+from dynamic_entities.models import DynamicField, DynamicModel
+from helpers.tables import get_db_connection
+
+SCHEMA_CONTEXT_SETTINGS = {
+    'CHECK_INTERVAL': 60,   # seconds between checks for new migrations and dynamic model changes
+    'MAX_CHOICES': 12,      # columns with at most this many choices list them
+    'TENANTS': 500,         # tenants whose context is kept in process
+}
+SCHEMA_CONTEXT_SETTINGS.update(getattr(settings, 'SCHEMA_CONTEXT', {}))
+
+# Tables prompt_to_sql can answer questions about, besides the tenant's dynamic entities
+TABLES = [
+    'accounts_account', 'contacts_contact', 'interaction_calls', 'leads_lead', 'interaction_meetings',
+    'opportunities_opportunity', 'interaction_interaction', 'tasks_tasks', 'reminder_reminder',
+    'campaign_campaign', 'node_temps_nodetemplate', 'vendors_vendors', 'product_product', 'documents_document',
+    'dynamic_entities_dynamicmodel', 'loyalty_loyalty', 'custom_fields_customfield', 'tickets_ticket', 'stage_stage',
+    'leads_report', 'campaign_instagramcampaign', 'campaign_whatsappcampaign', 'campaign_emailcampaign',
+]
+
+# Column types of dynamic entity fields, as created by dynamic_entities.views.create_dynamic_model
+DYNAMIC_TYPES = {
+    'string': "varchar(255)",
+    'integer': "integer",
+    'text': "text",
+    'boolean': "boolean",
+    'date': "date",
+    'bigint': "bigint",
+}
+
+
+def _column(field):
+    if field.is_relation:
+        target = field.target_field
+        return f"{field.column} {field.db_type(connection)} -> {target.model._meta.db_table}.{target.column}"
+    text = f"{field.column} {field.db_type(connection)}"
+    if field.primary_key:
+        return text + " pk"
+    if field.choices and len(field.choices) <= SCHEMA_CONTEXT_SETTINGS['MAX_CHOICES']:
+        values = ", ".join(repr(str(value)) for value, _ in field.flatchoices)
+        text += f" in ({values})"
+    return text
+
+
+def model_snippet(model):
+    """One line per table: table(column type, fk_column type -> table.column, ...)."""
+    columns = ", ".join(_column(field) for field in model._meta.concrete_fields)
+    return f"{model._meta.db_table}({columns})"
+
+
+def dynamic_snippet(model_name, fields):
+    columns = ["id bigint pk"] + [f"{name} {DYNAMIC_TYPES.get(field_type, 'text')}" for name, field_type in fields]
+    return f"{DynamicModel._meta.app_label}_{model_name.lower()}({', '.join(columns)})"
+
+
+def _table_name(answer):
+    return answer.strip().strip('\'"`.').lower()
+
+
+class SchemaContext:
+    """
+    Compact, column-typed table descriptions for the NL->SQL prompts.
+
+    Installed models are described from their _meta, once per applied
+    migration set; dynamic entities from their DynamicField rows, per tenant.
+    Each tenant's context is cached with a version (last migration + its
+    dynamic fields) that is re-checked every CHECK_INTERVAL seconds, so
+    migrations and dynamic models created by other workers are picked up.
+    Changes made in this process invalidate at once through the
+    dynamic_entities signals.
+    """
+
+    def __init__(self):
+        self._static = None            # (last_migration, {table: snippet})
+        self._tenants = OrderedDict()  # tenant -> {'version', 'checked', 'tables', 'snippets'}
+        self._lock = threading.Lock()
+
+    def _static_snippets(self, last_migration):
+        static = self._static
+        if static is not None and static[0] == last_migration:
+            return static[1]
+        # Only the tables prompts may target; auth and tenant tables never reach a prompt
+        snippets = {model._meta.db_table: model_snippet(model) for model in apps.get_models() if model._meta.db_table in TABLES}
+        self._static = (last_migration, snippets)
+        return snippets
+
+    def _load(self, tenant_id):
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT max(id) FROM django_migrations")
+                last_migration = cursor.fetchone()[0]
+                # Dynamic models created before they were tied to a tenant are visible to every tenant
+                cursor.execute(
+                    f"""
+                    SELECT m.model_name, f.field_name, f.field_type
+                    FROM {DynamicModel._meta.db_table} m
+                    LEFT JOIN {DynamicField._meta.db_table} f ON f.dynamic_model_id = m.id
+                    WHERE m.tenant_id = %s OR m.tenant_id IS NULL
+                    ORDER BY m.id, f.id
+                    """,
+                    [tenant_id]
+                )
+                rows = cursor.fetchall()
+        return last_migration, rows
+
+    def _build(self, last_migration, rows):
+        static = self._static_snippets(last_migration)
+        dynamic = OrderedDict()
+        for model_name, field_name, field_type in rows:
+            fields = dynamic.setdefault(model_name, [])
+            if field_name is not None:
+                fields.append((field_name, field_type))
+
+        snippets = dict(static)
+        for model_name, fields in dynamic.items():
+            snippet = dynamic_snippet(model_name, fields)
+            snippets[snippet.split("(", 1)[0]] = snippet
+        return snippets
+
+    def _context(self, tenant_id):
+        key = str(tenant_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._tenants.get(key)
+            if entry is not None and now - entry['checked'] < SCHEMA_CONTEXT_SETTINGS['CHECK_INTERVAL']:
+                self._tenants.move_to_end(key)
+                return entry
+
+        try:
+            last_migration, rows = self._load(tenant_id)
+        except Exception as e:
+            print(f"Schema context check failed: {e}")
+            if entry is not None:
+                return entry
+            last_migration, rows = None, []
+
+        version = hashlib.sha256(json.dumps([last_migration, rows], default=str).encode("utf-8")).hexdigest()
+        if entry is None or entry['version'] != version:
+            snippets = self._build(last_migration, rows)
+            entry = {'version': version, 'snippets': snippets, 'tables': list(snippets)}
+        entry['checked'] = now
+
+        with self._lock:
+            self._tenants[key] = entry
+            self._tenants.move_to_end(key)
+            while len(self._tenants) > SCHEMA_CONTEXT_SETTINGS['TENANTS']:
+                self._tenants.popitem(last=False)
+        return entry
+
+    def version(self, tenant_id):
+        """Changes whenever the schema the tenant's prompts are built from changes."""
+        return self._context(tenant_id)['version']
+
+    def tables(self, tenant_id):
+        return self._context(tenant_id)['tables']
+
+    def snippet(self, tenant_id, table_name):
+        """
+        The description of table_name, or None when it is neither in TABLES
+        nor one of the tenant's dynamic entities. The model may answer with
+        more than the bare table name, so the longest known table name
+        contained in the answer is used as well.
+        """
+        snippets = self._context(tenant_id)['snippets']
+        table_name = _table_name(table_name)
+        if table_name in snippets:
+            return snippets[table_name]
+        matches = [table for table in snippets if table in table_name]
+        if matches:
+            return snippets[max(matches, key=len)]
+        return None
+
+    def resolve(self, tenant_id, table_name):
+        """The known table named in the model's answer, or the cleaned up answer."""
+        snippet = self.snippet(tenant_id, table_name)
+        return snippet.split("(", 1)[0] if snippet else _table_name(table_name)
+
+    def invalidate(self, tenant_id=None):
+        """Rebuild the context of tenant_id (all tenants when None) on next use."""
+        with self._lock:
+            if tenant_id is None:
+                self._tenants.clear()
+            else:
+                self._tenants.pop(str(tenant_id), None)
+
+
+schema_context = SchemaContext()
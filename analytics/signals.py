@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from campaign.models import Campaign
+from interaction.models import Interaction
+from leads.models import Lead
+from opportunities.models import Opportunity
+from stage.models import Stage
+from helpers.model_changes import after_commit, previous, track_previous
+from .rollup import METRICS, day_of, metrics_for, rollup
+
+ROLLUP_MODELS = (Lead, Opportunity, Campaign, Interaction)
+
+
+def _rollup_days(model, values):
+    return {(metric, day_of(values.get(METRICS[metric]['date']))) for metric in metrics_for(model)}
+
+
+def _values(instance):
+    return {field: getattr(instance, field) for field in {METRICS[metric]['date'] for metric in metrics_for(type(instance))}}
+
+
+def rollup_post_save(sender, instance, **kwargs):
+    # The days a row counted on before the save, e.g. an earlier close date, are recomputed as well
+    before = previous(instance)
+    marks = {(instance.tenant_id, metric, day) for metric, day in _rollup_days(sender, _values(instance))}
+    if before is not None:
+        marks |= {(before['tenant_id'], metric, day) for metric, day in _rollup_days(sender, before)}
+    for tenant_id, metric, day in marks:
+        if day is not None:
+            # A flush on another connection before the commit would recompute the day without the change
+            after_commit(rollup.mark, metric, tenant_id, day)
+
+
+def rollup_post_delete(sender, instance, **kwargs):
+    for metric, day in _rollup_days(sender, _values(instance)):
+        if day is not None:
+            after_commit(rollup.mark, metric, instance.tenant_id, day)
+
+
+for model in ROLLUP_MODELS:
+    track_previous(model, 'tenant_id', *{METRICS[metric]['date'] for metric in metrics_for(model)})
+    post_save.connect(rollup_post_save, sender=model, dispatch_uid=f'rollup_post_save_{model._meta.label}')
+    post_delete.connect(rollup_post_delete, sender=model, dispatch_uid=f'rollup_post_delete_{model._meta.label}')
+
+
+@receiver(post_save, sender=Stage)
+@receiver(post_delete, sender=Stage)
+def stage_changed(sender, instance, **kwargs):
+    # Renaming a stage to or from CLOSED WON changes which opportunities count as won
+    if instance.model_name.lower() == 'opportunity':
+        after_commit(rollup.mark, 'closed_won', instance.tenant_id, None)
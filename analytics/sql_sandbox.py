@@ -0,0 +1,155 @@
+import json
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from psycopg2.extras import Json
+
+from helpers.tables import get_db_connection
+
+SQL_SANDBOX_SETTINGS = {
+    'STATEMENT_TIMEOUT_MS': 5000,   # per statement, tenants may get their own in TENANT_STATEMENT_TIMEOUTS_MS
+    'TENANT_STATEMENT_TIMEOUTS_MS': {},
+    'MAX_COST': 1000000,            # EXPLAIN total cost above which a query is not run
+    'MAX_ROWS': 5000,               # rows returned, the rest of the result is not fetched
+    'FETCH_SIZE': 500,              # rows per round trip of the server-side cursor
+}
+SQL_SANDBOX_SETTINGS.update(getattr(settings, 'SQL_SANDBOX', {}))
+
+# Created by the analytics migrations
+LOG_TABLE = "sql_query_log"
+
+_READ_STATEMENT = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+
+
+class QueryRejected(ValueError):
+    """The generated SQL was not run, or was cancelled, by the sandbox."""
+
+
+def statement_timeout(tenant_id):
+    timeouts = SQL_SANDBOX_SETTINGS['TENANT_STATEMENT_TIMEOUTS_MS']
+    return int(timeouts.get(str(tenant_id), SQL_SANDBOX_SETTINGS['STATEMENT_TIMEOUT_MS']))
+
+
+def check_statement(sql):
+    """The single SELECT statement in sql, without its trailing semicolon."""
+    sql = sql.strip().rstrip(";").strip()
+    # A second statement could end the read-only transaction (COMMIT; ...)
+    if ";" in sql:
+        raise QueryRejected("Only a single SQL statement can be executed")
+    if not _READ_STATEMENT.match(sql):
+        raise QueryRejected("Only SELECT queries can be executed")
+    return sql
+
+
+class SQLSandbox:
+    """
+    Runs generated SQL on the tenant's connection:
+
+    - in a READ ONLY transaction, with a per-tenant statement_timeout,
+    - only when the EXPLAIN cost estimate is at most MAX_COST,
+    - through a server-side cursor that stops fetching after MAX_ROWS rows.
+
+    The plan, runtime and outcome of every query are written to LOG_TABLE
+    through the admin pool, like the caches, so failures to log never fail
+    the query.
+    """
+
+    def __init__(self):
+        self.log_table = LOG_TABLE
+        self._lock = threading.Lock()
+        self.counts = {'ok': 0, 'truncated': 0, 'rejected': 0, 'timeout': 0, 'error': 0}
+        self.runtime_ms = 0.0
+
+    def _record(self, tenant_id, sql, status, plan=None, cost=None, runtime_ms=None, row_count=None, error=None):
+        with self._lock:
+            self.counts[status] += 1
+            self.runtime_ms += runtime_ms or 0.0
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        INSERT INTO {self.log_table}
+                            (tenant_id, sql, plan, estimated_cost, runtime_ms, row_count, status, error)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        [tenant_id, sql, Json(plan) if plan is not None else None, cost, runtime_ms, row_count, status, error]
+                    )
+        except Exception as e:
+            print(f"SQL query log failed: {e}")
+
+    def run(self, sql, tenant_id):
+        """
+        Returns (rows, truncated); rows are dicts. Raises QueryRejected for
+        queries that are not a single SELECT, cost too much or time out.
+        """
+        try:
+            sql = check_statement(sql)
+        except QueryRejected as e:
+            self._record(tenant_id, sql, 'rejected', error=str(e))
+            raise
+        # The tenant id is bound to the placeholder of queries that filter by it
+        params = [tenant_id] if "%s" in sql else None
+        max_rows = SQL_SANDBOX_SETTINGS['MAX_ROWS']
+        plan = cost = None
+        started = time.monotonic()
+
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION READ ONLY")
+                    cursor.execute("SELECT set_config('statement_timeout', %s, true)", [str(statement_timeout(tenant_id))])
+                    cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                    plan = cursor.fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    cost = plan[0]['Plan']['Total Cost']
+                if cost > SQL_SANDBOX_SETTINGS['MAX_COST']:
+                    raise QueryRejected(
+                        f"Query is too expensive to run (estimated cost {cost:.0f}, limit {SQL_SANDBOX_SETTINGS['MAX_COST']})"
+                    )
+
+                # Named cursor: rows are streamed, the ones past max_rows are never sent
+                with connection.chunked_cursor() as cursor:
+                    cursor.execute(sql, params)
+                    rows = []
+                    while len(rows) <= max_rows:
+                        batch = cursor.fetchmany(SQL_SANDBOX_SETTINGS['FETCH_SIZE'])
+                        if not batch:
+                            break
+                        rows.extend(batch)
+                    columns = [col[0] for col in cursor.description]
+        except QueryRejected as e:
+            self._record(tenant_id, sql, 'rejected', plan=plan, cost=cost, error=str(e))
+            raise
+        except OperationalError as e:
+            runtime_ms = (time.monotonic() - started) * 1000
+            if 'statement timeout' in str(e):
+                self._record(tenant_id, sql, 'timeout', plan=plan, cost=cost, runtime_ms=runtime_ms, error=str(e))
+                raise QueryRejected(f"Query took longer than {statement_timeout(tenant_id)} ms") from e
+            self._record(tenant_id, sql, 'error', plan=plan, cost=cost, runtime_ms=runtime_ms, error=str(e))
+            raise
+        except Exception as e:
+            self._record(tenant_id, sql, 'error', plan=plan, cost=cost,
+                         runtime_ms=(time.monotonic() - started) * 1000, error=str(e))
+            raise
+
+        truncated = len(rows) > max_rows
+        rows = rows[:max_rows]
+        self._record(tenant_id, sql, 'truncated' if truncated else 'ok', plan=plan, cost=cost,
+                     runtime_ms=(time.monotonic() - started) * 1000, row_count=len(rows))
+        return [dict(zip(columns, row)) for row in rows], truncated
+
+    def stats(self):
+        with self._lock:
+            executed = self.counts['ok'] + self.counts['truncated'] + self.counts['timeout'] + self.counts['error']
+            return dict(
+                self.counts,
+                avg_runtime_ms=round(self.runtime_ms / executed, 3) if executed else 0.0,
+            )
+
+
+sql_sandbox = SQLSandbox()
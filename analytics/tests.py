@@ -1,3 +1,75 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .plan_cache import normalize_prompt, parameterize, render
+
+
+class NormalizePromptTests(SimpleTestCase):
+
+    def test_case_whitespace_and_trailing_punctuation(self):
+        self.assertEqual(normalize_prompt("  Show   ALL leads?! "), normalize_prompt("show all leads"))
+
+    def test_literals_become_placeholders(self):
+        template, literals = normalize_prompt("Top 5 opportunities over 1000.50")
+        self.assertEqual(template, "top <p0> opportunities over <p1>")
+        self.assertEqual(literals, ['5', '1000.50'])
+
+    def test_dates_are_one_literal(self):
+        template, literals = normalize_prompt("leads created between 2024-01-01 and 31/12/2024")
+        self.assertEqual(template, "leads created between <p0> and <p1>")
+        self.assertEqual(literals, ['2024-01-01', '31/12/2024'])
+
+    def test_same_template_for_other_values(self):
+        self.assertEqual(normalize_prompt("top 5 leads")[0], normalize_prompt("top 10 leads")[0])
+
+
+class ParameterizeTests(SimpleTestCase):
+
+    def test_comparison_and_limit(self):
+        literals = normalize_prompt("top 5 opportunities over 1000")[1]
+        sql = "SELECT * FROM opportunities_opportunity WHERE amount > 1000 ORDER BY amount DESC LIMIT 5"
+        template = parameterize(sql, literals)
+        self.assertEqual(
+            template, "SELECT * FROM opportunities_opportunity WHERE amount > {{p1}} ORDER BY amount DESC LIMIT {{p0}}"
+        )
+        self.assertEqual(render(template, ['3', '250']), sql.replace('1000', '250').replace('LIMIT 5', 'LIMIT 3'))
+
+    def test_quoted_date_and_interval(self):
+        self.assertEqual(
+            parameterize("SELECT count(*) FROM leads_lead WHERE \"createdOn\" >= '2024-01-01'", ['2024-01-01']),
+            "SELECT count(*) FROM leads_lead WHERE \"createdOn\" >= '{{p0}}'",
+        )
+        self.assertEqual(
+            parameterize("SELECT * FROM leads_lead WHERE \"createdOn\" > now() - interval '30 days'", ['30']),
+            "SELECT * FROM leads_lead WHERE \"createdOn\" > now() - interval '{{p0}} days'",
+        )
+
+    def test_between_bounds(self):
+        self.assertEqual(
+            parameterize("SELECT * FROM o WHERE amount BETWEEN 10 AND 20", ['10', '20']),
+            "SELECT * FROM o WHERE amount BETWEEN {{p0}} AND {{p1}}",
+        )
+
+    def test_literal_collision_with_derived_value(self):
+        # "2 weeks" became 14 days, the 2 of the SQL is an unrelated stage id
+        sql = "SELECT * FROM leads_lead WHERE \"createdOn\" > now() - interval '14 days' AND stage_id = 2"
+        self.assertIsNone(parameterize(sql, normalize_prompt("leads from the last 2 weeks")[1]))
+
+    def test_literal_appearing_twice(self):
+        self.assertIsNone(parameterize("SELECT * FROM o WHERE amount > 5 AND probability > 5", ['5', '5']))
+        self.assertIsNone(parameterize("SELECT * FROM o WHERE amount > 5 AND probability > 5", ['5']))
+
+    def test_literal_outside_value_position(self):
+        self.assertIsNone(parameterize("SELECT round(amount, 2) FROM o", ['2']))
+
+    def test_literal_missing_from_sql(self):
+        self.assertIsNone(parameterize("SELECT * FROM o WHERE amount > 100", ['7']))
+
+    def test_other_values_prevent_template(self):
+        self.assertIsNone(parameterize("SELECT count(*) FROM leads_lead LIMIT 100", []))
+
+    def test_no_literals(self):
+        sql = "SELECT count(*) FROM leads_lead"
+        self.assertEqual(parameterize(sql, []), sql)
+
+    def test_literal_inside_longer_number_is_not_matched(self):
+        self.assertIsNone(parameterize("SELECT * FROM o WHERE amount > 1500", ['15']))
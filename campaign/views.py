@@ -7,10 +7,10 @@ from rest_framework.permissions import AllowAny
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Sum
 from .models import InstagramCampaign, WhatsAppCampaign, EmailCampaign, CallCampaign
 from .serializers import EmailCampaignSerializer, WhatsAppCampaignSerializer, InstagramCampaignSerializer, CallCampaignSerializer
 from rest_framework import status
+from analytics.rollup import rollup
 class CampaignViewSet(ListCreateAPIView):
     queryset = Campaign.objects.all()
     serializer_class = CampaignSerializer
@@ -60,9 +60,14 @@ class CampaignStatsAPIView(APIView):  # Add this new view
     permission_classes = (AllowAny,)  # Adjust permissions as needed
 
     def get(self, request):
-        total_campaigns = Campaign.objects.count()
-        total_revenue = Campaign.objects.aggregate(Sum('expected_revenue'))['expected_revenue__sum'] or 0
-        total_actual_cost = Campaign.objects.aggregate(Sum('actual_cost'))['actual_cost__sum'] or 0
+        tenant_id = request.headers.get('X-Tenant-Id')
+        if not tenant_id:
+            return Response({'error': 'Tenant ID is required in headers'}, status=status.HTTP_400_BAD_REQUEST)
+        # Read from the daily rollup instead of aggregating every campaign
+        cost = rollup.totals(tenant_id, 'campaign_cost')
+        total_campaigns = cost['count']
+        total_revenue = rollup.totals(tenant_id, 'campaign_revenue')['amount']
+        total_actual_cost = cost['amount']
 
         return Response({
             'total_campaigns': total_campaigns,
@@ -1,6 +1,5 @@
 from communication.models import Conversation
-from openai import OpenAI
-import os
+from helpers import llm
 def generate_reply_from_conversation(conversation_id):
     try:
         # Retrieve the conversation object and message
@@ -10,11 +9,8 @@ def generate_reply_from_conversation(conversation_id):
         # Prepare the GPT prompt
         gpt_prompt = f"The user sent the following message: '{message}'. Please generate a human-like reply email responding appropriately to this message."
 
-        # Initialize OpenAI client
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
         # Generate a response from GPT
-        response = client.chat.completions.create(
+        gpt_reply = llm.chat(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that generates natural and engaging communication prompts."},
@@ -26,9 +22,6 @@ def generate_reply_from_conversation(conversation_id):
             temperature=0.7,
         )
 
-        # Extract the generated reply
-        gpt_reply = response.choices[0].message.content
-
         return gpt_reply
 
     except Conversation.DoesNotExist:
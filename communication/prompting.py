@@ -2,8 +2,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from .models import SentimentAnalysis, Conversation
-import os
-from openai import OpenAI
+from helpers import llm
 from topicmodelling.models import TopicModelling
 
 
@@ -79,9 +78,7 @@ def generate_personalized_prompt(conversation_id, channel):
     # Prepare GPT prompt
     gpt_prompt = prepare_gpt_prompt(sentiment_score, channel, topics)
     
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-    response = client.chat.completions.create(
+    response = llm.chat(
         model="gpt-3.5-turbo",
         messages=[  
             {"role": "system", "content": "You are a helpful assistant that generates natural and engaging communication prompts."},
@@ -93,7 +90,7 @@ def generate_personalized_prompt(conversation_id, channel):
         temperature=0.7,
     )
     
-    return response.choices[0].message.content.strip()
+    return response.strip()
 
 # API View to handle prompt generation requests
 class GeneratePromptView(APIView):
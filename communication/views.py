@@ -70,11 +70,10 @@ class GroupMessagesView(generics.GenericAPIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-import os
 import json
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
-from openai import OpenAI
+from helpers import llm
 from .models import Conversation, SentimentAnalysis
 
 from django.http import JsonResponse, HttpResponseBadRequest
@@ -83,9 +82,6 @@ from django.shortcuts import get_object_or_404
 from communication.models import Conversation
 from communication.models import SentimentAnalysis
 # Define the OpenAI sentiment analysis function
-# Set up your OpenAI API key
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
 def analyze_sentiment(text):
     """Analyze sentiment of the given text using OpenAI GPT."""
     try:
@@ -96,6 +92,7 @@ def analyze_sentiment(text):
         # Split the text into chunks if it's longer than chunk_size
         text_chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
 
+        sentiment_prompts = []
         for chunk in text_chunks:
             # Define the prompt for sentiment analysis
             sentiment_prompt = f"""
@@ -121,15 +118,17 @@ def analyze_sentiment(text):
                 "dominant_emotion": "emotion"
             }}
             """
+            sentiment_prompts.append([{"role": "user", "content": sentiment_prompt}])
 
-            # Call the OpenAI API for sentiment analysis
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": sentiment_prompt}]
-            )
+        # Call the OpenAI API for sentiment analysis, all chunks at once
+        responses = llm.chat_many(sentiment_prompts, model="gpt-4")
+
+        for response in responses:
+            if isinstance(response, Exception):
+                raise response
 
             # Parse the response
-            raw_response_content = response.choices[0].message.content.strip()
+            raw_response_content = response.strip()
             print("Raw Response from OpenAI:", raw_response_content)
 
             # Check for "No sentiment detected" response
@@ -174,38 +174,34 @@ def export_data_for_custom_field(request):
         df = create_subfile(uploaded_file, columns_text, merge_columns)
         print("DATAFRAM CREATED: " ,df.columns)
         
-        # Open database connection
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        for column in df.columns:
-            try:
-                object_id = 167
-                custom_field_name = column  # Use the column title as the custom field name
-                print("Creating custom field: ", column)
+        # Borrow a pooled database connection, returned when the block exits
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            for column in df.columns:
+                try:
+                    object_id = 167
+                    custom_field_name = column  # Use the column title as the custom field name
+                    print("Creating custom field: ", column)
                 
-                # Define the parameterized query
-                query = """
-                INSERT INTO custom_fields_customfield (model_name, custom_field, value, field_type, tenant_id, content_type_id, object_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s);
-                """
-                data=[]
-
-                for value in df[column]:
-                    data.append((model_name, custom_field_name, value, field_type, tenant_id, content_type_id, object_id))
-                    object_id += 1  
-
-
-                # Execute queries in batch
-                cursor.executemany(query, data)
-                conn.commit()
-                print(f"Data for column '{column}' inserted successfully.")
+                    # Define the parameterized query
+                    query = """
+                    INSERT INTO custom_fields_customfield (model_name, custom_field, value, field_type, tenant_id, content_type_id, object_id)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s);
+                    """
+                    data=[]
+
+                    for value in df[column]:
+                        data.append((model_name, custom_field_name, value, field_type, tenant_id, content_type_id, object_id))
+                        object_id += 1  
+
+
+                    # Execute queries in batch
+                    cursor.executemany(query, data)
+                    conn.commit()
+                    print(f"Data for column '{column}' inserted successfully.")
                 
-            except Exception as error:
-                return HttpResponse(f"Error processing column '{column}': {error}")
-        
-        cursor.close()
-        conn.close()
+                except Exception as error:
+                    return HttpResponse(f"Error processing column '{column}': {error}")
+
         return JsonResponse({"message": "data successfully uploaded"}, status = 200)
     except Exception as e:
         return HttpResponse(f"Unexpected error: {e}")
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DynamicEntitiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dynamic_entities'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from analytics.schema_context import schema_context
+from .models import DynamicModel, DynamicField
+
+
+@receiver(post_save, sender=DynamicModel)
+@receiver(post_delete, sender=DynamicModel)
+def dynamic_model_changed(sender, instance, **kwargs):
+    # Models without a tenant are visible to every tenant, invalidate(None) rebuilds them all
+    schema_context.invalidate(instance.tenant_id)
+
+
+@receiver(post_save, sender=DynamicField)
+@receiver(post_delete, sender=DynamicField)
+def dynamic_field_changed(sender, instance, **kwargs):
+    # The model row may already be gone when fields are deleted with it
+    schema_context.invalidate()
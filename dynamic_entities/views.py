@@ -137,7 +137,7 @@ def create_dynamic_model(model_name, fields,tenant_id ,user=None):
 
         # Create dynamic model record
         try:
-            dynamic_model = DynamicModel.objects.create(model_name=model_name, created_by=default_user)
+            dynamic_model = DynamicModel.objects.create(model_name=model_name, created_by=default_user, tenant=tenant.first())
         except Exception as e:
             print("error creating dynmicn:", e)
             return {'success': False, 'message': f'Error creating DynamicModel record: {str(e)}'}
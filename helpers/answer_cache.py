@@ -0,0 +1,139 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from psycopg2.extras import Json
+
+from .embedding_cache import normalize_text
+from .tables import get_db_connection
+
+ANSWER_CACHE_SETTINGS = {
+    'TTL': 24 * 60 * 60,     # seconds an answer is served, uploads expire it earlier through the index version
+    'MEMORY_ENTRIES': 2000,
+    'PURGE_EVERY': 500,      # expired rows are deleted every this many writes
+}
+ANSWER_CACHE_SETTINGS.update(getattr(settings, 'ANSWER_CACHE', {}))
+
+# Created by the simplecrm migrations
+TABLE = "answer_cache"
+
+
+def normalize_question(text):
+    """Questions differing only in case, spacing or trailing punctuation share cache entries."""
+    return normalize_text(text).casefold().rstrip(" ?!.")
+
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Query results keyed by cache_key(), with the time it took to compute them.
+
+    Like the embedding cache, a bounded in-memory LRU sits in front of a
+    Postgres table shared by all workers, and failures of the table only
+    count as misses. Entries are never updated: keys include the index
+    version, so an upload makes the old entries unreachable and TTL removes them.
+    """
+
+    def __init__(self, memory_entries=None, ttl=None):
+        self.table = TABLE
+        self.memory_entries = memory_entries or ANSWER_CACHE_SETTINGS['MEMORY_ENTRIES']
+        self.ttl = ttl or ANSWER_CACHE_SETTINGS['TTL']
+        self._memory = OrderedDict()  # key -> (payload, compute_seconds, expires_at)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.lookups = 0
+        self.answer_hits = 0
+        self.retrieval_hits = 0
+        self.seconds_saved = 0.0
+
+    def _remember(self, key, payload, compute_seconds, expires_at):
+        with self._lock:
+            self._memory[key] = (payload, compute_seconds, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns (payload, compute_seconds) or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._memory.move_to_end(key)
+                    return entry[0], entry[1]
+                del self._memory[key]
+
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        SELECT payload, compute_seconds, extract(epoch FROM created_at) FROM {self.table}
+                        WHERE cache_key = %s AND created_at > now() - make_interval(secs => %s)
+                        """,
+                        [key, self.ttl]
+                    )
+                    row = cursor.fetchone()
+        except Exception as e:
+            print(f"Answer cache lookup failed: {e}")
+            return None
+        if row is None:
+            return None
+        payload, compute_seconds, created_at = row
+        self._remember(key, payload, compute_seconds, float(created_at) + self.ttl)
+        return payload, compute_seconds
+
+    def set(self, key, payload, compute_seconds):
+        self._remember(key, payload, compute_seconds, time.time() + self.ttl)
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % ANSWER_CACHE_SETTINGS['PURGE_EVERY'] == 0
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        INSERT INTO {self.table} (cache_key, payload, compute_seconds) VALUES (%s, %s, %s)
+                        ON CONFLICT (cache_key) DO NOTHING
+                        """,
+                        [key, Json(payload), compute_seconds]
+                    )
+                    if purge:
+                        cursor.execute(
+                            f"DELETE FROM {self.table} WHERE created_at < now() - make_interval(secs => %s)",
+                            [self.ttl]
+                        )
+        except Exception as e:
+            print(f"Answer cache store failed: {e}")
+
+    def record(self, hit=None, seconds_saved=0.0):
+        """Count one query; hit is 'answer', 'retrieval' or None for a miss."""
+        with self._lock:
+            self.lookups += 1
+            if hit == 'answer':
+                self.answer_hits += 1
+            elif hit == 'retrieval':
+                self.retrieval_hits += 1
+            self.seconds_saved += seconds_saved
+
+    def stats(self):
+        with self._lock:
+            return {
+                'lookups': self.lookups,
+                'answer_hits': self.answer_hits,
+                'retrieval_hits': self.retrieval_hits,
+                'hit_ratio': round(self.answer_hits / self.lookups, 4) if self.lookups else 0.0,
+                'retrieval_hit_ratio': round(self.retrieval_hits / self.lookups, 4) if self.lookups else 0.0,
+                'seconds_saved': round(self.seconds_saved, 3),
+                'memory_entries': len(self._memory),
+            }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,170 @@
+import csv
+import io
+import math
+import time
+import uuid
+
+import psycopg2
+
+NULL_MARKER = '\\N'
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_REJECTS = 100
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _to_copy_value(value):
+    if value is None:
+        return NULL_MARKER
+    if isinstance(value, float):
+        if math.isnan(value):
+            return NULL_MARKER
+        if value.is_integer():
+            # pandas turns integer columns with gaps into floats, "3.0"::bigint would fail
+            return str(int(value))
+    return str(value)
+
+
+class CopyLoader:
+    """
+    Bulk loads rows into `table_name` with COPY FROM STDIN.
+
+    Each chunk is copied into an all-text staging table and moved into the
+    target with one INSERT ... SELECT that casts to the target column types.
+    If that insert fails, the chunk is bisected so the good rows still go in
+    and only the offending rows end up in the rejects report.
+
+    constants: columns with the same value for every row, e.g. {'tenant_id': tenant_id}
+    """
+
+    def __init__(self, conn, table_name, columns, constants=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.conn = conn
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.constants = dict(constants or {})
+        self.chunk_size = chunk_size
+        self.staging_table = f"_copy_stage_{uuid.uuid4().hex[:12]}"
+
+        self.rows_loaded = 0
+        self.rows_rejected = 0
+        self.rejects = []
+        self._next_row = 0
+        self._started = time.monotonic()
+        self._cursor = conn.cursor()
+        self._column_types = self._get_column_types()
+        self._create_staging_table()
+
+    def _get_column_types(self):
+        # Types without modifiers: an explicit ::varchar(n) cast would silently truncate,
+        # the assignment into the target column still enforces the length.
+        self._cursor.execute(
+            """
+            SELECT attname, format_type(atttypid, NULL)
+            FROM pg_attribute
+            WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+            """,
+            [_quote(self.table_name)]
+        )
+        return dict(self._cursor.fetchall())
+
+    def _create_staging_table(self):
+        column_definitions = ', '.join(f'{_quote(column)} TEXT' for column in self.columns)
+        self._cursor.execute(f"CREATE TEMP TABLE {self.staging_table} (_row BIGINT, {column_definitions})")
+        self.conn.commit()
+
+        # This statement takes parameters, so '%' in identifiers has to be escaped
+        def identifier(name):
+            return _quote(name).replace('%', '%%')
+
+        target_columns = ', '.join(identifier(c) for c in self.columns + list(self.constants))
+        select_list = ', '.join(
+            [f'{identifier(c)}::{self._column_types.get(c, "text")}' for c in self.columns]
+            + ['%s' for _ in self.constants]
+        )
+        self._insert_sql = f"""
+            INSERT INTO {identifier(self.table_name)} ({target_columns})
+            SELECT {select_list} FROM {self.staging_table}
+            WHERE _row BETWEEN %s AND %s
+        """
+
+    def load(self, rows):
+        """Load an iterable of row sequences (in self.columns order), chunk by chunk."""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self._load_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._load_chunk(chunk)
+
+    def _load_chunk(self, chunk):
+        first_row = self._next_row
+        last_row = first_row + len(chunk) - 1
+        self._next_row = last_row + 1
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for offset, row in enumerate(chunk):
+            writer.writerow([first_row + offset] + [_to_copy_value(value) for value in row])
+        buffer.seek(0)
+
+        self._cursor.execute(f"TRUNCATE {self.staging_table}")
+        self._cursor.copy_expert(
+            f"COPY {self.staging_table} FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')", buffer
+        )
+        self._insert_range(first_row, last_row, chunk)
+        self.conn.commit()
+
+    def _insert_range(self, low, high, chunk):
+        self._cursor.execute("SAVEPOINT copy_chunk")
+        try:
+            self._cursor.execute(self._insert_sql, list(self.constants.values()) + [low, high])
+            inserted = self._cursor.rowcount
+            self._cursor.execute("RELEASE SAVEPOINT copy_chunk")
+            self.rows_loaded += inserted
+        except psycopg2.Error as e:
+            self._cursor.execute("ROLLBACK TO SAVEPOINT copy_chunk")
+            if low == high:
+                self._reject(low, e, chunk)
+                return
+            middle = (low + high) // 2
+            self._insert_range(low, middle, chunk)
+            self._insert_range(middle + 1, high, chunk)
+
+    def _reject(self, row_number, error, chunk):
+        self.rows_rejected += 1
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            values = chunk[row_number - (self._next_row - len(chunk))]
+            self.rejects.append({
+                'row': row_number,
+                'error': (error.pgerror or str(error)).strip().splitlines()[0],
+                'values': [None if _to_copy_value(v) == NULL_MARKER else str(v) for v in values],
+            })
+
+    def abort(self):
+        """Roll back the current chunk and drop the staging table after an error."""
+        try:
+            self.conn.rollback()
+            self._cursor.execute(f"DROP TABLE IF EXISTS {self.staging_table}")
+            self.conn.commit()
+        finally:
+            self._cursor.close()
+
+    def finish(self):
+        """Drop the staging table and return the load report."""
+        try:
+            self._cursor.execute(f"DROP TABLE IF EXISTS {self.staging_table}")
+            self.conn.commit()
+        finally:
+            self._cursor.close()
+        elapsed = time.monotonic() - self._started
+        return {
+            'rows_inserted': self.rows_loaded,
+            'rows_rejected': self.rows_rejected,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_sec': round(self.rows_loaded / elapsed, 1) if elapsed > 0 else None,
+            'rejects': self.rejects,
+        }
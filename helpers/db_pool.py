@@ -0,0 +1,242 @@
+import threading
+import time
+
+import psycopg2
+import psycopg2.pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from django.conf import settings
+
+
+def _db_params():
+    """libpq parameters of the default (admin) database from settings, e.g. sslmode from OPTIONS."""
+    database = settings.DATABASES['default']
+    params = {
+        'dbname': database.get('NAME'),
+        'user': database.get('USER'),
+        'password': database.get('PASSWORD'),
+        'host': database.get('HOST'),
+        'port': database.get('PORT'),
+    }
+    params.update(database.get('OPTIONS', {}))
+    return {key: value for key, value in params.items() if value not in (None, '')}
+
+
+DB_PARAMS = _db_params()
+
+POOL_SETTINGS = {
+    'MIN_SIZE': 2,           # idle connections kept open however long they are unused
+    'MAX_SIZE': 20,
+    'MAX_IDLE': 300,         # seconds an idle connection above MIN_SIZE is kept before it is closed
+    'CHECKOUT_TIMEOUT': 30,  # seconds to wait for a free connection
+    'STALE_AFTER': 60,       # ping connections that sat idle longer than this (seconds)
+}
+POOL_SETTINGS.update(getattr(settings, 'HELPERS_DB_POOL', {}))
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    pass
+
+
+class PooledConnection:
+    """
+    Thin proxy around a pooled psycopg2 connection.
+
+    close() hands the connection back to the pool instead of closing it, and
+    `with get_db_connection() as conn:` commits (or rolls back) and returns it.
+    Unlike psycopg2's `with conn:`, the connection cannot be used after the
+    block: it may already belong to another borrower, so any use raises
+    InterfaceError, as a closed psycopg2 connection would.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def _connection(self):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return self._conn
+
+    def __getattr__(self, name):
+        if name == 'closed' and self._conn is None:
+            return 1
+        return getattr(self._connection(), name)
+
+    def __setattr__(self, name, value):
+        # conn.autocommit = True etc. must reach the real connection
+        if name.startswith('_'):
+            super().__setattr__(name, value)
+        else:
+            setattr(self._connection(), name, value)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.putconn(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if self._conn is not None and not self._conn.closed:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+
+    def __del__(self):
+        # Safety net for callers that never close their connection.
+        if self.__dict__.get('_conn') is not None:
+            self.close()
+
+
+class ConnectionPool:
+    """
+    Up to max_size psycopg2 connections, opened on demand. Returned
+    connections stay open for the next borrower; idle ones above min_size
+    are closed after max_idle seconds.
+    """
+
+    def __init__(self, min_size, max_size, timeout, stale_after, max_idle, **db_params):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.max_idle = max_idle
+        self.db_params = db_params
+        # Borrowers wait on the semaphore when all max_size connections are out
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = []  # list of (conn, last_used), most recently used last
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.stale_discarded = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception as e:
+            print(f"Error closing pooled connection: {e}")
+
+    def _evict_idle(self):
+        # Called with _lock held; the least recently used connections go first
+        now = time.monotonic()
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle:
+            self._close(self._idle.pop(0)[0])
+
+    def _is_stale(self, conn, last_used):
+        if conn.closed:
+            return True
+        if time.monotonic() - last_used < self.stale_after:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return False
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return True
+
+    def getconn(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+        try:
+            conn = None
+            while conn is None:
+                with self._lock:
+                    self._evict_idle()
+                    idle = self._idle.pop() if self._idle else None
+                if idle is None:
+                    conn = psycopg2.connect(**self.db_params)
+                elif self._is_stale(*idle):
+                    with self._lock:
+                        self.stale_discarded += 1
+                    self._close(idle[0])
+                else:
+                    conn = idle[0]
+        except Exception:
+            self._slots.release()
+            raise
+
+        wait = time.monotonic() - start
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        return PooledConnection(self, conn)
+
+    def putconn(self, conn):
+        try:
+            reusable = not conn.closed
+            if reusable:
+                try:
+                    if conn.autocommit:
+                        conn.autocommit = False
+                    status = conn.info.transaction_status
+                    if status == TRANSACTION_STATUS_UNKNOWN:
+                        reusable = False  # the connection is broken
+                    elif status != TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    reusable = False
+            if not reusable:
+                self._close(conn)
+            with self._lock:
+                if reusable:
+                    self._idle.append((conn, time.monotonic()))
+                self._evict_idle()
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'stale_discarded': self.stale_discarded,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    POOL_SETTINGS['MIN_SIZE'],
+                    POOL_SETTINGS['MAX_SIZE'],
+                    POOL_SETTINGS['CHECKOUT_TIMEOUT'],
+                    POOL_SETTINGS['STALE_AFTER'],
+                    POOL_SETTINGS['MAX_IDLE'],
+                    **DB_PARAMS
+                )
+    return _pool
+
+
+def pool_stats():
+    if _pool is None:
+        return {}
+    return _pool.stats()
@@ -0,0 +1,115 @@
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from psycopg2.extras import execute_values
+from django.conf import settings
+
+from .tables import get_db_connection
+
+EMBEDDING_CACHE_SETTINGS = {
+    'MEMORY_ENTRIES': 5000,  # vectors kept in process, ~6KB each for 1536 dims
+}
+EMBEDDING_CACHE_SETTINGS.update(getattr(settings, 'EMBEDDING_CACHE', {}))
+
+# Created by the simplecrm migrations
+TABLE = "embedding_cache"
+
+LOOKUP_BATCH_SIZE = 1000
+
+
+def normalize_text(text):
+    """Whitespace and unicode normalization applied before hashing; the text embedded is left as is."""
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+
+def content_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by (model, sha256 of the normalized text).
+
+    A bounded in-memory LRU sits in front of a Postgres table shared by all
+    workers and tenants. The table is best effort: if it cannot be read or
+    written the cache behaves like a miss and the upload goes on.
+    """
+
+    def __init__(self, memory_entries=None):
+        self.table = TABLE
+        self.memory_entries = memory_entries or EMBEDDING_CACHE_SETTINGS['MEMORY_ENTRIES']
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_many(self, model, hashes):
+        """Returns {hash: embedding list} for the hashes found in memory or in the table."""
+        found = {}
+        missing = []
+        with self._lock:
+            for digest in set(hashes):
+                vector = self._memory.get((model, digest))
+                if vector is None:
+                    missing.append(digest)
+                else:
+                    self._memory.move_to_end((model, digest))
+                    found[digest] = vector.tolist()
+
+        if missing:
+            try:
+                with get_db_connection() as conn:
+                    with conn.cursor() as cursor:
+                        for i in range(0, len(missing), LOOKUP_BATCH_SIZE):
+                            cursor.execute(
+                                f"SELECT content_hash, embedding FROM {self.table} WHERE model = %s AND content_hash = ANY(%s)",
+                                (model, missing[i:i + LOOKUP_BATCH_SIZE])
+                            )
+                            for digest, embedding in cursor.fetchall():
+                                self._remember((model, digest), np.asarray(embedding, dtype=np.float32))
+                                found[digest] = embedding
+            except Exception as e:
+                print(f"Embedding cache lookup failed: {e}")
+        return found
+
+    def set_many(self, model, items):
+        """Store {hash: embedding} in memory and in the table."""
+        if not items:
+            return
+        for digest, embedding in items.items():
+            self._remember((model, digest), np.asarray(embedding, dtype=np.float32))
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cursor:
+                    execute_values(
+                        cursor,
+                        f"INSERT INTO {self.table} (model, content_hash, embedding) VALUES %s ON CONFLICT DO NOTHING",
+                        [(model, digest, list(embedding)) for digest, embedding in items.items()]
+                    )
+        except Exception as e:
+            print(f"Embedding cache store failed: {e}")
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
@@ -0,0 +1,282 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .embeddings import embed_texts
+from .tables import get_db_connection
+from .vector_store import vector_literal
+
+# Output dimensions of the embedding models we use
+EMBEDDING_MODELS = {
+    'text-embedding-ada-002': 1536,
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+}
+
+# Model each vector table was written with, used the first time a table is seen
+VECTOR_TABLES = {
+    'text_embeddings': {'model': 'text-embedding-3-small', 'text_column': 'chunk'},
+    'text_embeddings_anky': {'model': 'text-embedding-ada-002', 'text_column': 'document'},
+}
+VECTOR_TABLES.update(getattr(settings, 'VECTOR_TABLES', {}))
+
+REGISTRY_TABLE = "vector_table_registry"
+MODEL_CACHE_TTL = 30  # seconds, how long a worker may keep using a table's model after a switch
+
+_models = {}  # table name -> (model, expires_at)
+_models_lock = threading.Lock()
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _ensure_registry(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {REGISTRY_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            dimensions INTEGER NOT NULL,
+            text_column TEXT NOT NULL,
+            pending_model TEXT,
+            backfill_cursor BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def _registry_row(cursor, table_name):
+    _ensure_registry(cursor)
+    cursor.execute(
+        f"SELECT model, dimensions, text_column, pending_model, backfill_cursor FROM {REGISTRY_TABLE} WHERE table_name = %s",
+        [table_name]
+    )
+    row = cursor.fetchone()
+    if row is None:
+        if table_name not in VECTOR_TABLES:
+            raise KeyError(f"Unknown vector table: {table_name}")
+        default = VECTOR_TABLES[table_name]
+        cursor.execute(
+            f"""
+            INSERT INTO {REGISTRY_TABLE} (table_name, model, dimensions, text_column)
+            VALUES (%s, %s, %s, %s) ON CONFLICT (table_name) DO NOTHING
+            """,
+            [table_name, default['model'], EMBEDDING_MODELS[default['model']], default['text_column']]
+        )
+        row = (default['model'], EMBEDDING_MODELS[default['model']], default['text_column'], None, 0)
+    return row
+
+
+def table_model(table_name, fresh=False):
+    """
+    The embedding model the vectors of table_name were written with. Writers
+    pass fresh=True so they never store vectors of a model switched away from.
+    """
+    now = time.monotonic()
+    with _models_lock:
+        cached = _models.get(table_name)
+        if not fresh and cached is not None and cached[1] > now:
+            return cached[0]
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            model = _registry_row(cursor, table_name)[0]
+
+    with _models_lock:
+        _models[table_name] = (model, now + MODEL_CACHE_TTL)
+    return model
+
+
+def table_dimensions(table_name):
+    """Dimensions of the vector column of table_name, those of its current model."""
+    return EMBEDDING_MODELS[table_model(table_name)]
+
+
+class ModelChanged(Exception):
+    """The table switched embedding model after the vectors to store were computed."""
+
+
+def lock_table_model(cursor, table_name, model):
+    """
+    Call in the transaction that inserts vectors embedded with model, before
+    the insert. ROW EXCLUSIVE conflicts with the lock a model switch holds
+    (EmbeddingBackfill._swap), so this waits for a switch in progress, and a
+    switch starting later waits for this transaction and re-embeds its rows.
+    Raises ModelChanged when the table no longer uses model.
+    """
+    cursor.execute(f"LOCK TABLE {_quote(table_name)} IN ROW EXCLUSIVE MODE")
+    current = _registry_row(cursor, table_name)[0]
+    if current != model:
+        invalidate_table_model(table_name)
+        raise ModelChanged(f"{table_name} is embedded with {current} now, not {model}")
+
+
+def write_for_table(conn, table_name, model, texts, embeddings, write):
+    """
+    Store embeddings of texts, computed with model, by calling
+    write(cursor, embeddings), and commit. The table's model is checked under
+    lock_table_model(); when it switched meanwhile the texts are embedded
+    again with the new model. Returns the embeddings written.
+    """
+    while True:
+        with conn.cursor() as cursor:
+            try:
+                lock_table_model(cursor, table_name, model)
+            except ModelChanged:
+                conn.rollback()
+                model = table_model(table_name, fresh=True)
+                embeddings = embed_texts(texts, model=model)
+                continue
+            write(cursor, embeddings)
+        conn.commit()
+        return embeddings
+
+
+def embed_for_table(table_name, texts):
+    """Embed texts for storing in or searching table_name, always with the table's model."""
+    return embed_texts(texts, model=table_model(table_name))
+
+
+def embed_query_for_table(table_name, text):
+    return embed_for_table(table_name, [text])[0]
+
+
+class EmbeddingBackfill:
+    """
+    Re-embeds a vector table with another model.
+
+    New vectors go into a shadow column (embedding_next) batch by batch, in id
+    order. The last processed id is committed to the registry after every
+    batch, so an interrupted run resumes where it stopped. Searches keep using
+    the old column and model until the end. Then the shadow column replaces
+    the old one and the registry switches model in a single transaction.
+    rows_per_minute throttles the whole run on top of the embedder's own
+    rate-limit retries.
+    """
+
+    def __init__(self, table_name, model, batch_size=500, rows_per_minute=None):
+        if model not in EMBEDDING_MODELS:
+            raise ValueError(f"Unknown embedding model: {model}")
+        self.table_name = table_name
+        self.model = model
+        self.dimensions = EMBEDDING_MODELS[model]
+        self.batch_size = batch_size
+        self.rows_per_minute = rows_per_minute
+        self.rows_done = 0
+
+    def _prepare(self, cursor):
+        model, _, text_column, pending_model, backfill_cursor = _registry_row(cursor, self.table_name)
+        self.text_column = text_column
+        if model == self.model and pending_model is None:
+            return False
+        if pending_model != self.model:
+            # New (or different) target model: start from scratch
+            cursor.execute(f"ALTER TABLE {_quote(self.table_name)} DROP COLUMN IF EXISTS embedding_next")
+            backfill_cursor = 0
+        cursor.execute(
+            f"ALTER TABLE {_quote(self.table_name)} ADD COLUMN IF NOT EXISTS embedding_next vector({int(self.dimensions)})"
+        )
+        cursor.execute(
+            f"UPDATE {REGISTRY_TABLE} SET pending_model = %s, backfill_cursor = %s, updated_at = now() WHERE table_name = %s",
+            [self.model, backfill_cursor, self.table_name]
+        )
+        self.cursor_id = backfill_cursor
+        return True
+
+    def _next_batch(self, cursor, after_id, limit):
+        cursor.execute(
+            f"""
+            SELECT id, {_quote(self.text_column)} FROM {_quote(self.table_name)}
+            WHERE id > %s AND embedding_next IS NULL
+            ORDER BY id LIMIT %s
+            """,
+            [after_id, limit]
+        )
+        return cursor.fetchall()
+
+    def _store(self, cursor, rows):
+        embeddings = embed_texts([text or "" for _, text in rows], model=self.model)
+        cursor.executemany(
+            f"UPDATE {_quote(self.table_name)} SET embedding_next = %s::vector WHERE id = %s",
+            [(vector_literal(embedding), row_id) for (row_id, _), embedding in zip(rows, embeddings)]
+        )
+
+    def _throttle(self, started, rows):
+        if not self.rows_per_minute:
+            return
+        expected = rows / self.rows_per_minute * 60
+        elapsed = time.monotonic() - started
+        if expected > elapsed:
+            time.sleep(expected - elapsed)
+
+    def run(self):
+        """Backfill until done, returns a report. Safe to call again after an interruption."""
+        started = time.monotonic()
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                if not self._prepare(cursor):
+                    return {'table': self.table_name, 'model': self.model, 'rows': 0, 'status': 'up to date'}
+            conn.commit()
+
+            while True:
+                with conn.cursor() as cursor:
+                    rows = self._next_batch(cursor, self.cursor_id, self.batch_size)
+                    if not rows:
+                        break
+                    self._store(cursor, rows)
+                    self.cursor_id = rows[-1][0]
+                    cursor.execute(
+                        f"UPDATE {REGISTRY_TABLE} SET backfill_cursor = %s, updated_at = now() WHERE table_name = %s",
+                        [self.cursor_id, self.table_name]
+                    )
+                conn.commit()
+                self.rows_done += len(rows)
+                print(f"Backfill {self.table_name}: {self.rows_done} rows re-embedded with {self.model}")
+                self._throttle(started, self.rows_done)
+
+            self._swap(conn)
+
+        invalidate_table_model(self.table_name)
+        return {
+            'table': self.table_name,
+            'model': self.model,
+            'rows': self.rows_done,
+            'status': 'switched',
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+        }
+
+    def _swap(self, conn):
+        from .vector_index import forget_vector_index, schedule_index_maintenance
+
+        table = _quote(self.table_name)
+        with conn.cursor() as cursor:
+            # Blocks writers for the few rows inserted since the last batch; writers
+            # waiting in lock_table_model() see the new model once this commits
+            cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+            while True:
+                rows = self._next_batch(cursor, 0, self.batch_size)
+                if not rows:
+                    break
+                self._store(cursor, rows)
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN embedding")  # drops its index as well
+            cursor.execute(f"ALTER TABLE {table} RENAME COLUMN embedding_next TO embedding")
+            cursor.execute(
+                f"""
+                UPDATE {REGISTRY_TABLE}
+                SET model = %s, dimensions = %s, pending_model = NULL, backfill_cursor = 0, updated_at = now()
+                WHERE table_name = %s
+                """,
+                [self.model, self.dimensions, self.table_name]
+            )
+        conn.commit()
+        forget_vector_index(self.table_name)
+        schedule_index_maintenance(self.table_name)
+
+
+def invalidate_table_model(table_name=None):
+    with _models_lock:
+        if table_name is None:
+            _models.clear()
+        else:
+            _models.pop(table_name, None)
@@ -0,0 +1,187 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+from openai import OpenAI
+from django.conf import settings
+from langchain_core.embeddings import Embeddings
+
+from .embedding_cache import content_hash, get_embedding_cache
+
+EMBEDDING_SETTINGS = {
+    'MODEL': "text-embedding-3-small",
+    'BATCH_SIZE': 100,       # inputs per embeddings request
+    'MAX_CONCURRENCY': 4,    # batches in flight at the same time
+    'MAX_RETRIES': 5,
+    'BACKOFF_BASE': 1.0,     # seconds, doubled on every retry
+    'BACKOFF_MAX': 30.0,
+    'BASE_URL': None,        # e.g. a local fake embedding server
+    'USE_CACHE': True,       # consult helpers.embedding_cache before calling the API
+}
+EMBEDDING_SETTINGS.update(getattr(settings, 'EMBEDDINGS', {}))
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class BatchEmbedder:
+    """
+    Embeds a list of texts with as few requests as possible.
+
+    Texts are sent BATCH_SIZE at a time, up to MAX_CONCURRENCY batches run in
+    parallel threads, and rate limits / transient errors are retried with
+    exponential backoff. embed() returns the vectors in the order of the input.
+
+    Texts already in the embedding cache (same model and normalized content)
+    are not sent again, and identical texts within a call are sent once.
+    Normalization only builds the cache key, texts are sent as given.
+    """
+
+    def __init__(self, client=None, model=None, batch_size=None, max_concurrency=None,
+                 max_retries=None, backoff_base=None, backoff_max=None, cache=None):
+        if client is None:
+            # Retries are handled here, so the client must not retry on its own as well
+            client = OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=EMBEDDING_SETTINGS['BASE_URL'],
+                max_retries=0,
+            )
+        self.client = client
+        self.model = model or EMBEDDING_SETTINGS['MODEL']
+        self.batch_size = batch_size or EMBEDDING_SETTINGS['BATCH_SIZE']
+        self.max_concurrency = max_concurrency or EMBEDDING_SETTINGS['MAX_CONCURRENCY']
+        self.max_retries = EMBEDDING_SETTINGS['MAX_RETRIES'] if max_retries is None else max_retries
+        self.backoff_base = EMBEDDING_SETTINGS['BACKOFF_BASE'] if backoff_base is None else backoff_base
+        self.backoff_max = EMBEDDING_SETTINGS['BACKOFF_MAX'] if backoff_max is None else backoff_max
+        if cache is None and EMBEDDING_SETTINGS['USE_CACHE']:
+            cache = get_embedding_cache()
+        self.cache = cache
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+    def embed(self, texts, model=None):
+        return self.embed_with_report(texts, model=model)[0]
+
+    def embed_with_report(self, texts, model=None):
+        """
+        Same as embed() but also returns a report for the caller to log or
+        return: {'chunks', 'unique_chunks', 'cache_hits', 'embedded', 'hit_ratio'}.
+        """
+        texts = [str(text) for text in texts]
+        model = model or self.model
+        hashes = [content_hash(text) for text in texts]
+
+        unique = {}
+        for digest, text in zip(hashes, texts):
+            unique.setdefault(digest, text)  # the first of texts that normalize alike is sent
+        vectors = self.cache.get_many(model, list(unique)) if self.cache is not None else {}
+        to_embed = [digest for digest in unique if digest not in vectors]
+
+        if to_embed:
+            embedded = dict(zip(to_embed, self._embed_all([unique[digest] for digest in to_embed], model)))
+            vectors.update(embedded)
+            if self.cache is not None:
+                self.cache.set_many(model, embedded)
+
+        cache_hits = len(unique) - len(to_embed)
+        report = {
+            'chunks': len(texts),
+            'unique_chunks': len(unique),
+            'cache_hits': cache_hits,
+            'embedded': len(to_embed),
+            'hit_ratio': round(cache_hits / len(unique), 3) if unique else 0.0,
+        }
+        return [vectors[digest] for digest in hashes], report
+
+    def _embed_all(self, texts, model):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        if len(batches) == 1 or self.max_concurrency == 1:
+            results = [self._embed_batch(batch, model) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                results = list(executor.map(lambda batch: self._embed_batch(batch, model), batches))
+
+        return [embedding for batch_result in results for embedding in batch_result]
+
+    def _embed_batch(self, batch, model):
+        # The API rejects empty strings
+        inputs = [text or " " for text in batch]
+        attempt = 0
+        while True:
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self.client.embeddings.create(input=inputs, model=model)
+                # Items carry their input index, do not rely on the response order
+                data = sorted(response.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                print(f"Embedding batch failed ({e.__class__.__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _backoff(self, attempt, error):
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = BatchEmbedder()
+    return _embedder
+
+
+def embed_texts(texts, model=None):
+    """Embed texts with the shared BatchEmbedder, returns one vector per text in order."""
+    return get_embedder().embed(texts, model=model)
+
+
+def embed_texts_with_report(texts, model=None):
+    return get_embedder().embed_with_report(texts, model=model)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain embeddings backed by the shared BatchEmbedder, for FAISS stores.
+    last_report holds the cache report of the latest embed_documents() call.
+    """
+
+    def __init__(self, model="text-embedding-ada-002"):
+        self.model = model
+        self.last_report = None
+
+    def embed_documents(self, texts):
+        embeddings, self.last_report = embed_texts_with_report(texts, model=self.model)
+        return embeddings
+
+    def embed_query(self, text):
+        return embed_texts([text], model=self.model)[0]
@@ -0,0 +1,131 @@
+import fcntl
+import os
+import pickle
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from langchain_community.vectorstores import FAISS
+
+FAISS_MMAP_SETTINGS = {
+    'ENABLED': True,
+    'MIN_BYTES': 64 * 1024 * 1024,  # segments at least this big are memory-mapped instead of loaded
+    'DIR': os.path.join(tempfile.gettempdir(), "faiss_segments"),
+}
+FAISS_MMAP_SETTINGS.update(getattr(settings, 'FAISS_MMAP', {}))
+
+
+def should_mmap(nbytes):
+    return FAISS_MMAP_SETTINGS['ENABLED'] and nbytes >= FAISS_MMAP_SETTINGS['MIN_BYTES']
+
+
+def _segment_dir(index_id):
+    return os.path.join(FAISS_MMAP_SETTINGS['DIR'], str(index_id))
+
+
+def _write_atomic(path, write):
+    """write(tmp_path) fills a temporary file that then replaces path in one step."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def _segment_lock(directory, segment_id, operation):
+    """
+    flock() of the segment's lock file. Taken again when remove_stale_segments()
+    unlinked the file while this worker waited, a lock on it would exclude nobody.
+    """
+    path = os.path.join(directory, f"{segment_id}.lock")
+    while True:
+        with open(path, 'a') as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                linked = os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino
+            except FileNotFoundError:
+                linked = False
+            if linked:
+                yield lock_file
+                return
+
+
+def _pickle_to(path, value):
+    with open(path, 'wb') as f:
+        pickle.dump(value, f)
+
+
+def _mmap_flags(faiss):
+    # IO_FLAG_MMAP_IFC (faiss >= 1.9) maps flat codes too, plain IO_FLAG_MMAP only covers inverted lists
+    return getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def load_mmapped_segment(index_id, segment_id, fetch_blob, embeddings):
+    """
+    Open a segment as a read-only memory-mapped FAISS store.
+
+    The first worker on a host that needs the segment fetches the blob with
+    fetch_blob() and writes it to DIR as a FAISS index file plus a pickled
+    docstore. Every worker then maps the same file, so the vectors live once in
+    the OS page cache instead of once per process. Segments never change, so
+    the files never need to be refreshed.
+    """
+    import faiss
+
+    directory = _segment_dir(index_id)
+    os.makedirs(directory, exist_ok=True)
+    index_path = os.path.join(directory, f"{segment_id}.faiss")
+    docstore_path = os.path.join(directory, f"{segment_id}.docstore")
+
+    with _segment_lock(directory, segment_id, fcntl.LOCK_SH) as lock_file:
+        if not os.path.exists(index_path):
+            # Exclusive for writing; another worker may have written the files meanwhile
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not os.path.exists(index_path):
+                index, docstore, index_to_docstore_id = pickle.loads(fetch_blob())
+                _write_atomic(docstore_path, lambda tmp_path: _pickle_to(tmp_path, (docstore, index_to_docstore_id)))
+                # The index file is written last, its presence marks a complete segment
+                _write_atomic(index_path, lambda tmp_path: faiss.write_index(index, tmp_path))
+                del index
+
+        # Held while opening, so remove_stale_segments() cannot unlink the files in between
+        with open(docstore_path, 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        index = faiss.read_index(index_path, _mmap_flags(faiss))
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def remove_stale_segments(index_id, live_segment_ids):
+    """
+    Delete files of segments that were compacted away. Mappings still open elsewhere stay valid.
+
+    live_segment_ids may be older than what other workers see. Segment ids only
+    grow, and a compacted segment is replaced by one with a higher id, so only
+    ids below the newest live one are considered; segments added since are
+    never touched. Files are removed under the segment's exclusive lock, and
+    segments another worker is writing or opening are left for a later call.
+    """
+    directory = _segment_dir(index_id)
+    if not live_segment_ids or not os.path.isdir(directory):
+        return
+    live = {int(segment_id) for segment_id in live_segment_ids}
+    newest = max(live)
+    stale = {
+        int(segment_id) for segment_id in (file_name.split('.', 1)[0] for file_name in os.listdir(directory))
+        if segment_id.isdigit() and int(segment_id) not in live and int(segment_id) < newest
+    }
+    for segment_id in sorted(stale):
+        try:
+            with _segment_lock(directory, segment_id, fcntl.LOCK_EX | fcntl.LOCK_NB):
+                # The index file first, a segment without it is fetched again rather than read
+                for suffix in ('faiss', 'docstore', 'lock'):
+                    try:
+                        os.unlink(os.path.join(directory, f"{segment_id}.{suffix}"))
+                    except FileNotFoundError:
+                        pass
+        except BlockingIOError:
+            continue
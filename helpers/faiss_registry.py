@@ -0,0 +1,244 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from analytics.models import FAISSIndex, FAISSSegment
+from .embeddings import CachedEmbeddings
+from .faiss_mmap import load_mmapped_segment, remove_stale_segments, should_mmap
+
+FAISS_REGISTRY_SETTINGS = {
+    'MAX_BYTES': 512 * 1024 * 1024,  # memory budget for resident indexes (serialized size)
+    'VERSION_CHECK_INTERVAL': 5,     # seconds between version checks of a resident index
+    'EMBEDDING_MODEL': "text-embedding-ada-002",
+}
+FAISS_REGISTRY_SETTINGS.update(getattr(settings, 'FAISS_REGISTRY', {}))
+
+
+def _segment_blob(segment_id):
+    return bytes(FAISSSegment.objects.values_list('index_data', flat=True).get(pk=segment_id))
+
+
+class SegmentedIndex:
+    """
+    Read-only view over the segments of one FAISSIndex. The query is embedded
+    once, every segment returns its own top k and the results are merged.
+    """
+
+    def __init__(self, stores, embeddings):
+        self.stores = list(stores)
+        self.embeddings = embeddings
+
+    def similarity_search(self, query, k=4):
+        if not self.stores:
+            return []
+        vector = self.embeddings.embed_query(query)
+        results = []
+        for store in self.stores:
+            results.extend(store.similarity_search_with_score_by_vector(vector, k=k))
+        # Distances by default, smaller is closer; inner product scores are the other way round
+        higher_is_better = self.stores[0].distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT
+        results.sort(key=lambda result: result[1], reverse=higher_is_better)
+        return [doc for doc, _ in results[:k]]
+
+
+class _Entry:
+    __slots__ = ('version', 'segments', 'index', 'nbytes', 'mapped_bytes')
+
+    def __init__(self, version, segments, embeddings):
+        self.version = version
+        self.segments = segments  # segment id -> (store, nbytes, memory-mapped)
+        self.index = SegmentedIndex([store for store, _, _ in segments.values()], embeddings)
+        # Memory-mapped segments live in the shared page cache, they do not count against MAX_BYTES
+        self.nbytes = sum(nbytes for _, nbytes, mapped in segments.values() if not mapped)
+        self.mapped_bytes = sum(nbytes for _, nbytes, mapped in segments.values() if mapped)
+
+
+class FAISSRegistry:
+    """
+    Process-level cache of deserialized FAISS indexes.
+
+    Indexes are kept per FAISSIndex row and looked up by (tenant_id, name).
+    A resident index is served without touching the database. Its version is
+    re-checked at most every VERSION_CHECK_INTERVAL seconds, which is a single
+    row lookup that does not read any index data. When the version changed,
+    only segments that are not resident yet are loaded. Segments of at least
+    FAISS_MMAP['MIN_BYTES'] are memory-mapped from local disk (helpers.faiss_mmap)
+    so workers on one host share them through the page cache.
+    vectorize_FAISS hands new segments in through add_segment(), so uploads
+    made by this process are visible immediately.
+
+    Indexes are evicted least recently used first once their total serialized
+    size exceeds MAX_BYTES.
+    """
+
+    def __init__(self, max_bytes=None, check_interval=None):
+        self.max_bytes = max_bytes or FAISS_REGISTRY_SETTINGS['MAX_BYTES']
+        self.check_interval = FAISS_REGISTRY_SETTINGS['VERSION_CHECK_INTERVAL'] if check_interval is None else check_interval
+        self.embeddings = CachedEmbeddings(model=FAISS_REGISTRY_SETTINGS['EMBEDDING_MODEL'])
+        self._indexes = OrderedDict()  # FAISSIndex pk -> _Entry
+        self._aliases = {}             # (tenant_id, name) -> (pk, checked_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.loads = 0
+        self.segments_loaded = 0
+        self.evictions = 0
+
+    def get(self, tenant_id=None, name=None):
+        """
+        The SegmentedIndex of a tenant's index. Without a name the tenant's most
+        recently updated index is used. Raises FAISSIndex.DoesNotExist, also
+        when tenant_id is None.
+        """
+        key = (str(tenant_id) if tenant_id is not None else None, name)
+        now = time.monotonic()
+        with self._lock:
+            alias = self._aliases.get(key)
+            if alias is not None and now - alias[1] < self.check_interval and alias[0] in self._indexes:
+                self._indexes.move_to_end(alias[0])
+                self.hits += 1
+                return self._indexes[alias[0]].index
+
+        row = self._lookup(tenant_id, name)
+        if row is None:
+            with self._lock:
+                self._aliases.pop(key, None)
+            raise FAISSIndex.DoesNotExist(f"No FAISS index for tenant {tenant_id}, name {name}")
+        pk, version = row
+
+        with self._lock:
+            entry = self._indexes.get(pk)
+            if entry is not None and entry.version >= version:
+                self._indexes.move_to_end(pk)
+                self._aliases[key] = (pk, now)
+                self.hits += 1
+                return entry.index
+            load_lock = self._load_locks.setdefault(pk, threading.Lock())
+
+        # One thread loads a given index, the others wait for it
+        with load_lock:
+            with self._lock:
+                entry = self._indexes.get(pk)
+                if entry is not None and entry.version >= version:
+                    self._aliases[key] = (pk, now)
+                    return entry.index
+            entry = self._load(pk, entry)
+            with self._lock:
+                self._aliases[key] = (pk, now)
+                self.loads += 1
+            return entry.index
+
+    def resolve(self, tenant_id=None, name=None):
+        """
+        (pk, version) of the index get() serves for (tenant_id, name), without
+        loading it. Raises FAISSIndex.DoesNotExist.
+        """
+        key = (str(tenant_id) if tenant_id is not None else None, name)
+        with self._lock:
+            alias = self._aliases.get(key)
+            if alias is not None and time.monotonic() - alias[1] < self.check_interval and alias[0] in self._indexes:
+                return alias[0], self._indexes[alias[0]].version
+
+        row = self._lookup(tenant_id, name)
+        if row is None:
+            raise FAISSIndex.DoesNotExist(f"No FAISS index for tenant {tenant_id}, name {name}")
+        return row
+
+    def _lookup(self, tenant_id, name):
+        # Without a tenant the newest index of any tenant would be served
+        if tenant_id is None:
+            raise FAISSIndex.DoesNotExist("No tenant given for the FAISS index lookup")
+        indexes = FAISSIndex.objects.filter(tenant_id=tenant_id)
+        if name is not None:
+            indexes = indexes.filter(name=name)
+        return indexes.order_by('-updated_at', '-id').values_list('id', 'version').first()
+
+    def _load(self, pk, current):
+        # Version first: a segment added after this read only makes the entry look older than it is
+        version = FAISSIndex.objects.values_list('version', flat=True).get(pk=pk)
+        segment_sizes = dict(FAISSSegment.objects.filter(index_id=pk).values_list('id', 'nbytes'))
+
+        resident = current.segments if current is not None else {}
+        segments = {segment_id: resident[segment_id] for segment_id in segment_sizes if segment_id in resident}
+        missing = [segment_id for segment_id in segment_sizes if segment_id not in segments]
+
+        # Big segments are memory-mapped from local disk, small ones deserialized into RAM
+        mapped = [segment_id for segment_id in missing if should_mmap(segment_sizes[segment_id])]
+        for segment_id in mapped:
+            store = load_mmapped_segment(pk, segment_id, lambda: _segment_blob(segment_id), self.embeddings)
+            segments[segment_id] = (store, segment_sizes[segment_id], True)
+        in_ram = [segment_id for segment_id in missing if segment_id not in mapped]
+        for segment_id, index_data in FAISSSegment.objects.filter(id__in=in_ram).values_list('id', 'index_data'):
+            store = FAISS.deserialize_from_bytes(bytes(index_data), self.embeddings, allow_dangerous_deserialization=True)
+            segments[segment_id] = (store, len(index_data), False)
+        if mapped or set(resident) - set(segment_sizes):
+            remove_stale_segments(pk, segment_sizes)
+
+        entry = _Entry(version, segments, self.embeddings)
+        self._put(pk, entry)
+        with self._lock:
+            self.segments_loaded += len(missing)
+        return entry
+
+    def _put(self, pk, entry):
+        with self._lock:
+            current = self._indexes.get(pk)
+            if current is not None:
+                if current.version > entry.version:
+                    return
+                self._bytes -= current.nbytes
+            self._indexes[pk] = entry
+            self._indexes.move_to_end(pk)
+            self._bytes += entry.nbytes
+            # The newest index always stays, even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._indexes) > 1:
+                _, evicted = self._indexes.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def add_segment(self, pk, version, segment_id, store, nbytes):
+        """
+        Add a just written segment to a resident index (hot swap). Ignored when
+        the resident copy missed other updates, the next get() reloads it.
+        """
+        with self._lock:
+            current = self._indexes.get(pk)
+        if current is None or current.version != version - 1:
+            return False
+        segments = dict(current.segments)
+        segments[segment_id] = (store, nbytes, False)
+        self._put(pk, _Entry(version, segments, self.embeddings))
+        return True
+
+    def invalidate(self, pk=None):
+        with self._lock:
+            if pk is None:
+                self._indexes.clear()
+                self._aliases.clear()
+                self._bytes = 0
+            else:
+                entry = self._indexes.pop(pk, None)
+                if entry is not None:
+                    self._bytes -= entry.nbytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'indexes': len(self._indexes),
+                'segments': sum(len(entry.segments) for entry in self._indexes.values()),
+                'bytes': self._bytes,
+                'mapped_bytes': sum(entry.mapped_bytes for entry in self._indexes.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'loads': self.loads,
+                'segments_loaded': self.segments_loaded,
+                'evictions': self.evictions,
+            }
+
+
+faiss_registry = FAISSRegistry()
@@ -0,0 +1,125 @@
+import threading
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from langchain_community.vectorstores import FAISS
+
+from analytics.models import FAISSChunk, FAISSIndex, FAISSSegment
+
+FAISS_SEGMENT_SETTINGS = {
+    'SMALL_SEGMENT_BYTES': 8 * 1024 * 1024,  # segments below this are merged by the compactor
+    'COMPACT_MIN_SEGMENTS': 8,               # compact once an index has this many small segments
+}
+FAISS_SEGMENT_SETTINGS.update(getattr(settings, 'FAISS_SEGMENTS', {}))
+
+SEARCH_CONFIG = "english"  # text search configuration of FAISSChunk.search_vector
+
+
+def _bump_version(index_id):
+    FAISSIndex.objects.filter(pk=index_id).update(version=F('version') + 1, updated_at=timezone.now())
+    return FAISSIndex.objects.values_list('version', flat=True).get(pk=index_id)
+
+
+def _index_chunks(index_id, segment, store):
+    # Texts of the segment's documents, for the lexical half of helpers.hybrid_search
+    FAISSChunk.objects.bulk_create([
+        FAISSChunk(index_id=index_id, segment=segment, content=store.docstore.search(doc_id).page_content)
+        for doc_id in store.index_to_docstore_id.values()
+    ], batch_size=1000)
+    FAISSChunk.objects.filter(segment=segment).update(search_vector=SearchVector('content', config=SEARCH_CONFIG))
+
+
+def append_segment(name, tenant_id, store, doc_count, json_data=None):
+    """
+    Store `store` as a new segment of the (tenant, name) index, creating the
+    index on first use. Only the new documents are written, concurrent
+    uploads each add their own segment. Returns (FAISSIndex, FAISSSegment, version).
+    """
+    serialized = store.serialize_to_bytes()
+    with transaction.atomic():
+        faiss_index, _ = FAISSIndex.objects.get_or_create(
+            name=name, tenant_id=tenant_id,
+            defaults={'index_data': b'', 'json_data': json_data},
+        )
+        segment = FAISSSegment.objects.create(
+            index=faiss_index, index_data=serialized, doc_count=doc_count, nbytes=len(serialized)
+        )
+        _index_chunks(faiss_index.pk, segment, store)
+        version = _bump_version(faiss_index.pk)
+    return faiss_index, segment, version
+
+
+def small_segment_count(index_id):
+    return FAISSSegment.objects.filter(
+        index_id=index_id, nbytes__lt=FAISS_SEGMENT_SETTINGS['SMALL_SEGMENT_BYTES']
+    ).count()
+
+
+def compact_index(index_id, embeddings):
+    """
+    Merge the small segments of an index into one. Uploads running at the same
+    time only add segments, so they are not blocked and nothing is lost.
+    Returns the number of segments merged (0 if there was nothing to do).
+    """
+    small = list(
+        FAISSSegment.objects.filter(index_id=index_id, nbytes__lt=FAISS_SEGMENT_SETTINGS['SMALL_SEGMENT_BYTES'])
+        .order_by('id').values_list('id', 'index_data', 'doc_count')
+    )
+    if len(small) < FAISS_SEGMENT_SETTINGS['COMPACT_MIN_SEGMENTS']:
+        return 0
+
+    merged = None
+    for _, index_data, _ in small:
+        store = FAISS.deserialize_from_bytes(bytes(index_data), embeddings, allow_dangerous_deserialization=True)
+        if merged is None:
+            merged = store
+        else:
+            merged.merge_from(store)
+    serialized = merged.serialize_to_bytes()
+    segment_ids = [segment_id for segment_id, _, _ in small]
+
+    with transaction.atomic():
+        # Serializes compactions of the same index
+        FAISSIndex.objects.select_for_update().filter(pk=index_id).first()
+        if FAISSSegment.objects.filter(id__in=segment_ids).count() != len(segment_ids):
+            return 0  # another compactor merged some of them already
+        merged_segment = FAISSSegment.objects.create(
+            index_id=index_id, index_data=serialized,
+            doc_count=sum(doc_count for _, _, doc_count in small), nbytes=len(serialized)
+        )
+        FAISSChunk.objects.filter(segment_id__in=segment_ids).update(segment=merged_segment)
+        FAISSSegment.objects.filter(id__in=segment_ids).delete()
+        _bump_version(index_id)
+
+    print(f"Compacted {len(segment_ids)} segments of FAISS index {index_id} into one of {len(serialized)} bytes")
+    return len(segment_ids)
+
+
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def schedule_compaction(index_id, embeddings):
+    """Compact in a background thread when the index has enough small segments."""
+    if small_segment_count(index_id) < FAISS_SEGMENT_SETTINGS['COMPACT_MIN_SEGMENTS']:
+        return False
+    with _scheduled_lock:
+        if index_id in _scheduled:
+            return False
+        _scheduled.add(index_id)
+
+    def run():
+        try:
+            compact_index(index_id, embeddings)
+        except Exception as e:
+            print(f"FAISS compaction failed for index {index_id}: {e}")
+        finally:
+            connections.close_all()
+            with _scheduled_lock:
+                _scheduled.discard(index_id)
+
+    threading.Thread(target=run, name=f"faiss-compact-{index_id}", daemon=True).start()
+    return True
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db import connection
+from langchain.schema import Document
+
+from analytics.models import FAISSChunk
+from .faiss_registry import faiss_registry
+from .faiss_segments import SEARCH_CONFIG
+
+HYBRID_SEARCH_SETTINGS = {
+    'CANDIDATES': 20,      # results taken from each retriever before fusion
+    'RRF_K': 60,           # reciprocal rank fusion constant, damps the weight of the top ranks
+    'VECTOR_WEIGHT': 1.0,
+    'LEXICAL_WEIGHT': 1.0,
+}
+HYBRID_SEARCH_SETTINGS.update(getattr(settings, 'HYBRID_SEARCH', {}))
+
+
+def lexical_search(index_id, query, k):
+    """
+    Chunk texts of a FAISS index ranked by full-text relevance, best first.
+
+    Query terms are OR-ed so a chunk matching some of the words still ranks.
+    ts_rank_cd with length normalization is the BM25-like score, served by the
+    GIN index on search_vector.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT content
+            FROM {FAISSChunk._meta.db_table},
+                (
+                    -- Every lexeme of the query quoted on its own, so no character of a lexeme is read as an operator
+                    SELECT string_agg('''' || replace(replace(lexeme, '\\', '\\\\'), '''', '''''') || '''', ' | ')::tsquery AS terms
+                    FROM unnest(to_tsvector(%s::regconfig, %s))
+                ) query
+            WHERE index_id = %s AND search_vector @@ query.terms
+            ORDER BY ts_rank_cd(search_vector, query.terms, 1) DESC
+            LIMIT %s
+            """,
+            [SEARCH_CONFIG, query, index_id, k]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k=None):
+    """
+    Merge ranked lists of keys: every list adds weight / (k + rank) to a key's
+    score. Only ranks are used, so scores of different retrievers need no scaling.
+    """
+    k = HYBRID_SEARCH_SETTINGS['RRF_K'] if k is None else k
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def hybrid_search(query, tenant_id=None, name=None, k=4):
+    """
+    Top k Documents of a tenant's FAISS index for query, combining the vector
+    search of the resident index with Postgres full-text search over the same
+    chunks. Raises FAISSIndex.DoesNotExist.
+    """
+    index_id, _ = faiss_registry.resolve(tenant_id, name)
+    candidates = HYBRID_SEARCH_SETTINGS['CANDIDATES']
+
+    vector_docs = faiss_registry.get(tenant_id, name).similarity_search(query, k=candidates)
+    documents = {}
+    for doc in vector_docs:
+        documents.setdefault(doc.page_content, doc)
+    lexical = lexical_search(index_id, query, candidates)
+
+    fused = reciprocal_rank_fusion(
+        [list(documents), lexical],
+        weights=[HYBRID_SEARCH_SETTINGS['VECTOR_WEIGHT'], HYBRID_SEARCH_SETTINGS['LEXICAL_WEIGHT']],
+    )
+    return [documents.get(content) or Document(page_content=content) for content in fused[:k]]
@@ -0,0 +1,434 @@
+import asyncio
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import httpx
+import openai
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from openai import AsyncOpenAI, OpenAI
+
+LLM_SETTINGS = {
+    'MODEL': "gpt-4o-mini",
+    'BASE_URL': None,            # e.g. a local stub server
+    'TIMEOUT': 60.0,             # seconds for a whole response (between chunks when streaming)
+    'CONNECT_TIMEOUT': 5.0,
+    'MAX_CONNECTIONS': 50,       # pooled HTTP connections shared by all call sites
+    'MAX_KEEPALIVE_CONNECTIONS': 20,
+    'TENANT_CONCURRENCY': 4,     # requests in flight per tenant and process
+    'TENANT_WAIT': 30.0,         # seconds to wait for a free tenant slot
+    'MAX_RETRIES': 3,
+    'BACKOFF_BASE': 0.5,         # seconds, doubled on every retry, with full jitter
+    'BACKOFF_MAX': 20.0,
+}
+LLM_SETTINGS.update(getattr(settings, 'LLM', {}))
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# Tenant of the current request, set by TenantMiddleware so call sites need not pass it
+current_tenant = contextvars.ContextVar('llm_tenant', default=None)
+
+
+class TenantBusy(Exception):
+    """No request slot of the tenant became free within TENANT_WAIT."""
+
+
+class LLMGateway:
+    """
+    The one place OpenAI chat completions are made from.
+
+    All call sites share a pooled HTTP client, so connections are reused
+    instead of one client per module. Requests of a tenant are limited to
+    TENANT_CONCURRENCY at a time, sync and async callers alike, so one
+    tenant's batch job cannot take all workers. Transient errors (rate limits,
+    timeouts, 5xx) are retried with jittered exponential backoff, honouring
+    Retry-After. Token usage and latency are counted per model, see stats().
+
+    chat() returns the answer text, stream_chat() yields it piece by piece,
+    achat() / astream_chat() are the asyncio versions and chat_many() runs
+    several requests concurrently from synchronous code.
+    """
+
+    def __init__(self, base_url=None, timeout=None, tenant_concurrency=None, max_retries=None):
+        self.base_url = base_url or LLM_SETTINGS['BASE_URL']
+        self.timeout = httpx.Timeout(timeout or LLM_SETTINGS['TIMEOUT'], connect=LLM_SETTINGS['CONNECT_TIMEOUT'])
+        self.tenant_concurrency = tenant_concurrency or LLM_SETTINGS['TENANT_CONCURRENCY']
+        self.max_retries = LLM_SETTINGS['MAX_RETRIES'] if max_retries is None else max_retries
+        self.limits = httpx.Limits(
+            max_connections=LLM_SETTINGS['MAX_CONNECTIONS'],
+            max_keepalive_connections=LLM_SETTINGS['MAX_KEEPALIVE_CONNECTIONS'],
+        )
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+        self._slots = {}                                    # tenant -> BoundedSemaphore
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._in_flight = {}
+
+    # Clients
+
+    def _client_options(self):
+        # Retries are handled here, so the client must not retry on its own as well
+        return {
+            'api_key': os.getenv("OPENAI_API_KEY"),
+            'base_url': self.base_url,
+            'timeout': self.timeout,
+            'max_retries': 0,
+        }
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = OpenAI(http_client=httpx.Client(limits=self.limits), **self._client_options())
+        return self._client
+
+    def _async_client(self):
+        # httpx async connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(http_client=httpx.AsyncClient(limits=self.limits), **self._client_options())
+            self._async_clients[loop] = client
+        return client
+
+    async def _close_async_client(self):
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    # Tenant slots
+
+    def _slot(self, tenant_id):
+        with self._lock:
+            slot = self._slots.get(tenant_id)
+            if slot is None:
+                slot = self._slots[tenant_id] = threading.BoundedSemaphore(self.tenant_concurrency)
+            return slot
+
+    def _count_in_flight(self, tenant_id, delta):
+        with self._lock:
+            self._in_flight[tenant_id] = self._in_flight.get(tenant_id, 0) + delta
+
+    @contextmanager
+    def _tenant_slot(self, tenant_id):
+        slot = self._slot(tenant_id)
+        if not slot.acquire(timeout=LLM_SETTINGS['TENANT_WAIT']):
+            raise TenantBusy(f"Too many LLM requests in flight for tenant {tenant_id}")
+        self._count_in_flight(tenant_id, 1)
+        try:
+            yield
+        finally:
+            self._count_in_flight(tenant_id, -1)
+            slot.release()
+
+    async def _acquire_async(self, tenant_id):
+        # Same semaphore as sync callers; polled so the event loop is never blocked
+        slot = self._slot(tenant_id)
+        deadline = time.monotonic() + LLM_SETTINGS['TENANT_WAIT']
+        delay = 0.01
+        while not slot.acquire(blocking=False):
+            if time.monotonic() > deadline:
+                raise TenantBusy(f"Too many LLM requests in flight for tenant {tenant_id}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+        self._count_in_flight(tenant_id, 1)
+        return slot
+
+    def _release_async(self, tenant_id, slot):
+        self._count_in_flight(tenant_id, -1)
+        slot.release()
+
+    # Retries and metrics
+
+    def _backoff(self, attempt, error):
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), LLM_SETTINGS['BACKOFF_MAX'])
+            except ValueError:
+                pass
+        return random.uniform(0, min(LLM_SETTINGS['BACKOFF_BASE'] * (2 ** attempt), LLM_SETTINGS['BACKOFF_MAX']))
+
+    def _retry_delay(self, attempt, error, model):
+        if attempt >= self.max_retries:
+            return None
+        delay = self._backoff(attempt, error)
+        self._record(model, retries=1)
+        print(f"LLM request failed ({error.__class__.__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def _record(self, model, usage=None, latency=None, first_token=None, failed=False, retries=0):
+        with self._lock:
+            metrics = self._metrics.setdefault(model, {
+                'requests': 0, 'failures': 0, 'retries': 0,
+                'prompt_tokens': 0, 'completion_tokens': 0,
+                'latency_seconds': 0.0, 'max_latency_seconds': 0.0,
+                'streams': 0, 'first_token_seconds': 0.0,
+            })
+            metrics['retries'] += retries
+            if failed:
+                metrics['failures'] += 1
+            if latency is not None:
+                metrics['requests'] += 1
+                metrics['latency_seconds'] += latency
+                metrics['max_latency_seconds'] = max(metrics['max_latency_seconds'], latency)
+            if first_token is not None:
+                metrics['streams'] += 1
+                metrics['first_token_seconds'] += first_token
+            if usage is not None:
+                metrics['prompt_tokens'] += usage.prompt_tokens or 0
+                metrics['completion_tokens'] += usage.completion_tokens or 0
+
+    def stats(self):
+        with self._lock:
+            models = {}
+            for model, metrics in self._metrics.items():
+                models[model] = dict(metrics, latency_seconds=round(metrics['latency_seconds'], 3),
+                                     max_latency_seconds=round(metrics['max_latency_seconds'], 3),
+                                     first_token_seconds=round(metrics['first_token_seconds'], 3))
+                if metrics['requests']:
+                    models[model]['avg_latency_seconds'] = round(metrics['latency_seconds'] / metrics['requests'], 3)
+                if metrics['streams']:
+                    models[model]['avg_first_token_seconds'] = round(metrics['first_token_seconds'] / metrics['streams'], 3)
+            return {
+                'models': models,
+                'in_flight': {str(tenant): count for tenant, count in self._in_flight.items() if count},
+                'tenant_concurrency': self.tenant_concurrency,
+            }
+
+    # Requests
+
+    def _params(self, messages, model, params, stream=False):
+        params = dict(params, model=model, messages=messages)
+        if stream:
+            params.update(stream=True, stream_options={'include_usage': True})
+        return params
+
+    def chat(self, messages, model=None, tenant_id=None, **params):
+        """The answer text of a chat completion. params go to chat.completions.create()."""
+        model = model or LLM_SETTINGS['MODEL']
+        tenant_id = tenant_id if tenant_id is not None else current_tenant.get()
+        started = time.monotonic()
+        with self._tenant_slot(tenant_id):
+            attempt = 0
+            while True:
+                try:
+                    response = self.client.chat.completions.create(**self._params(messages, model, params))
+                    break
+                except RETRYABLE_ERRORS as e:
+                    delay = self._retry_delay(attempt, e, model)
+                    if delay is None:
+                        self._record(model, failed=True)
+                        raise
+                    attempt += 1
+                    time.sleep(delay)
+                except openai.OpenAIError:
+                    self._record(model, failed=True)
+                    raise
+        self._record(model, usage=response.usage, latency=time.monotonic() - started)
+        return response.choices[0].message.content
+
+    def stream_chat(self, messages, model=None, tenant_id=None, **params):
+        """
+        Generator of answer text pieces. Failures before the first piece are
+        retried; the tenant slot is held until the generator is exhausted or closed.
+        """
+        # Resolved now, a streaming response is consumed after the middleware reset the tenant
+        tenant_id = tenant_id if tenant_id is not None else current_tenant.get()
+        return self._stream(messages, model or LLM_SETTINGS['MODEL'], tenant_id, params)
+
+    def _stream(self, messages, model, tenant_id, params):
+        started = time.monotonic()
+        first_token = None
+        usage = None
+        with self._tenant_slot(tenant_id):
+            attempt = 0
+            while True:
+                try:
+                    stream = self.client.chat.completions.create(**self._params(messages, model, params, stream=True))
+                    break
+                except RETRYABLE_ERRORS as e:
+                    delay = self._retry_delay(attempt, e, model)
+                    if delay is None:
+                        self._record(model, failed=True)
+                        raise
+                    attempt += 1
+                    time.sleep(delay)
+                except openai.OpenAIError:
+                    self._record(model, failed=True)
+                    raise
+            try:
+                for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if first_token is None:
+                            first_token = time.monotonic() - started
+                        yield chunk.choices[0].delta.content
+            except Exception:
+                self._record(model, failed=True)
+                raise
+            finally:
+                stream.close()
+        self._record(model, usage=usage, latency=time.monotonic() - started, first_token=first_token)
+
+    async def achat(self, messages, model=None, tenant_id=None, **params):
+        model = model or LLM_SETTINGS['MODEL']
+        tenant_id = tenant_id if tenant_id is not None else current_tenant.get()
+        started = time.monotonic()
+        slot = await self._acquire_async(tenant_id)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = await self._async_client().chat.completions.create(**self._params(messages, model, params))
+                    break
+                except RETRYABLE_ERRORS as e:
+                    delay = self._retry_delay(attempt, e, model)
+                    if delay is None:
+                        self._record(model, failed=True)
+                        raise
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                except openai.OpenAIError:
+                    self._record(model, failed=True)
+                    raise
+        finally:
+            self._release_async(tenant_id, slot)
+        self._record(model, usage=response.usage, latency=time.monotonic() - started)
+        return response.choices[0].message.content
+
+    def astream_chat(self, messages, model=None, tenant_id=None, **params):
+        """Async generator of answer text pieces, see stream_chat()."""
+        tenant_id = tenant_id if tenant_id is not None else current_tenant.get()
+        return self._astream(messages, model or LLM_SETTINGS['MODEL'], tenant_id, params)
+
+    async def _astream(self, messages, model, tenant_id, params):
+        started = time.monotonic()
+        first_token = None
+        usage = None
+        slot = await self._acquire_async(tenant_id)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    stream = await self._async_client().chat.completions.create(
+                        **self._params(messages, model, params, stream=True)
+                    )
+                    break
+                except RETRYABLE_ERRORS as e:
+                    delay = self._retry_delay(attempt, e, model)
+                    if delay is None:
+                        self._record(model, failed=True)
+                        raise
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                except openai.OpenAIError:
+                    self._record(model, failed=True)
+                    raise
+            try:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if first_token is None:
+                            first_token = time.monotonic() - started
+                        yield chunk.choices[0].delta.content
+            except Exception:
+                self._record(model, failed=True)
+                raise
+            finally:
+                await stream.close()
+        finally:
+            self._release_async(tenant_id, slot)
+        self._record(model, usage=usage, latency=time.monotonic() - started, first_token=first_token)
+
+    def chat_many(self, requests, model=None, tenant_id=None, **params):
+        """
+        Run several chats concurrently from synchronous code, e.g. one per text
+        chunk. requests is a list of message lists; answers come back in order.
+        Exceptions are returned in place of the failed answers.
+        """
+        tenant_id = tenant_id if tenant_id is not None else current_tenant.get()
+
+        async def run():
+            try:
+                return await asyncio.gather(
+                    *(self.achat(messages, model=model, tenant_id=tenant_id, **params) for messages in requests),
+                    return_exceptions=True,
+                )
+            finally:
+                await self._close_async_client()
+
+        return async_to_sync(run)()
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+def chat(messages, model=None, tenant_id=None, **params):
+    return get_gateway().chat(messages, model=model, tenant_id=tenant_id, **params)
+
+
+def stream_chat(messages, model=None, tenant_id=None, **params):
+    return get_gateway().stream_chat(messages, model=model, tenant_id=tenant_id, **params)
+
+
+def chat_many(requests, model=None, tenant_id=None, **params):
+    return get_gateway().chat_many(requests, model=model, tenant_id=tenant_id, **params)
+
+
+def sse_response(pieces):
+    """
+    StreamingHttpResponse sending text pieces as server-sent events:
+    `data: {"delta": ...}` per piece, then `event: done` with the full text,
+    or `event: error`.
+    """
+    def events():
+        parts = []
+        try:
+            for piece in pieces:
+                parts.append(piece)
+                yield f"data: {json.dumps({'delta': piece})}\n\n"
+        except Exception as e:
+            print(f"LLM stream failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps({'text': ''.join(parts)})}\n\n"
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx must not buffer the events
+    return response
+
+
+def wants_stream(request, body=None):
+    """Clients opt into SSE with `Accept: text/event-stream` or "stream": true in the body."""
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        return True
+    return bool(body and body.get('stream'))
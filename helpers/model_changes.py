@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import pre_save
+
+# model -> fields whose values before a save some receiver needs
+_TRACKED = {}
+
+
+def track_previous(model, *fields):
+    """
+    Keep the values fields had before each save of model, see previous().
+    Receivers of several apps may track the same model, the row is still
+    read once per save, with the union of their fields.
+    """
+    _TRACKED.setdefault(model, set()).update(fields)
+    pre_save.connect(_snapshot, sender=model, dispatch_uid=f'previous_values_{model._meta.label}')
+
+
+def _snapshot(sender, instance, **kwargs):
+    instance._previous_values = None
+    if instance.pk is not None:
+        instance._previous_values = sender.objects.filter(pk=instance.pk).values(*_TRACKED[sender]).first()
+
+
+def previous(instance):
+    """The tracked values of instance's row before the save in progress, None for a new row."""
+    return getattr(instance, '_previous_values', None)
+
+
+def after_commit(func, *args):
+    # A read on another connection before the commit would not see the change yet
+    transaction.on_commit(lambda: func(*args))
@@ -1,26 +1,23 @@
-import os, json
-from openai import OpenAI
+import json
+from . import llm
 from django.views.decorators.csrf import csrf_exempt
 from .prompts import SYS_PROMPT_1_psyq as SYS_PROMPT_1, SYS_PROMPT_2_psyq as SYS_PROMPT_2, SYS_PROMPT_3
 from django.http import HttpResponse, JsonResponse
 from .graph import get_graph_schema, get_graphConnection
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key = OPENAI_API_KEY)
-
 def LLMlayer(SYS_PROMPT, USER_PROMPT, graph_schema):
     messages = [{"role": "system", "content": SYS_PROMPT}]
     if graph_schema:
         messages.append({"role": "user", "content": graph_schema})
     messages.append({"role": "user", "content": USER_PROMPT})
-    response = client.chat.completions.create(
+    response = llm.chat(
         model="gpt-4o-mini",
         messages=messages
     )
-    return response.choices[0].message.content
+    return response
 
 def correctionLayer(question, cypher_response):
-    response = client.chat.completions.create(
+    response = llm.chat(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": "You are a helpful assistant who answers STRICTLY to what is asked, based on the info provided. DO NOT ADD DATA FROM THE INTERNET. YOU KNOW NOTHING ELSE EXCEPT THE DATA BEING PROVIDED TO YOU. Keep your answers concise and only the required information"},
@@ -28,7 +25,7 @@ def correctionLayer(question, cypher_response):
             {"role": "user", "content":f"""Based on the Nodes OR Relationships, craft a suitable response that also answers to the question: {question}. Keep your response concise."""}
         ]
     )
-    return response.choices[0].message.content
+    return response
 
 def get_node_name_and_id(node):
     type = list(node.labels)[0]
@@ -2,31 +2,27 @@ from .psy_query import query, get_graph_schema
 from .vectorize import query as faiss_query
 from django.views.decorators.csrf import csrf_exempt
 from django.http import HttpResponse
-import json, os
-from openai import OpenAI
+import json
+from . import llm
 from .tables import get_tables_schema
 from analytics.views import ExecuteQueryView
 from .prompts import SYS_PROMPT_QD as SYS_PROMPT
 from .vectors_views import HandleQueryView
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
 graph_path = ""
 graph_schema = get_graph_schema(graph=graph_path)
 
 table_schema = get_tables_schema()
 
 def classify(question):
-    client = OpenAI(api_key=OPENAI_API_KEY)
-
-    response = client.chat.completions.create(
+    response = llm.chat(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": SYS_PROMPT},
             {"role": "user", "content": f" Question: {question}"}
         ]
     )
-    response = response.choices[0].message.content
+    response = response
     print(response)
     return response
 
@@ -0,0 +1,182 @@
+import json
+from collections import namedtuple
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
+
+from simplecrm.tenant_pool import tenant_connection
+
+REPORT_STREAM_SETTINGS = {
+    'CHUNK_SIZE': 2000,     # rows per fetch of the server-side cursor
+    'MAX_LIMIT': 100000,    # largest page a client can ask for with ?limit=
+}
+REPORT_STREAM_SETTINGS.update(getattr(settings, 'REPORT_STREAM', {}))
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+# One list of a row report: key of the rows, key of their count, queryset, values() fields (None: all)
+ReportSection = namedtuple('ReportSection', ['key', 'count_key', 'queryset', 'fields'])
+
+
+def collect_report(sections, after=None, limit=None):
+    """
+    The whole report in one dict, counts taken from the fetched rows instead
+    of a second query. With after/limit only that keyset page is read and
+    next_after is added, as in stream_report().
+    """
+    paged = after is not None or limit is not None
+    report = {}
+    next_after = {}
+    for section in sections:
+        if paged:
+            rows, last = [], None
+            for row, last in _stream_rows(section, after, limit):
+                rows.append(row)
+            next_after[section.key] = last
+        else:
+            queryset = section.queryset
+            rows = list(queryset.values() if section.fields is None else queryset.values(*section.fields))
+        report[section.count_key] = len(rows)
+        report[section.key] = rows
+    if paged:
+        report['next_after'] = next_after
+    return report
+
+
+def keyset_page(queryset, after=None, limit=None):
+    """Rows with a primary key above after, in primary key order, at most limit of them."""
+    queryset = queryset.order_by('pk')
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    if limit is not None:
+        queryset = queryset[:limit]
+    return queryset
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def _stream_rows(section, after, limit):
+    """(row, pk) pairs read through a server-side cursor, CHUNK_SIZE rows per fetch."""
+    queryset = keyset_page(section.queryset, after, limit)
+    chunk_size = REPORT_STREAM_SETTINGS['CHUNK_SIZE']
+    if section.fields is None:
+        pk_name = queryset.model._meta.pk.attname
+        for row in queryset.values().iterator(chunk_size=chunk_size):
+            yield row, row[pk_name]
+    else:
+        # The primary key is needed for next_after even when the report does not show it
+        for row in queryset.values(*section.fields, report_row_pk=F('pk')).iterator(chunk_size=chunk_size):
+            yield row, row.pop('report_row_pk')
+
+
+class _NDJSONReport:
+    """One row per line and, after each section, a {"section", <count key>, "next_after"} line."""
+
+    def __init__(self, sections, after, limit):
+        self.sections, self.after, self.limit = sections, after, limit
+
+    def __iter__(self):
+        for section in self.sections:
+            count, last = 0, None
+            for row, last in _stream_rows(section, self.after, self.limit):
+                count += 1
+                yield _dumps(row) + "\n"
+            yield _dumps({'section': section.key, section.count_key: count, 'next_after': last}) + "\n"
+
+    def error(self, message):
+        return "\n" + _dumps({'error': message}) + "\n"
+
+
+class _JSONReport:
+    """
+    Same keys as collect_report(); counts follow their rows because they are
+    only known at the end. error() closes whatever is open, so a failed
+    stream is still one valid JSON object, with an "error" key.
+    """
+
+    def __init__(self, sections, after, limit):
+        self.sections, self.after, self.limit = sections, after, limit
+        self.started = False
+        self.keys = 0
+        self.in_rows = False
+
+    def __iter__(self):
+        next_after = {}
+        self.started = True
+        yield "{"
+        for section in self.sections:
+            count, last = 0, None
+            yield ("," if self.keys else "") + _dumps(section.key) + ":["
+            self.keys += 1
+            self.in_rows = True
+            for row, last in _stream_rows(section, self.after, self.limit):
+                yield ("," if count else "") + _dumps(row)
+                count += 1
+            self.in_rows = False
+            yield "]," + _dumps(section.count_key) + ":" + str(count)
+            next_after[section.key] = last
+        yield ',"next_after":' + _dumps(next_after) + "}"
+
+    def error(self, message):
+        opening = "]" if self.in_rows else "" if self.started else "{"
+        return opening + ("," if self.keys else "") + '"error":' + _dumps(message) + "}"
+
+
+def stream_report(request, sections, fmt='ndjson', after=None, limit=None):
+    """
+    StreamingHttpResponse of a row report in fmt ('ndjson' or 'json').
+
+    Rows are read with .iterator() on a server-side cursor inside a
+    transaction, so memory stays flat however large the table is. Clients
+    page with ?after=<next_after>&limit=<n> (keyset pagination on the
+    primary key). ndjson sends one row per line and, after each section, a
+    {"section", <count key>, "next_after"} line; json sends the same keys
+    as the buffered report plus next_after per section. A failure after the
+    first byte ends ndjson with an {"error"} line and closes the json object
+    with an "error" key (and without the keys not reached yet).
+
+    The middleware returns the tenant's pooled connection before the body is
+    sent, so the generator borrows one again for as long as it streams.
+    """
+    tenant = getattr(request, 'tenant', None)
+
+    def body():
+        report = (_NDJSONReport if fmt == 'ndjson' else _JSONReport)(sections, after, limit)
+        with ExitStack() as stack:
+            if tenant is not None:
+                stack.enter_context(tenant_connection(tenant.id, tenant.db_user, tenant.db_user_password))
+            try:
+                # Outside a transaction the server-side cursor would be WITH HOLD, materialized at commit
+                with transaction.atomic():
+                    yield from report
+            except Exception as e:
+                # The status line is already sent, the error goes into the body
+                print(f"Report stream failed: {e}")
+                yield report.error(str(e))
+
+    response = StreamingHttpResponse(body(), content_type=CONTENT_TYPES[fmt])
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def page_params(request):
+    """(after, limit) from the query string; raises ValueError for bad values."""
+    after = request.GET.get('after')
+    limit = request.GET.get('limit')
+    after = int(after) if after not in (None, '') else None
+    if limit not in (None, ''):
+        limit = int(limit)
+        if limit < 1 or limit > REPORT_STREAM_SETTINGS['MAX_LIMIT']:
+            raise ValueError(f"limit must be between 1 and {REPORT_STREAM_SETTINGS['MAX_LIMIT']}")
+    else:
+        limit = None
+    return after, limit
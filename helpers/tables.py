@@ -1,6 +1,7 @@
-import psycopg2
 from psycopg2.extras import RealDictCursor
+from .db_pool import get_pool
 from simplecrm.get_column_name import get_model_fields, get_column_mappings
+from simplecrm.column_mapping import resolve_column_mapping
 
 table_mappings = {
     "Lead": "leads_lead",
@@ -17,13 +18,11 @@ table_mappings = {
 }
 
 def get_db_connection():
-    return psycopg2.connect(
-            dbname="nurenpostgres",
-            user="nurenai",
-            password="Biz1nurenWar*",
-            host="nurenaistore.postgres.database.azure.com",
-            port="5432"
-        )
+    """
+    Borrow a connection from the process-wide pool. close() (or leaving a
+    `with get_db_connection() as conn:` block) returns it to the pool.
+    """
+    return get_pool().getconn()
 
 
 def fetch_table(table_name: str):
@@ -121,9 +120,15 @@ def upload_table(data_list: list, model_name: str, tenant_id):
     print("columns: " ,columns)
     fields = get_model_fields(model_name)
     print("model fields: " ,fields)
-    mappings = get_column_mappings(fields, columns)
-    print("mappings: " ,mappings)
     table_name = table_mappings.get(model_name)
+
+    def llm_map(columns, fields):
+        # get_column_mappings answers {field: column}
+        return {column: field for field, column in get_column_mappings(fields, columns).items() if column}
+
+    column_to_field = resolve_column_mapping(tenant_id, table_name, columns, fields, llm_map)
+    mappings = {field: column for column, field in column_to_field.items()}
+    print("mappings: " ,mappings)
     
     for index, item in enumerate(data_list[0]):
         if item in mappings.values():
@@ -3,16 +3,15 @@ import json
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from .tables import get_db_connection, table_mappings
-from openai import OpenAI
+from .bulk_load import CopyLoader
+from simplecrm.column_mapping import resolve_column_mapping
+from . import llm
 import pandas as pd
 import numpy as np
 
 # Assuming df is your DataFrame
 default_timestamp = '1970-01-01 00:00:00'
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
-
 def get_tableFields(table_name):
     query = f"SELECT * FROM {table_name} LIMIT 0"  # Use LIMIT 0 to avoid fetching actual data
     conn = get_db_connection()
@@ -38,42 +37,71 @@ def mappingFunc(list1, list2):
     print("Filtered List2: ", list2_filtered)
 
     try:
-        response = client.chat.completions.create(
+        response = llm.chat(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant who answers STRICTLY to what is asked, based on the info provided. DO NOT ADD DATA FROM THE INTERNET. YOU KNOW NOTHING ELSE EXCEPT THE DATA BEING PROVIDED TO YOU. Keep your answers concise and only the required information"},
                 {"role": "user", "content": f"Map these two lists with each other. List1: {list1_filtered}, List2: {list2_filtered}. Return only the mapped dictionary in JSON format. MAP stage to stage not to stage_id"}
             ]
         )
-        return response.choices[0].message.content
+        return response
     except Exception as e:
         print(f"Error during mapping: {e}")
         raise
 
-def get_stage_id(status, model_name, tenant_id):
+def parse_mapping_response(field_mapping):
+    start = field_mapping.find('{')
+    end = field_mapping.find('}')
+    return json.loads(field_mapping[start:end + 1])
+
+
+def get_field_mapping(tenant_id, table_name, column_names, field_names):
+    """
+    {file column: table field} for an upload. Served from the column mapping
+    cache when this header set was seen before, otherwise columns that match
+    locally skip the LLM and only the rest go through mappingFunc.
+    """
+    fields = [field for field in field_names if field.lower() != 'id']
+    if 'stage_id' in fields:
+        # stage values are names, they are resolved to stage_id after renaming
+        fields.append('stage')
+
+    def llm_map(columns, fields):
+        return parse_mapping_response(mappingFunc(columns, fields))
+
+    return resolve_column_mapping(tenant_id, table_name, column_names, fields, llm_map)
+
+def get_stage_ids(statuses, model_name, tenant_id):
+    """Resolve stage statuses to ids with a single query, returns {status: id} for the ones found."""
+    statuses = tuple(statuses)
+    if not statuses:
+        return {}
     model_name = model_name.lower()
     query = """
-        SELECT id
+        SELECT status, MIN(id)
         FROM stage_stage
-        WHERE status = %s AND model_name = %s AND tenant_id = %s
+        WHERE status IN %s AND model_name = %s AND tenant_id = %s
+        GROUP BY status
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    
+
     try:
-        cursor.execute(query, (status, model_name, tenant_id))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-        else:
-            raise ValueError(f"No stage found with status: {status}, model_name: {model_name}, tenant_id: {tenant_id}")
+        cursor.execute(query, (statuses, model_name, tenant_id))
+        return dict(cursor.fetchall())
     except Exception as e:
-        print(f"Error fetching stage ID: {e}")
+        print(f"Error fetching stage IDs: {e}")
         raise
     finally:
         cursor.close()
         conn.close()
 
+def get_stage_id(status, model_name, tenant_id):
+    stage_ids = get_stage_ids([status], model_name, tenant_id)
+    if status not in stage_ids:
+        raise ValueError(f"No stage found with status: {status}, model_name: {model_name}, tenant_id: {tenant_id}")
+    return stage_ids[status]
+
 def reorder_df_columns_to_match_table(df, table_columns):
     """
     Reorders the columns of the DataFrame to match the order of the columns in the SQL table.
@@ -85,13 +113,71 @@ def reorder_df_columns_to_match_table(df, table_columns):
     print("reordered" ,df_reordered)
     return df_reordered
 
+class UploadError(Exception):
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+
+def prepare_chunk(chunk, field_mapping_json, model_name, tenant_id, stage_ids):
+    """
+    Rename and clean one DataFrame chunk of an upload. stage_ids is shared
+    across chunks so every stage status is looked up only once per upload.
+    """
+    if field_mapping_json is not None:
+        df_new = chunk.rename(columns=field_mapping_json)
+        df_new.fillna({'stage': 'unknown'}, inplace=True)
+    else:
+        df_new = chunk
+
+    timestamp_columns = ['createdOn', 'closedOn', 'interaction_datetime']  # List all your timestamp columns here
+    for col in timestamp_columns:
+        if col in df_new.columns:
+            df_new[col] = df_new[col].replace({np.nan: default_timestamp})
+
+    boolean_columns = ['isActive']  # Add more columns here if needed
+    for col in boolean_columns:
+        if col in df_new.columns:
+            df_new[col] = df_new[col].replace({np.nan: False})  # First replace NaN values
+            df_new[col] = df_new[col].replace({1.0: True, 0.0: False})  # Then replace boolean values
+
+    bigInt_columns = ['account_id', 'createdBy_id', 'name'] #Add columns  here to change value from nan to null (None)
+    for col in bigInt_columns:
+        if col in df_new.columns:
+            df_new[col] = df_new[col].replace({np.nan: None})
+
+    if 'stage' in df_new.columns:
+        df_new['stage'] = df_new['stage'].astype(str)
+        unseen = [status for status in df_new['stage'].unique() if status not in stage_ids]
+        if unseen:
+            try:
+                stage_ids.update(get_stage_ids(unseen, model_name, tenant_id))
+            except Exception as e:
+                raise UploadError(f"Error fetching stage IDs: {e}")
+            missing = [status for status in unseen if status not in stage_ids]
+            if missing:
+                print(f"No stage found for statuses {missing}")
+                raise UploadError(f"No stage found with status: {', '.join(missing)}, model_name: {model_name}, tenant_id: {tenant_id}")
+
+        df_new['stage_id'] = df_new['stage'].map(stage_ids)
+        df_new = df_new.drop(columns=['stage'])  # Remove the "stage" column
+
+    return df_new
+
+
 @csrf_exempt
 def upload_file(request, df):
+    return upload_chunks(request, [df])
+
+
+def upload_chunks(request, chunks):
+    """
+    Map, clean and bulk load an upload given as an iterable of DataFrame chunks.
+    Only one chunk is held in memory at a time, the column mapping is worked
+    out from the first one.
+    """
     if request.method == 'POST':
         try:
-            print("Entering upload file")
-            print("df: ", df[:5])
-            
             model_name = request.POST.get('model_name')
             xls_file = request.FILES.get('file')
             tenant_id = request.headers.get('X-Tenant-Id')
@@ -101,28 +187,25 @@ def upload_file(request, df):
             if not (xls_file.name.endswith('.xls') or xls_file.name.endswith('.xlsx') or xls_file.name.endswith('.csv')):
                 return JsonResponse({"error": "File is not in XLS/XLSX/CSV format"}, status=400)
 
+            chunks = iter(chunks)
+            first_chunk = next(chunks, None)
+            if first_chunk is None:
+                return JsonResponse({"error": "The uploaded file has no rows"}, status=400)
+            print("df: ", first_chunk[:5])
+
+            field_mapping_json = None
             if model_name:
                 try:
                     table_name = table_mappings.get(model_name)
                     field_names = get_tableFields(table_name)
-                    column_names = df.columns.tolist()
+                    column_names = first_chunk.columns.tolist()
                     print(column_names)
                     
                     try:
-                        field_mapping = mappingFunc(column_names, field_names)
+                        field_mapping_json = get_field_mapping(tenant_id, table_name, column_names, field_names)
                     except Exception as e:
                         return JsonResponse({"error": f"Error mapping fields: {e}"}, status=500)
-                    
-                    print("OpenAI response: ", field_mapping)
-                    start = field_mapping.find('{')
-                    end = field_mapping.find('}')
-                    field_mapping = field_mapping[start:end + 1]
-                    field_mapping_json = json.loads(field_mapping)
-                    print(field_mapping_json.values())
-                    df_new = df.rename(columns=field_mapping_json)
-                    df_new.fillna({'stage': 'unknown'}, inplace=True)
-                    # Convert 1.0 to True and 0.0 to False in the DataFrame
-                    # df_new = df_new.replace({1.0: True, 0.0: False})
+                    print("Field mapping: ", field_mapping_json)
 
                 except Exception as e:
                     print(f"Error processing model_name: {e}")
@@ -134,57 +217,27 @@ def upload_file(request, df):
                 except Exception as e:
                     print(f"Error processing file_name: {e}")
                     return JsonResponse({"error": f"Error processing file_name: {e}"}, status=500)
-            
-            timestamp_columns = ['createdOn', 'closedOn', 'interaction_datetime']  # List all your timestamp columns here
-            for col in timestamp_columns:
-                if col in df_new.columns:
-                    df_new[col] = df_new[col].replace({np.nan: default_timestamp})
-            
-            boolean_columns = ['isActive']  # Add more columns here if needed
-            for col in boolean_columns:
-                if col in df_new.columns:
-                    df_new[col] = df_new[col].replace({np.nan: False})  # First replace NaN values
-                    df_new[col] = df_new[col].replace({1.0: True, 0.0: False})  # Then replace boolean values
-
-            bigInt_columns = ['account_id', 'createdBy_id', 'name'] #Add columns  here to change value from nan to null (None)
-            for col in bigInt_columns:
-                if col in df_new.columns:
-                    df_new[col] = df_new[col].replace({np.nan: None})
-
-            if 'stage' in df_new.columns:
-                try:
-                    unique_stages = df_new['stage'].unique()
-                    stage_ids = {}
-
-                    for status in unique_stages:
-                        try:
-                            stage_id = get_stage_id(status, model_name, tenant_id)
-                            stage_ids[status] = stage_id
-                        except Exception as e:
-                            print(f"Error fetching stage ID for status '{status}': {e}")
-                            return JsonResponse({"error": f"Error fetching stage ID for status '{status}': {e}"}, status=500)
-                    
-                    df_new['stage_id'] = df_new['stage'].map(stage_ids)
-                    df_new = df_new.drop(columns=['stage'])  # Remove the "stage" column
-
-                except Exception as e:
-                    print(f"Error processing stage column: {e}")
-                    return JsonResponse({"error": f"Error processing stage column: {e}"}, status=500)
 
+            stage_ids = {}
             try:
+                df_new = prepare_chunk(first_chunk, field_mapping_json, model_name, tenant_id, stage_ids)
                 # Get existing columns from the table and reorder DataFrame columns to match
                 existing_columns = get_tableFields(table_name)
                 df_new = reorder_df_columns_to_match_table(df_new, existing_columns)
                 headers = [header for header in df_new.columns.tolist() if header.lower() != 'id']
                 print("Filtered headers:", headers)
-                
-                df_new = df_new.loc[:, df_new.columns.str.lower() != 'id']
-                data = df_new.values.tolist()
-                print("Filtered data (first row):", data[0])
+            except UploadError as e:
+                return JsonResponse({"error": str(e)}, status=e.status)
             except Exception as e:
                 print(f"Error preparing data: {e}")
                 return JsonResponse({"error": f"Error preparing data: {e}"}, status=500)
 
+            def prepared_rows():
+                yield from df_new[headers].itertuples(index=False, name=None)
+                for chunk in chunks:
+                    prepared = prepare_chunk(chunk, field_mapping_json, model_name, tenant_id, stage_ids)
+                    yield from prepared.reindex(columns=headers).itertuples(index=False, name=None)
+
             column_definitions = ', '.join(f'"{header}" VARCHAR(255)' for header in headers)
             
             create_table_query = f"""
@@ -195,43 +248,32 @@ def upload_file(request, df):
                 );
             """
 
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            try:
-                cur.execute(create_table_query)
-                conn.commit()
-                print("Table created/found")
-
-                for row in data:
-                    values = list(row) + [tenant_id]
-                    insert_query = f"""
-                        INSERT INTO "{table_name}" ({', '.join(f'"{header}"' for header in headers)}, "tenant_id") 
-                        VALUES ({', '.join('%s' for _ in range(len(headers)))}, %s);
-                    """
-
-                    print("Final Values: ", values)
-                    print("Row: ", row)
-                    
-                    try:
-                        cur.execute(insert_query, values)
-                        print("Row inserted")
-                        conn.commit()
-                    except Exception as e:
-                        print(f"Error inserting data: {e}")
-                        conn.rollback()
-                        continue  # Skip this row and continue with the next one
-
-                return JsonResponse({"message": "XLS file uploaded and data inserted successfully", "table_name": table_name}, status=200)
+            with get_db_connection() as conn:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(create_table_query)
+                    conn.commit()
+                    print("Table created/found")
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Error creating table: {e}")
+                    return JsonResponse({"error": f"Error creating table: {e}"}, status=500)
 
-            except Exception as e:
-                conn.rollback()
-                print(f"Error creating table: {e}")
-                return JsonResponse({"error": f"Error creating table: {e}"}, status=500)
+                # COPY the rows in chunks, rows the table rejects are reported instead of aborting the upload
+                loader = CopyLoader(conn, table_name, headers, constants={'tenant_id': tenant_id})
+                try:
+                    loader.load(prepared_rows())
+                    report = loader.finish()
+                except UploadError as e:
+                    loader.abort()
+                    return JsonResponse({"error": str(e), "rows_inserted": loader.rows_loaded}, status=e.status)
+                except Exception as e:
+                    loader.abort()
+                    print(f"Error inserting data: {e}")
+                    return JsonResponse({"error": f"Error inserting data: {e}", "rows_inserted": loader.rows_loaded}, status=500)
 
-            finally:
-                cur.close()
-                conn.close()
+            print(f"Inserted {report['rows_inserted']} rows, rejected {report['rows_rejected']}, {report['rows_per_sec']} rows/sec")
+            return JsonResponse({"message": "XLS file uploaded and data inserted successfully", "table_name": table_name, **report}, status=200)
 
         except Exception as e:
             print(f"Unexpected error: {e}")
@@ -1,88 +1,164 @@
 from django.views.decorators.csrf import csrf_exempt
 from django.http import HttpResponseBadRequest,JsonResponse
-import os, pandas as pd,json, requests
+import os, pandas as pd,json, requests, itertools
+from openpyxl import load_workbook
 from .vectorize import vectorize_FAISS
 from .table_from_img import data_from_image
-from .upload_csv import upload_file
+from .upload_csv import upload_chunks
 
 
-def create_subfile(df, columns_text, merge_columns):
-    print("DataFrame columns: ", df.columns)
+UPLOAD_CHUNK_SIZE = 10000
 
-    def get_column_names(df, indices):
-        return [df.columns[i] for i in indices]
 
-    df_new = df.copy()   
-
-    if merge_columns:
-        try:
-            merge_columns_dict = json.loads(merge_columns)  
-            print("Merge columns dict: ", merge_columns_dict)
-
-            for new_col, indices in merge_columns_dict.items():
-                desc = False
-                if indices[0] == "desc":
-                    desc = True
-                    indices = indices[1:]  
-                    
-                if len(indices) < 2:
-                    return JsonResponse({'error': 'Merge columns should be a list of at least two indices'}, status=400)
+class SubfileSpecError(ValueError):
+    pass
 
-                try:
-                    columns = get_column_names(df, indices)
-                    if desc:
-                        df_new[new_col] = df_new[columns].apply(
-                            lambda x: ', '.join([f'{col}: {val}' for col, val in zip(columns, x)]), axis=1)
-                    else:
-                        df_new[new_col] = df_new[columns].astype(str).agg(', '.join, axis=1)
 
-                    print(f"New column '{new_col}':", df_new[new_col])
-                except IndexError:
-                    return JsonResponse({'error': 'One or more column indices are out of range'}, status=400)
+def parse_subfile_spec(columns, columns_text, merge_columns):
+    """
+    Resolve the index based `columns` / `merge_columns` form fields against the
+    header of the file once, so every chunk can be transformed the same way.
+    """
+    columns = list(columns)
+    merges = []
+    renames = {}
+    selected = None
 
+    if merge_columns:
+        try:
+            merge_columns_dict = json.loads(merge_columns)
         except json.JSONDecodeError as e:
             print("JSONDecodeError:", e)
-            return JsonResponse({'error': 'Invalid JSON format for merge_columns'}, status=400)
-        except Exception as e:
-            print("Exception:", e)
-            return JsonResponse({'error': str(e)}, status=400)
+            raise SubfileSpecError('Invalid JSON format for merge_columns')
+        print("Merge columns dict: ", merge_columns_dict)
+
+        for new_col, indices in merge_columns_dict.items():
+            desc = False
+            if indices[0] == "desc":
+                desc = True
+                indices = indices[1:]
+
+            if len(indices) < 2:
+                raise SubfileSpecError('Merge columns should be a list of at least two indices')
+            try:
+                merges.append((new_col, [columns[i] for i in indices], desc))
+            except IndexError:
+                raise SubfileSpecError('One or more column indices are out of range')
 
     if columns_text:
         try:
             columns_dict = json.loads(columns_text)
-            print("Columns dict:", columns_dict)
-
-            columns_dict_with_names = {}
-            for old_index, new_name in columns_dict.items():
-                try:
-                    old_col = df.columns[int(old_index)]
-                    columns_dict_with_names[old_col] = new_name
-                except IndexError:
-                    return JsonResponse({'error': f'Column index {old_index} is out of range'}, status=400)
-
-            
-            df_new = df_new.rename(columns=columns_dict_with_names)
-
-            
-            df_new = df_new[list(columns_dict.values()) + (list(merge_columns_dict.keys()) if merge_columns else [])]
-
         except json.JSONDecodeError as e:
             print("JSONDecodeError:", e)
-            return JsonResponse({'error': 'Invalid JSON format for columns'}, status=400)
-        except KeyError as e:
-            print("KeyError:", e)
-            return JsonResponse({'error': f'Column {e} not found in the input file'}, status=400)
-        except Exception as e:
-            print("Exception:", e)
-            return JsonResponse({'error': str(e)}, status=400)
-    else:
-        
-        df_new = df
+            raise SubfileSpecError('Invalid JSON format for columns')
+        print("Columns dict:", columns_dict)
+
+        for old_index, new_name in columns_dict.items():
+            try:
+                renames[columns[int(old_index)]] = new_name
+            except IndexError:
+                raise SubfileSpecError(f'Column index {old_index} is out of range')
+        selected = list(columns_dict.values()) + [new_col for new_col, _, _ in merges]
+
+    return {'merges': merges, 'renames': renames, 'selected': selected}
+
+
+def apply_subfile_spec(df, spec):
+    """Apply merges and renames to one chunk with vectorized string operations."""
+    if not spec['merges'] and not spec['renames']:
+        return df
+
+    df_new = df.copy() if spec['merges'] else df
+    for new_col, columns, desc in spec['merges']:
+        parts = [df[col].astype(str).fillna('nan') for col in columns]
+        if desc:
+            parts = [f'{col}: ' + part for col, part in zip(columns, parts)]
+        df_new[new_col] = parts[0].str.cat(parts[1:], sep=', ')
+
+    if spec['renames']:
+        df_new = df_new.rename(columns=spec['renames'])
+    if spec['selected'] is not None:
+        missing = [col for col in spec['selected'] if col not in df_new.columns]
+        if missing:
+            raise KeyError(missing[0])
+        df_new = df_new[spec['selected']]
+    return df_new
+
+
+def create_subfile(df, columns_text, merge_columns):
+    print("DataFrame columns: ", df.columns)
+    try:
+        spec = parse_subfile_spec(df.columns, columns_text, merge_columns)
+        df_new = apply_subfile_spec(df, spec)
+    except SubfileSpecError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except KeyError as e:
+        print("KeyError:", e)
+        return JsonResponse({'error': f'Column {e} not found in the input file'}, status=400)
+    except Exception as e:
+        print("Exception:", e)
+        return JsonResponse({'error': str(e)}, status=400)
 
     print("Final DataFrame created")
     return df_new
 
 
+def iter_csv_chunks(uploaded_file, chunksize=UPLOAD_CHUNK_SIZE):
+    return pd.read_csv(uploaded_file, chunksize=chunksize)
+
+
+def iter_excel_chunks(uploaded_file, chunksize=UPLOAD_CHUNK_SIZE):
+    """
+    Stream an .xlsx sheet with openpyxl's read-only iterator, yielding
+    DataFrames of at most `chunksize` rows.
+    """
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            row = row[:len(columns)]
+            batch.append(row + (None,) * (len(columns) - len(row)))
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def transformed_chunks(chunks, columns_text, merge_columns):
+    """Apply the columns/merge_columns spec, parsed from the first chunk, to every chunk."""
+    spec = None
+    for chunk in chunks:
+        if spec is None:
+            print("DataFrame columns: ", chunk.columns)
+            spec = parse_subfile_spec(chunk.columns, columns_text, merge_columns)
+        yield apply_subfile_spec(chunk, spec)
+
+
+def upload_spreadsheet(request, chunks, columns_text, merge_columns):
+    chunks = transformed_chunks(chunks, columns_text, merge_columns)
+    try:
+        first_chunk = next(chunks, None)
+    except SubfileSpecError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except KeyError as e:
+        return JsonResponse({'error': f'Column {e} not found in the input file'}, status=400)
+
+    if first_chunk is None:
+        return JsonResponse({'error': 'The uploaded file has no rows'}, status=400)
+    return upload_chunks(request, itertools.chain([first_chunk], chunks))
+
+
 @csrf_exempt
 def dispatcher(request):
     try:
@@ -118,7 +194,7 @@ def dispatcher(request):
                     return JsonResponse({'error': 'Input file must be provided'}, status=400)
 
                 try:
-                    df = pd.read_csv(uploaded_file)
+                    chunks = iter_csv_chunks(uploaded_file)
                 except pd.errors.EmptyDataError:
                     return JsonResponse({'error': 'The CSV file is empty'}, status=400)
                 except pd.errors.ParserError:
@@ -127,8 +203,9 @@ def dispatcher(request):
                     return JsonResponse({'error': f"Error reading CSV file: {str(e)}"}, status=400)
 
                 try:
-                    new_df = create_subfile(df, columns_text, merge_columns)
-                    return upload_file(request, new_df)
+                    return upload_spreadsheet(request, chunks, columns_text, merge_columns)
+                except pd.errors.ParserError:
+                    return JsonResponse({'error': 'Error parsing CSV file'}, status=400)
                 except Exception as e:
                     return JsonResponse({'error': f"Error processing CSV file: {str(e)}"}, status=500)
 
@@ -138,13 +215,16 @@ def dispatcher(request):
                     return JsonResponse({'error': 'Input file must be provided'}, status=400)
 
                 try:
-                    df = pd.read_excel(uploaded_file)
+                    if file_extension == '.xlsx':
+                        chunks = iter_excel_chunks(uploaded_file)
+                    else:
+                        # openpyxl cannot read legacy .xls files, those are read in one go
+                        chunks = [pd.read_excel(uploaded_file)]
                 except Exception as e:
                     return JsonResponse({'error': f"Error reading Excel file: {str(e)}"}, status=400)
 
                 try:
-                    new_df = create_subfile(df, columns_text=columns_text, merge_columns=merge_columns)
-                    return upload_file(request, new_df)
+                    return upload_spreadsheet(request, chunks, columns_text, merge_columns)
                 except Exception as e:
                     return JsonResponse({'error': f"Error processing Excel file: {str(e)}"}, status=500)
 
@@ -0,0 +1,221 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+
+from .tables import get_db_connection
+
+VECTOR_INDEX_SETTINGS = {
+    'METHOD': "ivfflat",            # or "hnsw"
+    'OPS': "vector_cosine_ops",
+    'MIN_ROWS': 10000,              # below this a sequential scan is exact and fast enough
+    'REBUILD_GROWTH': 2.0,          # rebuild ivfflat once the table grew this much since the last build
+    'HNSW_M': 16,
+    'HNSW_EF_CONSTRUCTION': 64,
+    'MAINTENANCE_WORK_MEM': "512MB",
+    'TABLES': ["text_embeddings", "text_embeddings_anky"],
+}
+VECTOR_INDEX_SETTINGS.update(getattr(settings, 'VECTOR_INDEX', {}))
+
+STATE_TABLE = "vector_index_state"
+MAX_INDEX_DIMENSIONS = 2000  # ivfflat and hnsw limit for the vector type
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def ivfflat_lists(row_count):
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above."""
+    if row_count <= 1000000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def index_name(table_name, column):
+    return f"{table_name}_{column}_idx"
+
+
+def _ensure_state_table(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            index_name TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            method TEXT NOT NULL,
+            lists INTEGER,
+            row_count BIGINT NOT NULL,
+            built_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def _dimensions(cursor, table_name, column):
+    # For vector(n) columns the type modifier is n
+    cursor.execute(
+        "SELECT atttypmod FROM pg_attribute WHERE attrelid = %s::regclass AND attname = %s",
+        [_quote(table_name), column]
+    )
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def _estimated_rows(cursor, table_name):
+    # Planner estimate plus rows inserted since the last ANALYZE; a count(*) would scan the whole table
+    cursor.execute(
+        """
+        SELECT GREATEST(c.reltuples::bigint, COALESCE(s.n_live_tup, 0))
+        FROM pg_class c LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE c.oid = %s::regclass
+        """,
+        [_quote(table_name)]
+    )
+    return cursor.fetchone()[0]
+
+
+def _plan(cursor, table_name, column):
+    method = VECTOR_INDEX_SETTINGS['METHOD']
+    name = index_name(table_name, column)
+
+    row_count = _estimated_rows(cursor, table_name)
+    cursor.execute("SELECT 1 FROM pg_indexes WHERE tablename = %s AND indexname = %s", [table_name, name])
+    exists = cursor.fetchone() is not None
+    cursor.execute(f"SELECT method, row_count FROM {STATE_TABLE} WHERE index_name = %s", [name])
+    state = cursor.fetchone()
+
+    if row_count < VECTOR_INDEX_SETTINGS['MIN_ROWS']:
+        # An ivfflat index trained on a handful of rows only costs recall
+        return ('drop' if exists else 'none'), row_count
+    if _dimensions(cursor, table_name, column) > MAX_INDEX_DIMENSIONS:
+        print(f"{table_name}.{column} has more than {MAX_INDEX_DIMENSIONS} dimensions, pgvector cannot index it")
+        return ('drop' if exists else 'none'), row_count
+    if not exists or state is None or state[0] != method:
+        return 'build', row_count
+    if method == 'ivfflat' and row_count >= state[1] * VECTOR_INDEX_SETTINGS['REBUILD_GROWTH']:
+        return 'build', row_count
+    return 'none', row_count
+
+
+def ensure_vector_index(table_name, column='embedding'):
+    """
+    Build, rebuild or drop the vector index of table_name.column depending on
+    its estimated row count. Indexes are built CONCURRENTLY under a temporary
+    name and swapped in within one transaction, so searches keep working and
+    always find an index while this runs. Maintenance of a table runs in one
+    worker at a time (advisory lock), others skip it. Returns a report.
+    """
+    name = index_name(table_name, column)
+    method = VECTOR_INDEX_SETTINGS['METHOD']
+    started = time.monotonic()
+    action, row_count, lists = 'skipped', None, None
+
+    with get_db_connection() as conn:
+        # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            # Session lock, released below: the connection goes back to the pool afterwards
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [f"{STATE_TABLE}:{table_name}"])
+            if cursor.fetchone()[0]:
+                try:
+                    action, row_count, lists = _maintain(cursor, table_name, column, name, method)
+                finally:
+                    cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [f"{STATE_TABLE}:{table_name}"])
+
+    report = {
+        'table': table_name,
+        'index': name,
+        'action': action,
+        'method': method,
+        'rows': row_count,
+        'lists': lists,
+        'elapsed_seconds': round(time.monotonic() - started, 3),
+    }
+    print(f"Vector index maintenance: {report}")
+    return report
+
+
+def _maintain(cursor, table_name, column, name, method):
+    _ensure_state_table(cursor)
+    action, row_count = _plan(cursor, table_name, column)
+    lists = None
+
+    if action == 'drop':
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_quote(name)}")
+        cursor.execute(f"DELETE FROM {STATE_TABLE} WHERE index_name = %s", [name])
+
+    elif action == 'build':
+        new_name = f"{name}_new"
+        old_name = f"{name}_old"
+        if method == 'hnsw':
+            options = f"m = {int(VECTOR_INDEX_SETTINGS['HNSW_M'])}, ef_construction = {int(VECTOR_INDEX_SETTINGS['HNSW_EF_CONSTRUCTION'])}"
+        else:
+            lists = ivfflat_lists(row_count)
+            options = f"lists = {lists}"
+
+        cursor.execute("SET maintenance_work_mem = %s", [VECTOR_INDEX_SETTINGS['MAINTENANCE_WORK_MEM']])
+        # Leftovers of a failed build; no other worker holds the lock, so nothing is building them
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_quote(new_name)}")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_quote(old_name)}")
+        cursor.execute(
+            f"CREATE INDEX CONCURRENTLY {_quote(new_name)} ON {_quote(table_name)} "
+            f"USING {method} ({_quote(column)} {VECTOR_INDEX_SETTINGS['OPS']}) WITH ({options})"
+        )
+        # Both renames commit together, searches see the old index or the new one
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute(f"ALTER INDEX IF EXISTS {_quote(name)} RENAME TO {_quote(old_name)}")
+            cursor.execute(f"ALTER INDEX {_quote(new_name)} RENAME TO {_quote(name)}")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_quote(old_name)}")
+        cursor.execute("RESET maintenance_work_mem")
+        cursor.execute(
+            f"""
+            INSERT INTO {STATE_TABLE} (index_name, table_name, method, lists, row_count, built_at)
+            VALUES (%s, %s, %s, %s, %s, now())
+            ON CONFLICT (index_name) DO UPDATE SET
+                method = EXCLUDED.method, lists = EXCLUDED.lists,
+                row_count = EXCLUDED.row_count, built_at = EXCLUDED.built_at
+            """,
+            [name, table_name, method, lists, row_count]
+        )
+
+    return action, row_count, lists
+
+
+def forget_vector_index(table_name, column='embedding'):
+    """Drop the recorded build state, e.g. after the vector column was replaced."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            _ensure_state_table(cursor)
+            cursor.execute(f"DELETE FROM {STATE_TABLE} WHERE index_name = %s", [index_name(table_name, column)])
+
+
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def schedule_index_maintenance(table_name, column='embedding'):
+    """
+    Run ensure_vector_index() in a background thread so uploads do not wait
+    for index builds. A table already being maintained is not queued twice.
+    """
+    key = (table_name, column)
+    with _scheduled_lock:
+        if key in _scheduled:
+            return False
+        _scheduled.add(key)
+
+    def run():
+        try:
+            ensure_vector_index(table_name, column)
+        except Exception as e:
+            print(f"Vector index maintenance failed for {table_name}: {e}")
+        finally:
+            with _scheduled_lock:
+                _scheduled.discard(key)
+
+    threading.Thread(target=run, name=f"vector-index-{table_name}", daemon=True).start()
+    return True
@@ -0,0 +1,117 @@
+from django.conf import settings
+
+from .tables import get_db_connection
+from .vector_store import vector_literal
+
+VECTOR_SEARCH_SETTINGS = {
+    'EF_SEARCH': 40,                   # hnsw.ef_search, candidates kept while walking the graph
+    'PROBES': 10,                      # ivfflat.probes, lists scanned per query
+    'MAX_EF_SEARCH': 1000,             # upper bounds for per-request overrides
+    'MAX_PROBES': 200,
+    'ITERATIVE_SCAN': "relaxed_order", # pgvector >= 0.8, keeps scanning the index until filtered rows fill k
+}
+VECTOR_SEARCH_SETTINGS.update(getattr(settings, 'VECTOR_SEARCH', {}))
+
+_pgvector_version = None
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _condition(column, value):
+    """SQL and params of one filter; a list or tuple of values matches any of them, None matches NULL."""
+    values = list(value) if isinstance(value, (list, tuple)) else [value]
+    parts, params = [], []
+    present = [item for item in values if item is not None]
+    if len(present) == 1:
+        parts.append(f"{_quote(column)} = %s")
+        params.append(present[0])
+    elif present:
+        parts.append(f"{_quote(column)} = ANY(%s)")
+        params.append(present)
+    if len(present) < len(values):
+        parts.append(f"{_quote(column)} IS NULL")
+    return "(" + (" OR ".join(parts) or "FALSE") + ")", params
+
+
+def _search_width(value, name, default, maximum):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{name} must be an integer")
+    try:
+        width = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+    return max(1, min(width, maximum))
+
+
+def search_widths(ef_search=None, probes=None):
+    """
+    (ef_search, probes) with defaults for missing values, clamped to
+    1..MAX_*. Raises ValueError for values that are not integers.
+    """
+    return (
+        _search_width(ef_search, 'ef_search', VECTOR_SEARCH_SETTINGS['EF_SEARCH'], VECTOR_SEARCH_SETTINGS['MAX_EF_SEARCH']),
+        _search_width(probes, 'probes', VECTOR_SEARCH_SETTINGS['PROBES'], VECTOR_SEARCH_SETTINGS['MAX_PROBES']),
+    )
+
+
+def _supports_iterative_scan(cursor):
+    global _pgvector_version
+    if _pgvector_version is None:
+        cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cursor.fetchone()
+        _pgvector_version = tuple(int(part) for part in row[0].split('.')[:2]) if row else (0, 0)
+    return _pgvector_version >= (0, 8)
+
+
+def nearest(table_name, query_embedding, k=10, columns=('id',), filters=None,
+            max_distance=None, ef_search=None, probes=None, vector_column='embedding'):
+    """
+    Top k rows of table_name by cosine distance to query_embedding.
+
+    The inner query is the plain `ORDER BY embedding <=> q LIMIT k` form that
+    ivfflat and HNSW indexes can serve; max_distance is applied to its result
+    only, a WHERE on the distance expression would force a sequential scan.
+    filters ({column: value}) are equality conditions on metadata columns such
+    as tenant_id, evaluated during the index scan; a tuple value matches any
+    of its values, None matching NULL.
+    ef_search / probes override the index search width for this query only,
+    see search_widths().
+
+    Returns rows of `columns` + distance, closest first.
+    """
+    ef_search, probes = search_widths(ef_search, probes)
+    filters = filters or {}
+
+    vector = vector_literal(query_embedding)
+    select_list = ', '.join(_quote(column) for column in columns)
+    conditions = [_condition(column, value) for column, value in filters.items()]
+    where = ' AND '.join(sql for sql, _ in conditions)
+    query = f"""
+        SELECT * FROM (
+            SELECT {select_list}, {_quote(vector_column)} <=> %s::vector AS distance
+            FROM {_quote(table_name)}
+            {'WHERE ' + where if where else ''}
+            ORDER BY {_quote(vector_column)} <=> %s::vector
+            LIMIT %s
+        ) nearest
+        {'WHERE distance < %s' if max_distance is not None else ''}
+        ORDER BY distance
+    """
+    params = [vector] + [param for _, condition_params in conditions for param in condition_params] + [vector, k]
+    if max_distance is not None:
+        params.append(max_distance)
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            # SET LOCAL only lasts for this transaction, the pooled connection keeps its defaults
+            cursor.execute("SET LOCAL hnsw.ef_search = %s", [ef_search])
+            cursor.execute("SET LOCAL ivfflat.probes = %s", [probes])
+            if filters and VECTOR_SEARCH_SETTINGS['ITERATIVE_SCAN'] and _supports_iterative_scan(cursor):
+                cursor.execute("SET LOCAL hnsw.iterative_scan = %s", [VECTOR_SEARCH_SETTINGS['ITERATIVE_SCAN']])
+                cursor.execute("SET LOCAL ivfflat.iterative_scan = %s", [VECTOR_SEARCH_SETTINGS['ITERATIVE_SCAN']])
+            cursor.execute(query, params)
+            return cursor.fetchall()
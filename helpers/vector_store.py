@@ -0,0 +1,44 @@
+import csv
+import io
+
+NULL_MARKER = '\\N'
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def vector_literal(embedding):
+    """pgvector text input format: '[0.1,0.2,...]'."""
+    return '[' + ','.join(str(float(value)) for value in embedding) + ']'
+
+
+def write_vectors(cursor, table_name, columns, rows, vector_columns=('embedding',)):
+    """
+    Bulk insert rows into table_name with one COPY FROM STDIN.
+
+    rows are sequences in `columns` order. Values of `vector_columns` can be
+    lists or numpy arrays, pgvector parses their text form on the server.
+    Returns the number of rows written. The caller commits.
+    """
+    vector_positions = {i for i, column in enumerate(columns) if column in vector_columns}
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for row in rows:
+        writer.writerow([
+            NULL_MARKER if value is None else vector_literal(value) if i in vector_positions else value
+            for i, value in enumerate(row)
+        ])
+        count += 1
+    if not count:
+        return 0
+    buffer.seek(0)
+
+    column_list = ', '.join(_quote(column) for column in columns)
+    cursor.copy_expert(
+        f"COPY {_quote(table_name)} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')",
+        buffer
+    )
+    return count
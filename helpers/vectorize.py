@@ -1,13 +1,17 @@
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
-import os, psycopg2, pymupdf, json, io, pdfplumber
-from openai import OpenAI
+import psycopg2, pymupdf, json, io, pdfplumber, time
+from . import llm
 import numpy as np
 from .tables import get_db_connection
+from .embeddings import embed_texts_with_report, CachedEmbeddings
+from .vector_store import write_vectors
+from .vector_index import schedule_index_maintenance
+from .vector_search import nearest
+from .embedding_models import EMBEDDING_MODELS, table_model, embed_query_for_table, lock_table_model, write_for_table
 from .prompts import whatsapp_prompts
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from analytics.models import userData
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
 def split_file(pdf_file): 
@@ -30,42 +34,46 @@ def split_file(pdf_file):
 
     return texts
 
-def get_embeddings(chunks):
-    embeddings = []
-    for chunk in chunks:
-        response = client.embeddings.create(input=chunk, model="text-embedding-3-small")
-        embeddings.append(response.data[0].embedding)
-    print("Successfully created embeddings out of chunks")
-    return embeddings
+def get_embeddings(chunks, model):
+    embeddings, report = embed_texts_with_report(chunks, model=model)
+    print(f"Successfully created embeddings out of chunks, cache: {report}")
+    return embeddings, report
+
+def ensure_text_embeddings_table(cur, model):
+    # Sized for the table's current model, not a fixed 1536
+    cur.execute(f'''
+        CREATE TABLE IF NOT EXISTS text_embeddings (
+            id SERIAL PRIMARY KEY,
+            chunk TEXT,
+            embedding vector({int(EMBEDDING_MODELS[model])})
+        )
+    ''')
+
+def write_chunks(conn, chunks, model, embeddings):
+    # Checked against the table's model under lock, re-embedded if it was switched meanwhile
+    write_for_table(
+        conn, "text_embeddings", model, chunks, embeddings,
+        lambda cur, embeddings: write_vectors(cur, "text_embeddings", ["chunk", "embedding"], zip(chunks, embeddings))
+    )
 
 def vectorize(pdf_file):
     try:
         
         chunks = split_file(pdf_file)
-        embeddings = get_embeddings(chunks)
+        model = table_model("text_embeddings", fresh=True)
+        embeddings, cache_report = get_embeddings(chunks, model)
 
         conn = get_db_connection()
         cur = conn.cursor()
         
-        cur.execute('''
-        CREATE TABLE IF NOT EXISTS text_embeddings (
-            id SERIAL PRIMARY KEY,
-            chunk TEXT,
-            embedding vector(1536)
-        )
-        ''')
+        ensure_text_embeddings_table(cur, model)
         conn.commit()
 
         # Insert embeddings into the table
-        for i, chunk in enumerate(chunks):
-            embedding_array = np.array(embeddings[i])
-            cur.execute(
-                "INSERT INTO text_embeddings (chunk, embedding) VALUES (%s, %s::vector)",
-                (chunk, embedding_array.tolist())
-            )
-        conn.commit()
+        write_chunks(conn, chunks, model, embeddings)
+        schedule_index_maintenance("text_embeddings")
         print("Text Vectorized Successfullly")
-        return JsonResponse({"status": 200, "message": "Text vectorized successfully"})
+        return JsonResponse({"status": 200, "message": "Text vectorized successfully", "embedding_cache": cache_report})
 
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -79,28 +87,18 @@ def vectorize(pdf_file):
 
 def process_chunks(chunks):
     try:
-        embeddings = get_embeddings(chunks)
+        model = table_model("text_embeddings", fresh=True)
+        embeddings, _ = get_embeddings(chunks, model)
 
         conn = get_db_connection()
         cur = conn.cursor()
         
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS text_embeddings (
-                id SERIAL PRIMARY KEY,
-                chunk TEXT,
-                embedding vector(1536)
-            )
-        ''')
+        ensure_text_embeddings_table(cur, model)
         conn.commit()
 
         # Insert embeddings into the table
-        for i, chunk in enumerate(chunks):
-            embedding_array = np.array(embeddings[i])
-            cur.execute(
-                "INSERT INTO text_embeddings (chunk, embedding) VALUES (%s, %s::vector)",
-                (chunk, embedding_array.tolist())
-            )
-        conn.commit()
+        write_chunks(conn, chunks, model, embeddings)
+        schedule_index_maintenance("text_embeddings")
         return True
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -113,22 +111,19 @@ def process_chunks(chunks):
             conn.close()
 
 def get_query_embedding(query):
-    response = client.embeddings.create(
-        input=query,
-        model="text-embedding-ada-002"
-    )
-    embedding = response.data[0].embedding
-    print(type(embedding))
-    return embedding
+    # Same model the stored chunks were embedded with
+    return embed_query_for_table("text_embeddings", query)
 
-def store_chunk_embedding(chunk, embedding):
+def store_chunk_embedding(chunk, embedding, model):
+    """embedding is the chunk embedded with model; refused if text_embeddings switched to another model since."""
     try:
         # Database connection details
         with get_db_connection() as conn:
             with conn.cursor() as cur:
+                lock_table_model(cur, "text_embeddings", model)
                 # Insert the chunk and its embedding into the table
                 cur.execute(
-                    "INSERT INTO text_embeddings (chunk, embedding) VALUES (%s, %s::vector(1536))",
+                    "INSERT INTO text_embeddings (chunk, embedding) VALUES (%s, %s::vector)",
                     (chunk, embedding)
                 )
                 conn.commit()
@@ -137,31 +132,10 @@ def store_chunk_embedding(chunk, embedding):
     return []
 
 # Function to perform cosine similarity search using pgvector
-def perform_cosine_similarity_search(query_embedding):
+def perform_cosine_similarity_search(query_embedding, k=10):
     try:
-        # Database connection details
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                # Convert query embedding to string format for SQL
-                query_embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
-                print("query embedding string: ", query_embedding_str)
-                # Perform the cosine similarity search
-                
-                cur.execute(
-                    f"""
-                    SELECT
-                        te.id,
-                        te.chunk AS most_similar_chunk,
-                        (te.embedding::vector) <=> %s AS similarity_score
-                    FROM
-                        text_embeddings te
-                    ORDER BY (te.embedding::vector) <=> %s DESC
-                    LIMIT 10;
-                    """,
-                    (query_embedding_str, query_embedding_str)
-                )
-                results = cur.fetchall()
-                return results
+        # Closest chunks first; the ORDER BY ... LIMIT form lets the vector index serve it
+        return nearest("text_embeddings", query_embedding, k=k, columns=('id', 'chunk'))
     except psycopg2.Error as e:
         print(f"Error: {e}")
     return []
@@ -182,7 +156,7 @@ def process_and_search_similar_queries(query):
 
 def make_openai_call(combined_query, query_string, userJSON):
     print(combined_query, query_string, userJSON)
-    response = client.chat.completions.create(
+    answer = llm.chat(
         model="gpt-3.5-turbo",
         messages=[
             {"role": "system", "content": "You are a helpful assistant. Reply to the point. Dont include any apologies or explanations in your replies."},
@@ -191,7 +165,6 @@ def make_openai_call(combined_query, query_string, userJSON):
             {"role": "user", "content": "{}".format(query_string)}
         ]
     )
-    answer = response.choices[0].message.content
     print("answer: ", answer)
     return answer
 
@@ -219,30 +192,70 @@ def query(request):
     userJSON_serialized = json.dumps(userJSON_list) 
     print("user json: ", userJSON_serialized)
 
-    similar_chunks = get_similar_chunks_using_faiss(query_string, userJSON_serialized)
-    combined_query = ""
-
-    if similar_chunks:
-        combined_query = " ".join([doc.page_content for doc in similar_chunks])
+    try:
+        answer, cache_status = answer_query(query_string, userJSON_serialized, tenant_id, req_body.get("index_name"))
+    except FAISSIndex.DoesNotExist:
+        return JsonResponse({"status": 404, "answer": "No document index found for this tenant."}, status=404)
+    except Exception as e:
+        return JsonResponse({"status": 500, "message": f"Error processing query: {str(e)}"})
 
-        try:
-            openai_response = make_openai_call(combined_query, query_string, userJSON_serialized)
-            return HttpResponse(openai_response, status = 200)
-        except Exception as e:
-            return JsonResponse({"status": 500, "message": f"Error processing query: {str(e)}"})
+    if answer is None:
+        return JsonResponse({"status": 404, "answer": "No relevant answers found."})
 
+    response = HttpResponse(answer, status = 200)
+    response["X-Answer-Cache"] = cache_status
+    return response
+
+def answer_query(query_string, userJSON, tenant_id=None, name=None):
+    """
+    Answer a query from a tenant's FAISS index, returns (answer, cache status).
+    answer is None when no relevant chunk was found.
+
+    Keys contain the normalized question, the tenant and the index version.
+    The retrieved chunks depend on those only and are shared by all users.
+    Answers are personalized with userJSON, so they are cached per user data.
+    cache status is "answer" (no embedding or completion call), "retrieval"
+    (completion call only) or "miss".
+    """
+    index_id, version = faiss_registry.resolve(tenant_id, name)
+    question = normalize_question(query_string)
+    retrieval_key = cache_key('retrieval', tenant_id, index_id, version, question)
+    answer_key = cache_key('answer', tenant_id, index_id, version, question, content_hash(userJSON))
+
+    cached = answer_cache.get(answer_key)
+    if cached is not None:
+        answer_cache.record('answer', cached[1])
+        return cached[0]['answer'], 'answer'
+
+    started = time.monotonic()
+    cached = answer_cache.get(retrieval_key)
+    if cached is not None:
+        chunks, retrieval_seconds = cached[0]['chunks'], cached[1]
+        answer_cache.record('retrieval', retrieval_seconds)
+        cache_status = 'retrieval'
     else:
-        return JsonResponse({"status": 404, "answer": "No relevant answers found."})
+        chunks = [doc.page_content for doc in get_similar_chunks_using_faiss(query_string, tenant_id, name)]
+        retrieval_seconds = time.monotonic() - started
+        answer_cache.set(retrieval_key, {'chunks': chunks}, retrieval_seconds)
+        answer_cache.record()
+        cache_status = 'miss'
+
+    if not chunks:
+        return None, cache_status
+
+    started = time.monotonic()
+    answer = make_openai_call(" ".join(chunks), query_string, userJSON)
+    answer_cache.set(answer_key, {'answer': answer}, retrieval_seconds + time.monotonic() - started)
+    return answer, cache_status
 
 def get_docs():
 
     query = "SELECT chunk from text_embeddings"
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(query)
-
-    result = cursor.fetchall()
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            result = cursor.fetchall()
 
     chunks = [row[0] for row in result]
 
@@ -250,21 +263,16 @@ def get_docs():
 
 from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
-from langchain_community.embeddings import OpenAIEmbeddings
 from analytics.models import FAISSIndex
-
-def get_similar_chunks_using_faiss(query, userJSON):
-    name = "hotels in india.pdf"
-
-    index_data = FAISSIndex.objects.get(name = name)
-    embeddings =  OpenAIEmbeddings()
-    library = FAISS.deserialize_from_bytes(index_data.index_data, embeddings, allow_dangerous_deserialization=True)
-
-    print("Library: ", library)
-    print("FAISS library created.")
-    query = query + json.dumps(userJSON)
-
-    answer = library.similarity_search(query)
+from .faiss_registry import faiss_registry
+from .faiss_segments import append_segment, schedule_compaction
+from .hybrid_search import hybrid_search
+from .answer_cache import answer_cache, cache_key, normalize_question
+from .embedding_cache import content_hash
+
+def get_similar_chunks_using_faiss(query, tenant_id=None, name=None):
+    # Vector search on the resident index fused with full-text search over the same chunks
+    answer = hybrid_search(query, tenant_id, name)
     print(f"Answer retrieved: {answer}")
 
     return answer
@@ -278,35 +286,20 @@ def vectorize_FAISS(pdf_file, file_name, json_data, tenant_id):
     
     doc_objects = [Document(page_content=chunk) for chunk in chunks]
     
-    embedding = OpenAIEmbeddings()
+    # Same model as OpenAIEmbeddings(), chunks embedded before come from the embedding cache
+    embedding = CachedEmbeddings(model="text-embedding-ada-002")
     print("Embeddings created.")
 
-    try:
-        existing_faiss_index = FAISSIndex.objects.get(name=name)
-        print("Existing FAISS index found. Updating it.")
-        
-        existing_library = FAISS.deserialize_from_bytes(existing_faiss_index.index_data, embeddings= embedding, allow_dangerous_deserialization=True)
-        
-        existing_library.add_documents(doc_objects)
-        
-        serialized_index = existing_library.serialize_to_bytes()
-        
-        existing_faiss_index.index_data = serialized_index
-        existing_faiss_index.save()
-        print("Existing FAISS index updated.")
-        
-    except FAISSIndex.DoesNotExist:
-        print("No existing FAISS index found. Creating a new one.")
-        
-        library = FAISS.from_documents(doc_objects, embedding)
-        
-        serialized_index = library.serialize_to_bytes()
-        
-        faiss_index = FAISSIndex(name=name, index_data=serialized_index, json_data = json_data, tenant_id = tenant_id)
-        faiss_index.save()
-        print("New FAISS index saved.")
+    # Only the new documents are embedded and written, as a new segment of the index
+    library = FAISS.from_documents(doc_objects, embedding)
+    faiss_index, segment, version = append_segment(name, tenant_id, library, len(doc_objects), json_data=json_data)
+    print(f"FAISS index {faiss_index.pk} now at version {version}, added segment {segment.pk}.")
+
+    faiss_registry.add_segment(faiss_index.pk, version, segment.pk, library, segment.nbytes)
+    schedule_compaction(faiss_index.pk, embedding)
 
-    return JsonResponse({"status": 200, "message": "Text vectorized successfully"})
+    print(f"Embedding cache: {embedding.last_report}")
+    return JsonResponse({"status": 200, "message": "Text vectorized successfully", "embedding_cache": embedding.last_report})
 
 
 @csrf_exempt
@@ -322,7 +315,9 @@ def handle_media_uploads(request):
             user_data = json.loads(user_data)
             user_data['tenant_id'] = tenant_id
             
-            existing_faiss_index = FAISSIndex.objects.get(tenant_id = tenant_id)
+            # Tenants can have several indexes, ?index_name= picks one, otherwise the most recently updated
+            index_id, _ = faiss_registry.resolve(tenant_id, request.GET.get('index_name'))
+            existing_faiss_index = FAISSIndex.objects.get(pk=index_id)
 
             required_fields = list(json.loads(existing_faiss_index.json_data).values())
             print("Req fields: ", required_fields)
@@ -380,13 +375,12 @@ def handle_media_uploads(request):
                     }
                 ]
             }
-            response = client.chat.completions.create(
+            answer = llm.chat(
                 model="gpt-4o-mini",
                 messages= payload['messages']
             )
 
-            if response.choices:
-                answer = response.choices[0].message.content
+            if answer:
                 start_index = answer.find('{')
                 end_index = answer.rfind('}') + 1
                 answer = answer[start_index:end_index].strip()
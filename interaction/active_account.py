@@ -4,12 +4,13 @@ from accounts.models import Account
 from contacts.models import Contact
 from django.db.models.functions import Coalesce
 from leads.models import Lead
-from django.db.models import Count, Sum, OuterRef, Subquery, Value
+from django.db.models import Count, OuterRef, Subquery, Value
 from django.http import JsonResponse
 from interaction.models import Interaction
 from accounts import serializers as accser
 from contacts import serializers as conser
-from leads.models import Stage
+from stage.cache import get_stage, get_stages
+from analytics.rollup import rollup
 
 AccountSerializer=accser.AccountSerializer
 ContactSerializer=conser.ContactSerializer
@@ -92,24 +93,29 @@ def get_most_active_contacts(request):
 
 def get_lead_summation(request):
     try:
-        # Filter stages to include only those related to leads
-        lead_stages = Stage.objects.filter(model_name='lead')
+        tenant_id = request.headers.get('X-Tenant-Id')
+        if not tenant_id:
+            return JsonResponse({'error': 'Tenant ID is required in headers'}, status=400)
+
+        # Lead counts and amounts per stage come from the daily rollup, O(days) rows instead of every lead
+        by_stage = rollup.totals(tenant_id, 'leads_by_stage', by_dimension=True)
 
-        # Aggregate the total opportunity amount and lead count for each stage
-        stages = lead_stages.values('status').annotate(
-            total_amount=Sum('lead__opportunity_amount'),
-            lead_count=Count('lead__id')
-        ).order_by('status')
-        
         # Initialize the status dictionary with all possible lead statuses
         status_dict = {status[0]: {'total_amount': 0, 'lead_count': 0} for status in LEAD_STATUS}
 
-        # Update the status dictionary with aggregated data from the query
-        for stage in stages:
-            status_dict[stage['status']] = {
-                'total_amount': stage['total_amount'] or 0,
-                'lead_count': stage['lead_count'] or 0
-            }
+        for stage in get_stages(tenant_id, 'lead'):
+            status_dict.setdefault(stage['status'], {'total_amount': 0, 'lead_count': 0})
+
+        # Add up the lead stages of each status
+        total_amount = 0
+        for stage_id, totals in by_stage.items():
+            stage = get_stage(tenant_id, int(stage_id)) if stage_id else None
+            if stage is None or stage['model_name'] != 'lead':
+                continue
+            data = status_dict.setdefault(stage['status'], {'total_amount': 0, 'lead_count': 0})
+            data['total_amount'] += totals['amount']
+            data['lead_count'] += totals['count']
+            total_amount += totals['amount']
 
         # Prepare the response data with all possible statuses
         stages_with_all_statuses = [
@@ -120,9 +126,6 @@ def get_lead_summation(request):
             for status, data in status_dict.items()
         ]
         
-        # Aggregate the total opportunity amount for all leads
-        total_amount = lead_stages.aggregate(total_amount=Sum('lead__opportunity_amount'))['total_amount']
-
         return JsonResponse({
             'lead_sum': {
                 'stages': stages_with_all_statuses,
@@ -7,14 +7,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from datetime import datetime
 from .models import Interaction, Calls, Meetings, Conversation,Email,Group
-from tenant.models import Tenant
+from tenant.cache import get_cached_tenant
 from django.contrib.contenttypes.models import ContentType
 from .serializers import InteractionSerializer, callsSerializer, meetingsSerializer,EmailSerializer,GroupSerializer
 
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework import viewsets
 
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 # from .utils import fetch_entity_details
 from interaction.models import Interaction
 from contacts.models import Contact
@@ -60,7 +60,9 @@ class InteractionListAPIView(APIView):
 
             # Get the ContentType object for the specified entity type (case insensitive)
             content_type = ContentType.objects.get(model__iexact=entity_type)
-            tenant = get_object_or_404(Tenant, id=tenant_id)
+            tenant = get_cached_tenant(tenant_id)
+            if tenant is None:
+                raise Http404('Tenant not found')
             # Retrieve the entity instance based on entity_id
             entity_instance = content_type.get_object_for_this_type(id=entity_id)
 
@@ -0,0 +1,30 @@
+# Generated by Django 4.1 on 2026-10-18 09:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.datetime
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='tenant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tenant.tenant'),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddConstraint(
+            model_name='report',
+            constraint=models.UniqueConstraint(models.F('tenant'), django.db.models.functions.datetime.TruncDate('created_at'), name='leads_report_tenant_day_uniq'),
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from django.contrib.auth.models import User
 from accounts.models import Account
 from django.conf import settings
@@ -54,11 +57,19 @@ class Lead(models.Model):
         return self.first_name + self.last_name
 
 class Report(models.Model):
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set by leads.reports to the time the snapshot stands for, so historical days can be backfilled
+    created_at = models.DateTimeField(default=timezone.now)
     leads_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total_leads = models.IntegerField(default=0)
-    #tenant = models.ForeignKey(Tenant,on_delete=models.CASCADE)
+    # Reports generated before snapshots were per tenant have none
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # One snapshot per tenant and day; also the index of the today/yesterday lookups
+            models.UniqueConstraint(F('tenant'), TruncDate('created_at'), name='leads_report_tenant_day_uniq'),
+        ]
 
     def __str__(self):
         return f"Report {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
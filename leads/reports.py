@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, connections
+from django.utils import timezone
+
+from analytics.rollup import rollup
+from stage.cache import get_stage
+from tenant.models import Tenant
+from .models import Report
+
+REPORT_SETTINGS = {
+    'WORKERS': 4,       # tenant batches processed at the same time
+    'BATCH_SIZE': 50,   # tenants per batch
+}
+REPORT_SETTINGS.update(getattr(settings, 'DAILY_REPORTS', {}))
+
+
+def get_today():
+    return timezone.localdate()
+
+
+def get_yesterday():
+    return get_today() - timedelta(days=1)
+
+
+def compute_report(tenant_id, day):
+    """
+    The tenant's snapshot of day, from the daily metrics rollup: all leads
+    created by then, their amount except for leads in a 'closed won' stage,
+    and the revenue of opportunities closed by then in a 'closed won' stage.
+
+    The rollup keeps no stage or amount history, so rows are counted with
+    their current stage and amount. A snapshot stored on its own day (the
+    scheduled job, generate_or_get_report) is as of that moment; for a past
+    day (backfill_reports) leads_amount and revenue are approximate, since
+    leads and opportunities may have changed stage or amount since.
+    total_leads only depends on creation dates.
+    """
+    leads = rollup.totals(tenant_id, 'leads_by_stage', end=day, by_dimension=True)
+    leads_amount = Decimal(0)
+    for stage_id, totals in leads.items():
+        stage = get_stage(tenant_id, int(stage_id)) if stage_id else None
+        if stage is None or stage['status'] != 'closed won':
+            leads_amount += totals['amount']
+    return {
+        'leads_amount': leads_amount,
+        'revenue': rollup.totals(tenant_id, 'closed_won', end=day)['amount'],
+        'total_leads': sum(totals['count'] for totals in leads.values()),
+    }
+
+
+def save_report(tenant_id, day):
+    """Compute and store the tenant's snapshot of day, replacing an earlier one."""
+    values = compute_report(tenant_id, day)
+    if day >= get_today():
+        values['created_at'] = timezone.now()
+    else:
+        values['created_at'] = timezone.make_aware(datetime.combine(day, time.max))
+    report, _ = Report.objects.update_or_create(tenant_id=tenant_id, created_at__date=day, defaults=values)
+    return report
+
+
+def get_report(tenant_id, day):
+    # Served by the (tenant, created_at date) unique index
+    return Report.objects.filter(tenant_id=tenant_id, created_at__date=day).first()
+
+
+def generate_or_get_report(tenant_id):
+    """Today's snapshot of the tenant, computed now if the scheduled job has not run yet."""
+    report = get_report(tenant_id, get_today())
+    if report is not None:
+        return report
+    try:
+        return save_report(tenant_id, get_today())
+    except IntegrityError:
+        # Stored by the job or another request in the meantime
+        return get_report(tenant_id, get_today())
+
+
+def _run_batch(tenant_ids, days):
+    done, failed = 0, []
+    try:
+        for tenant_id in tenant_ids:
+            try:
+                for day in days:
+                    save_report(tenant_id, day)
+                done += 1
+            except Exception as e:
+                print(f"Report of tenant {tenant_id} failed: {e}")
+                failed.append(tenant_id)
+    finally:
+        connections.close_all()  # connections of this worker thread
+    return done, failed
+
+
+def generate_reports(days, tenant_ids=None, workers=None, batch_size=None):
+    """
+    Store the snapshots of days for every tenant (or tenant_ids). Tenants
+    are split into batches of batch_size that run on `workers` threads.
+    Returns (tenants done, tenants failed).
+    """
+    if tenant_ids is None:
+        tenant_ids = list(Tenant.objects.order_by('id').values_list('id', flat=True))
+    batch_size = batch_size or REPORT_SETTINGS['BATCH_SIZE']
+    batches = [tenant_ids[i:i + batch_size] for i in range(0, len(tenant_ids), batch_size)]
+    days = sorted(days)
+
+    done, failed = 0, []
+    with ThreadPoolExecutor(max_workers=workers or REPORT_SETTINGS['WORKERS'], thread_name_prefix="daily-reports") as executor:
+        futures = [executor.submit(_run_batch, batch, days) for batch in batches]
+        for future in as_completed(futures):
+            batch_done, batch_failed = future.result()
+            done += batch_done
+            failed.extend(batch_failed)
+    return done, failed
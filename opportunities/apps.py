@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class OpportunitiesConfig(AppConfig):
     name = 'opportunities'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from helpers.model_changes import after_commit, previous, track_previous
+from .models import Opportunity
+from .utils import rfm_cache
+
+# The account the opportunity belonged to before the save is recomputed as well
+track_previous(Opportunity, 'tenant_id', 'account_id')
+
+
+@receiver(post_save, sender=Opportunity)
+def rfm_post_save(sender, instance, **kwargs):
+    after_commit(rfm_cache.mark, instance.tenant_id, instance.account_id)
+    before = previous(instance)
+    if before is not None and (before['tenant_id'], before['account_id']) != (instance.tenant_id, instance.account_id):
+        after_commit(rfm_cache.mark, before['tenant_id'], before['account_id'])
+
+
+@receiver(post_delete, sender=Opportunity)
+def rfm_post_delete(sender, instance, **kwargs):
+    after_commit(rfm_cache.mark, instance.tenant_id, instance.account_id)
@@ -1,3 +1,97 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+import pandas as pd
+from django.test import SimpleTestCase
+
+from .utils import METRIC_COLUMNS, _quantile_score, score_accounts
+
+NOW = datetime(2024, 6, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+
+def metrics(*rows):
+    """rows of (account_id, days since last close or None, frequency, monetary)."""
+    return pd.DataFrame.from_records(
+        [
+            (account_id, NOW - timedelta(days=days) if days is not None else None, frequency, monetary)
+            for account_id, days, frequency, monetary in rows
+        ],
+        columns=METRIC_COLUMNS, index='account_id',
+    )
+
+
+def by_account(rows):
+    return {row['customer_id']: row for row in rows}
+
+
+class QuantileScoreTests(SimpleTestCase):
+
+    def test_spread_over_five_bins(self):
+        self.assertEqual(list(_quantile_score(pd.Series([10, 20, 30, 40, 50]))), [1, 2, 3, 4, 5])
+
+    def test_ties_share_a_score(self):
+        scores = list(_quantile_score(pd.Series([1, 1, 1, 1, 9])))
+        self.assertEqual(scores[:4], [4, 4, 4, 4])
+        self.assertEqual(scores[4], 5)
+
+    def test_all_equal(self):
+        self.assertEqual(list(_quantile_score(pd.Series([3, 3, 3]))), [5, 5, 5])
+
+    def test_single_value(self):
+        self.assertEqual(list(_quantile_score(pd.Series([7]))), [5])
+
+
+class ScoreAccountsTests(SimpleTestCase):
+
+    def test_no_accounts(self):
+        self.assertEqual(score_accounts(metrics(), now=NOW), [])
+
+    def test_single_account(self):
+        [row] = score_accounts(metrics((1, 3, 2, Decimal('100.00'))), now=NOW)
+        self.assertEqual((row['recency'], row['frequency'], row['monetary']), (3, 2, Decimal('100.00')))
+        self.assertEqual((row['r_score'], row['f_score'], row['m_score']), (5, 5, 5))
+        self.assertEqual(row['rfm_score'], '555')
+        self.assertEqual(row['segment'], 'Champions')
+
+    def test_never_closed_scores_lowest_recency(self):
+        rows = by_account(score_accounts(metrics(
+            (1, None, 8, Decimal('900.00')),
+            (2, 400, 1, Decimal('10.00')),
+            (3, 1, 1, Decimal('10.00')),
+        ), now=NOW))
+        self.assertEqual(rows[1]['recency'], -1)
+        self.assertEqual(rows[1]['r_score'], 1)
+        self.assertLess(rows[2]['r_score'], rows[3]['r_score'])
+        self.assertEqual(rows[1]['segment'], 'At Risk')
+
+    def test_only_never_closed(self):
+        rows = score_accounts(metrics((1, None, 1, None), (2, None, 2, None)), now=NOW)
+        self.assertEqual([row['r_score'] for row in rows], [1, 1])
+        self.assertEqual([row['recency'] for row in rows], [-1, -1])
+
+    def test_missing_amount_counts_as_zero(self):
+        rows = by_account(score_accounts(metrics((1, 1, 1, None), (2, 1, 1, Decimal('5.00'))), now=NOW))
+        self.assertIsNone(rows[1]['monetary'])
+        self.assertLess(rows[1]['m_score'], rows[2]['m_score'])
+
+    def test_tied_accounts_get_equal_scores(self):
+        rows = score_accounts(metrics(*[(i, 10, 3, Decimal('50.00')) for i in range(1, 5)]), now=NOW)
+        self.assertEqual({(row['r_score'], row['f_score'], row['m_score']) for row in rows}, {(5, 5, 5)})
+        self.assertEqual({row['segment'] for row in rows}, {'Champions'})
+
+    def test_ordered_by_account(self):
+        rows = score_accounts(metrics((3, 1, 1, Decimal('1')), (1, 1, 1, Decimal('1')), (2, 1, 1, Decimal('1'))), now=NOW)
+        self.assertEqual([row['customer_id'] for row in rows], [1, 2, 3])
+
+    def test_segments(self):
+        rows = by_account(score_accounts(metrics(
+            (1, 1, 10, Decimal('1000')),   # recent, frequent, big
+            (2, 300, 10, Decimal('1000')), # long ago, frequent, big
+            (3, 2, 1, Decimal('1')),       # recent, once, small
+            (4, 400, 2, Decimal('2')),     # longest ago, rarely, small
+            (5, 100, 5, Decimal('100')),
+        ), now=NOW))
+        self.assertEqual(rows[1]['segment'], 'Champions')
+        self.assertEqual(rows[2]['segment'], 'At Risk')
+        self.assertEqual(rows[3]['segment'], 'New Customers')
+        self.assertEqual(rows[4]['segment'], 'Lost')
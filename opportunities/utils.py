@@ -1,17 +1,177 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
 from django.db.models import Count, Max, Sum
-from datetime import timedelta
 from django.utils import timezone
+
 from .models import Opportunity
 
-def calculate_rfm_metrics(customer):
-    latest_opportunity_date = customer.opportunities.aggregate(latest_date=Max('closedOn'))['latest_date']
-    if latest_opportunity_date:
-        recency = (timezone.now() - latest_opportunity_date).days
-    else:
-        recency = -1
+RFM_SETTINGS = {
+    'TTL': 900,       # seconds before a tenant's metrics are read again in full (writes of other workers)
+    'TENANTS': 256,   # tenants whose metrics are kept in process
+}
+RFM_SETTINGS.update(getattr(settings, 'RFM', {}))
+
+SCORES = 5  # quantile bins of the R, F and M scores
+
+# Checked in order on the R score and the FM score (rounded mean of F and M), the first match wins
+SEGMENTS = [
+    ('Champions', lambda r, fm: (r >= 4) & (fm >= 4)),
+    ('Loyal Customers', lambda r, fm: (r >= 3) & (fm >= 4)),
+    ('Potential Loyalists', lambda r, fm: (r >= 4) & (fm >= 2)),
+    ('New Customers', lambda r, fm: r >= 4),
+    ('Need Attention', lambda r, fm: r == 3),
+    ('At Risk', lambda r, fm: fm >= 3),
+    ('Hibernating', lambda r, fm: r == 2),
+]
+DEFAULT_SEGMENT = 'Lost'
+
+METRIC_COLUMNS = ['account_id', 'last_closed', 'frequency', 'monetary']
+
+
+def account_metrics(tenant_id, account_ids=None):
+    """
+    Last close date, number of opportunities and their total amount per
+    account of the tenant (only account_ids when given), in one grouped query.
+    """
+    queryset = Opportunity.objects.filter(tenant_id=tenant_id, account__isnull=False)
+    if account_ids is not None:
+        queryset = queryset.filter(account_id__in=list(account_ids))
+    rows = queryset.values('account_id').annotate(
+        last_closed=Max('closedOn'), frequency=Count('id'), monetary=Sum('amount')
+    ).order_by()
+    return pd.DataFrame.from_records(list(rows), columns=METRIC_COLUMNS, index='account_id')
+
+
+def _quantile_score(values):
+    """1..SCORES by the share of values at or below each value; equal values get the same score."""
+    return np.ceil(values.rank(method='max', pct=True) * SCORES).clip(1, SCORES).astype(int)
+
+
+def score_accounts(metrics, now=None):
+    """
+    RFM rows of the accounts in metrics: recency in days since the last
+    close (-1 when none was closed), frequency, monetary, their 1..5
+    quantile scores and a segment.
+    """
+    if metrics.empty:
+        return []
+    metrics = metrics.sort_index()
+    now = pd.Timestamp(now or timezone.now())
+    days = (now - pd.to_datetime(metrics['last_closed'], utc=True)).dt.days
+    frequency = metrics['frequency'].astype(int)
+    amounts = metrics['monetary'].map(lambda amount: float(amount or 0))
+
+    # Fewer days since the last close is better; accounts that never closed score lowest
+    r_score = _quantile_score((-days).fillna(-np.inf)).where(days.notna(), 1)
+    f_score = _quantile_score(frequency)
+    m_score = _quantile_score(amounts)
+    fm_score = np.floor((f_score + m_score) / 2 + 0.5).astype(int)
+    segments = np.select(
+        [condition(r_score, fm_score) for _, condition in SEGMENTS],
+        [name for name, _ in SEGMENTS],
+        default=DEFAULT_SEGMENT,
+    )
+
+    return [
+        {
+            'customer_id': int(account_id),
+            'recency': -1 if pd.isna(recency) else int(recency),
+            'frequency': int(count),
+            'monetary': amount,
+            'r_score': int(r),
+            'f_score': int(f),
+            'm_score': int(m),
+            'rfm_score': f"{r}{f}{m}",
+            'segment': segment,
+        }
+        for account_id, recency, count, amount, r, f, m, segment in zip(
+            metrics.index, days, frequency, metrics['monetary'], r_score, f_score, m_score, segments
+        )
+    ]
+
+
+class RFMCache:
+    """
+    Per-tenant RFM analysis kept in process.
+
+    A tenant's account metrics are read with one grouped query and scored
+    in one pandas pass. Saving or deleting an opportunity (closing it,
+    changing its amount or account) marks its account once the transaction
+    commits; the next request re-reads only the marked accounts and scores
+    again, since quantiles depend on every account. Metrics are read in
+    full again after TTL seconds, for writes made by other workers.
+    """
+
+    def __init__(self):
+        self._tenants = OrderedDict()  # tenant -> {'metrics', 'loaded', 'result'}
+        self._dirty = {}               # tenant -> account ids changed since its metrics were read
+        self._lock = threading.Lock()
+
+    def mark(self, tenant_id, account_id):
+        if tenant_id is None or account_id is None:
+            return
+        key = str(tenant_id)
+        with self._lock:
+            # Tenants that are neither cached nor being read will be read in full anyway
+            if key in self._dirty:
+                self._dirty[key].add(account_id)
+
+    def invalidate(self, tenant_id=None):
+        """Read the metrics of tenant_id (all tenants when None) in full on next use."""
+        with self._lock:
+            if tenant_id is None:
+                self._tenants.clear()
+                self._dirty.clear()
+            else:
+                self._tenants.pop(str(tenant_id), None)
+                self._dirty.pop(str(tenant_id), None)
+
+    def analysis(self, tenant_id, full=False):
+        """The tenant's RFM rows, see score_accounts(); full=True reads every account again."""
+        key = str(tenant_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._tenants.get(key)
+            if full or (entry is not None and now - entry['loaded'] >= RFM_SETTINGS['TTL']):
+                entry = None
+            if entry is None:
+                # Marks from here on are applied on top of the full read
+                dirty = None
+                self._dirty[key] = set()
+            else:
+                dirty, self._dirty[key] = self._dirty.get(key, set()), set()
+                if not dirty:
+                    self._tenants.move_to_end(key)
+                    return entry['result']
+
+        try:
+            if entry is None:
+                metrics, loaded = account_metrics(tenant_id), now
+            else:
+                changed = account_metrics(tenant_id, dirty)
+                metrics = entry['metrics'].drop(index=list(dirty), errors='ignore')
+                if not changed.empty:
+                    metrics = changed if metrics.empty else pd.concat([metrics, changed])
+                loaded = entry['loaded']
+        except Exception:
+            if dirty:
+                with self._lock:
+                    self._dirty.setdefault(key, set()).update(dirty)
+            raise
 
-    frequency = customer.opportunities.count()
+        result = score_accounts(metrics)
+        with self._lock:
+            self._tenants[key] = {'metrics': metrics, 'loaded': loaded, 'result': result}
+            self._tenants.move_to_end(key)
+            while len(self._tenants) > RFM_SETTINGS['TENANTS']:
+                evicted, _ = self._tenants.popitem(last=False)
+                self._dirty.pop(evicted, None)
+        return result
 
-    monetary = customer.opportunities.aggregate(total_amount=Sum('amount'))['total_amount']
 
-    return recency, frequency, monetary
+rfm_cache = RFMCache()
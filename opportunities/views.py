@@ -4,7 +4,7 @@ from .models import Opportunity
 from .serializers import OpportunitySerializer
 from rest_framework.permissions import IsAdminUser
 from django.http import JsonResponse
-from .utils import calculate_rfm_metrics
+from .utils import rfm_cache
 
 
 from datetime import datetime, timedelta,date
@@ -17,6 +17,9 @@ from django.contrib.auth import get_user_model
 from vendors.models import Vendors
 from django.views.decorators.http import require_http_methods
 from leads.models import Stage  # Import your Stage model here
+from stage.cache import get_stage, get_stages
+from analytics.rollup import rollup
+from helpers.report_stream import CONTENT_TYPES, ReportSection, collect_report, page_params, stream_report
 import json
 from django.utils import timezone
 
@@ -35,13 +38,15 @@ class OpportunityDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     # permission_classes = (IsAdminUser,)
 
 
+@require_http_methods(["GET"])
 def rfm_analysis(request):
-    customers = Opportunity.objects.all().values_list('account', flat=True).distinct()
-    rfm_data = []
-    for customer_id in customers:
-        customer_opportunities = Opportunity.objects.filter(account_id=customer_id)
-        recency, frequency, monetary = calculate_rfm_metrics(customer_opportunities)
-        rfm_data.append({'customer_id': customer_id, 'recency': recency, 'frequency': frequency, 'monetary': monetary})
+    tenant_id = request.headers.get('X-Tenant-Id')
+    if not tenant_id:
+        return JsonResponse({'error': 'Tenant ID is required in headers'}, status=400)
+    try:
+        rfm_data = rfm_cache.analysis(tenant_id, full=request.GET.get('refresh') == 'full')
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
     return JsonResponse(rfm_data, safe=False)
 
 #stage for opportunity
@@ -49,13 +54,18 @@ def rfm_analysis(request):
 @require_http_methods(["GET"])
 def opportunity_stage(request, opportunity_id):
     try:
-        opportunity = Opportunity.objects.get(id=opportunity_id)
-        if opportunity.stage_id:
-            stage = Stage.objects.get(id=opportunity.stage_id, model_name='opportunity')  # Assuming model_name field exists in Stage
+        opportunity = Opportunity.objects.values('stage_id', 'tenant_id').get(id=opportunity_id)
+        if opportunity['stage_id']:
+            if opportunity['tenant_id'] is not None:
+                stage = get_stage(opportunity['tenant_id'], opportunity['stage_id'])
+            else:
+                stage = Stage.objects.filter(id=opportunity['stage_id']).values('id', 'status', 'model_name').first()
+            if stage is None or stage['model_name'] != 'opportunity':
+                raise Stage.DoesNotExist
             stage_data = {
-                'id': stage.id,
-                'status': stage.status,
-                'model_name': stage.model_name,
+                'id': stage['id'],
+                'status': stage['status'],
+                'model_name': stage['model_name'],
             }
             return JsonResponse(stage_data, status=200)
         else:
@@ -72,12 +82,12 @@ def all_stages(request):
         return JsonResponse({'error': 'Tenant ID is required in headers'}, status=400)
 
     try:
-        stages = Stage.objects.filter(model_name='opportunity', tenant_id=tenant_id)  # Adjust the filter as per your model
+        stages = get_stages(tenant_id, 'opportunity')
 
-        if stages.exists():
+        if stages:
             stages_data = [{
-                'id': stage.id,
-                'status': stage.status,
+                'id': stage['id'],
+                'status': stage['status'],
             } for stage in stages]
             return JsonResponse({'stages': stages_data}, status=200)
         else:
@@ -91,32 +101,67 @@ CustomUser = get_user_model()
 
 def get_report_by_id(request, report_id):
 
-    report_id_to_function = {
+    # Reports listing table rows, ?stream=ndjson or ?stream=json sends them as they are read
+    row_reports = {
         'total_leads': get_total_leads,
-        'this_month_leads': get_new_leads_this_month,
         'today_lead':get_leads_by_today,
         'converted_leads':get_converted_leads,
         'lead_source':get_leads_by_source,
         'total_calls': get_calls_report_data,
         'total_opportunities': get_opportunity_report_data,
         'total_meetings': get_meetings_report_data,
-        'top_users': get_top_users, 
         'Contact_mailing_list':get_contact_address,
         'total_calls_emails':get_calls_emails,
         'total_campaign':get_total_campaign,
         'total_interaction':get_interaction_total,
         'leads_account_name':get_leads_by_account_name,
         'campaign_status':get_campaign_status,
-        'today_sales':get_todays_sales,
-        'sales_by_lead_source':get_sales_by_lead_source,
-        'sales_this_month':get_sales_this_month,
         'deal_lost':deal_lost,
         'vendor_owner':get_vendors_owner,
+    }
+
+    # Totals read from the tenant's daily metrics rollup
+    rollup_reports = {
+        'today_sales':get_todays_sales,
+        'sales_this_month':get_sales_this_month,
+    }
+
+    report_id_to_function = {
+        'this_month_leads': get_new_leads_this_month,
+        'top_users': get_top_users, 
+        'sales_by_lead_source':get_sales_by_lead_source,
         'lead_stages':get_lead_status_counts,
         'opportunity_stages':get_opportunity_status_counts,
   
 
     }
+
+    sections_function = row_reports.get(report_id)
+    if sections_function:
+        stream = request.GET.get('stream')
+        if stream is None and 'application/x-ndjson' in request.headers.get('Accept', ''):
+            stream = 'ndjson'
+        if stream is not None and stream not in CONTENT_TYPES:
+            return JsonResponse({'error': 'stream must be ndjson or json'}, status=400)
+        try:
+            after, limit = page_params(request)
+            if stream:
+                return stream_report(request, sections_function(), stream, after, limit)
+            return JsonResponse(collect_report(sections_function(), after, limit), safe=False)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+    if report_id in rollup_reports:
+        tenant_id = request.headers.get('X-Tenant-Id')
+        if not tenant_id:
+            return JsonResponse({'error': 'Tenant ID is required in headers'}, status=400)
+        try:
+            return JsonResponse(rollup_reports[report_id](tenant_id), safe=False)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
     report_function = report_id_to_function.get(report_id)
 
     if not report_function:
@@ -132,7 +177,7 @@ def get_report_by_id(request, report_id):
 
 def get_total_leads():
         leads = Lead.objects.all()
-        return{'total_leads': leads.count(), 'leads': list(leads.values(
+        return [ReportSection('leads', 'total_leads', leads, (
         'id',
         'title',
         'first_name',
@@ -153,7 +198,7 @@ def get_total_leads():
         'enquery_type',
         'money',
         'tenant',  
-        'priority'))}
+        'priority'))]
 
 def get_new_leads_this_month():
      # Get the current date and time with timezone information
@@ -173,22 +218,22 @@ def get_new_leads_this_month():
 
 def get_converted_leads():
     converted_leads = Lead.objects.filter(stage__status='converted')
-    return{'total_converted leads':converted_leads.count(),'converted_leads':list(converted_leads.values('id', 'first_name', 'last_name','phone','stage__status','account'))}
+    return [ReportSection('converted_leads', 'total_converted leads', converted_leads, ('id', 'first_name', 'last_name','phone','stage__status','account'))]
 
 
 def get_leads_by_source():
     lead_source = Lead.objects.filter(source__isnull=False)
-    return{'total lead':lead_source.count(), 'source':list(lead_source.values('id', 'source','email','createdOn','createdBy','account_name','first_name','last_name'))}
+    return [ReportSection('source', 'total lead', lead_source, ('id', 'source','email','createdOn','createdBy','account_name','first_name','last_name'))]
     
 
 def get_leads_by_today():
     today_date = date.today()
     leads_today = Lead.objects.filter(createdOn__date=today_date)
-    return {'total_today_leads':leads_today.count(), 'today_leads':list(leads_today.values('email','phone','source','stage__status')) }
+    return [ReportSection('today_leads', 'total_today_leads', leads_today, ('email','phone','source','stage__status'))]
   
 def get_leads_by_account_name():
     Account_name = Lead.objects.filter()
-    return {'total_leads_account_name':Account_name.count(),'leads_account_name':list(Account_name.values('id','account_name'))}
+    return [ReportSection('leads_account_name', 'total_leads_account_name', Account_name, ('id','account_name'))]
   
 def get_sales_by_lead_source():
     opportunities = Opportunity.objects.filter(stage__status='CLOSED WON')
@@ -200,17 +245,17 @@ def get_sales_by_lead_source():
 
 def get_calls_report_data():
     call = Calls.objects.all()
-    return {'total_calls': call.count(), 'calls': list(call.values())}
+    return [ReportSection('calls', 'total_calls', call, None)]
 
 
 def get_opportunity_report_data():
     Opportunities = Opportunity.objects.all()
-    return {'total_opportunity': Opportunities.count(), 'opportunity':list(Opportunities.values())}
+    return [ReportSection('opportunity', 'total_opportunity', Opportunities, None)]
 
 
 def get_meetings_report_data():
     Meeting  = Meetings.objects.all()
-    return {'total_meeting': Meeting.count(),'meetings':list(Meeting.values())}
+    return [ReportSection('meetings', 'total_meeting', Meeting, None)]
  
 def get_top_users():
     top_users = CustomUser.objects.order_by('-date_joined')[:10]
@@ -219,63 +264,56 @@ def get_top_users():
 
 def get_contact_address():
     contacts = Contact.objects.all()
-    return {'total contacts': contacts.count(), 'Contacts': list(contacts.values('id','name', 'address'))}
+    return [ReportSection('Contacts', 'total contacts', contacts, ('id','name', 'address'))]
 
 
 def get_calls_emails():
     call = Calls.objects.all()
     email = Contact.objects.all()
-    call_data = list(call.values())
-    email_data = list(email.values())
-    return {'total calls':call.count(),'calls':call_data,'total emails': email.count(), 'eamils':email_data}
+    return [ReportSection('calls', 'total calls', call, None), ReportSection('eamils', 'total emails', email, None)]
  
 
 def get_total_campaign():
     total_campaign = Campaign.objects.all()
-    return {'total campaign':total_campaign.count(), 'campaign':list(total_campaign.values('campaign_owner','campaign_name'))}
+    return [ReportSection('campaign', 'total campaign', total_campaign, ('campaign_owner','campaign_name'))]
  
 
 def get_campaign_status():
     status = Campaign.objects.all()
-    return {'total_status':status.count(), 'status':list(status.values('id','status','campaign_owner','campaign_name','start_date','end_date'))}
+    return [ReportSection('status', 'total_status', status, ('id','status','campaign_owner','campaign_name','start_date','end_date'))]
 
 
 def get_interaction_total():
     total_interaction = Interaction.objects.all()
-    return {'total_interaction':total_interaction.count(), 'interaction': list(total_interaction.values('id','notes','entity_type'))}
+    return [ReportSection('interaction', 'total_interaction', total_interaction, ('id','notes','entity_type'))]
  
 
-def get_todays_sales():
-    today = date.today()
-    opportunities = Opportunity.objects.filter(stage__status='CLOSED WON', closedOn=today)
-    total_sales = sum(opportunity.amount for opportunity in opportunities)
+def get_todays_sales(tenant_id):
+    today = timezone.localdate()
+    total_sales = rollup.totals(tenant_id, 'closed_won', start=today, end=today)['amount']
+    opportunities = Opportunity.objects.filter(
+        tenant_id=tenant_id, stage__status='CLOSED WON', closedOn__date=today
+    )
     return {'total_sales': total_sales, 'opportunities': list(opportunities.values())}
 
 
 
 
-def get_sales_this_month():
-    today = date.today()
+def get_sales_this_month(tenant_id):
+    today = timezone.localdate()
     start_of_month = today.replace(day=1)    
-    opportunities = Opportunity.objects.filter(
-        stage__status='CLOSED WON',
-        closedOn__gte=start_of_month,
-        closedOn__lte=today
-    ) 
-    total_sales = opportunities.aggregate(total_sales=Sum('amount'))['total_sales'] or 0
+    total_sales = rollup.totals(tenant_id, 'closed_won', start=start_of_month, end=today)['amount']
     return {'total_sales_this_month': total_sales}
   
 
 def deal_lost():
     Opportunities = Opportunity.objects.filter(stage__status='CLOSED LOST')
-    deal_lost= {'total_lost_deal':Opportunities.count(),'deal_lost':list(Opportunities.values())}
-    return deal_lost
+    return [ReportSection('deal_lost', 'total_lost_deal', Opportunities, None)]
 
 
 def get_vendors_owner():
     vender = Vendors.objects.all()
-    owner_data = {'total_owner':vender.count(),'vendor_owner':list(vender.values('vendor_owner'))}
-    return owner_data
+    return [ReportSection('vendor_owner', 'total_owner', vender, ('vendor_owner',))]
 
 def get_lead_status_counts():
     # Query to count leads grouped by stage__status
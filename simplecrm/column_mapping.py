@@ -0,0 +1,127 @@
+import hashlib
+import re
+
+from django.db.models import F
+
+from .models import ColumnMapping
+
+
+def normalize_header(name):
+    """'Phone Number', 'phone_number' and 'PhoneNumber' all become 'phonenumber'."""
+    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+
+
+def header_signature(table_name, columns, fields):
+    """
+    Signature of an upload's header set against a table. The target fields are
+    part of it so a schema change does not reuse a stale mapping.
+    """
+    headers = sorted(normalize_header(column) for column in columns)
+    targets = sorted(str(field) for field in fields)
+    raw = f"{table_name}|{','.join(headers)}|{','.join(targets)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def prematch(columns, fields):
+    """
+    Match columns to fields locally: exact, then case/underscore/space
+    insensitive. Near misses ('phone2' -> 'phone') are left to the LLM step
+    rather than guessed. Returns (mapping, unmatched columns, unused fields).
+    """
+    mapping = {}
+    remaining_fields = list(fields)
+
+    def take(column, field):
+        mapping[column] = field
+        remaining_fields.remove(field)
+
+    for column in columns:
+        if column in remaining_fields:
+            take(column, column)
+
+    for column in columns:
+        if column in mapping:
+            continue
+        by_normalized = {normalize_header(field): field for field in remaining_fields}
+        field = by_normalized.get(normalize_header(column))
+        if field is not None:
+            take(column, field)
+
+    unmatched = [column for column in columns if column not in mapping]
+    return mapping, unmatched, remaining_fields
+
+
+def _match(columns, fields, llm_map):
+    mapping, unmatched, unused_fields = prematch(columns, fields)
+    print(f"Pre-matched columns: {mapping}, sent to LLM: {unmatched}")
+
+    if unmatched and unused_fields:
+        suggested = llm_map(unmatched, unused_fields) or {}
+        for column, field in suggested.items():
+            if column in unmatched and field in unused_fields and field not in mapping.values():
+                mapping[column] = field
+    return mapping
+
+
+def resolve_column_mapping(tenant_id, table_name, columns, fields, llm_map):
+    """
+    Map upload columns to table fields, returns {column: field}.
+
+    A mapping stored for the same tenant, table and header signature is reused
+    as is. Otherwise obvious columns are resolved by prematch() and only the
+    leftovers are passed to llm_map(columns, fields), which must return a
+    {column: field} dict. The combined result is stored for the next upload.
+
+    Stored mappings are keyed by normalized header, so uploads with two
+    columns that normalize alike ('Email', 'email ') bypass the cache. A
+    wrong stored mapping is dropped with forget_column_mappings().
+    """
+    columns = [str(column) for column in columns]
+    fields = [str(field) for field in fields]
+    normalized = [normalize_header(column) for column in columns]
+    if len(set(normalized)) != len(normalized):
+        print(f"Columns of {table_name} collide after normalization, column mapping cache skipped")
+        return _match(columns, fields, llm_map)
+    signature = header_signature(table_name, columns, fields)
+
+    cached = ColumnMapping.objects.filter(
+        tenant_id=tenant_id, table_name=table_name, header_signature=signature
+    ).first()
+    if cached is not None:
+        ColumnMapping.objects.filter(pk=cached.pk).update(hits=F('hits') + 1)
+        by_normalized = cached.mapping
+        mapping = {}
+        for column in columns:
+            field = by_normalized.get(normalize_header(column))
+            # A field is never filled from two columns
+            if field in fields and field not in mapping.values():
+                mapping[column] = field
+        print(f"Column mapping cache hit for {table_name}: {mapping}")
+        return mapping
+
+    mapping = _match(columns, fields, llm_map)
+    try:
+        ColumnMapping.objects.update_or_create(
+            tenant_id=tenant_id, table_name=table_name, header_signature=signature,
+            # Unmatched columns are stored as None, every header of the set can be looked up
+            defaults={'mapping': {normalize_header(column): mapping.get(column) for column in columns}},
+        )
+    except Exception as e:
+        # Caching is best effort, the upload can go on without it
+        print(f"Could not store column mapping: {e}")
+    return mapping
+
+
+def forget_column_mappings(tenant_id, table_name=None, columns=None):
+    """
+    Delete stored mappings of the tenant, only those of table_name and only
+    those with one of columns in their header set when given, so the next
+    upload is matched again. Returns the number deleted.
+    """
+    mappings = ColumnMapping.objects.filter(tenant_id=tenant_id)
+    if table_name is not None:
+        mappings = mappings.filter(table_name=table_name)
+    if columns:
+        mappings = mappings.filter(mapping__has_any_keys=[normalize_header(column) for column in columns])
+    deleted, _ = mappings.delete()
+    return deleted
@@ -15,8 +15,8 @@ table_mappings = {
     "tasks_2024_08_03": "Tasks"
 }
 
-import os, json
-from openai import OpenAI
+import json
+from helpers import llm
 from helpers.prompts import SYS_PROMPT_ETL
 from helpers.tables import fetch_table
 from django.views.decorators.csrf import csrf_exempt
@@ -29,16 +29,14 @@ def get_leads(row):
     chat = row[3]
     stage = "Qualifying"
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-    response = client.chat.completions.create(
+    response = llm.chat(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": SYS_PROMPT_ETL },
                 {"role": "user", "content": chat }
             ]
         )
-    answer = json.loads(response.choices[0].message.content)
+    answer = json.loads(response)
     answer['name'] = name
     answer['id'] = id
     answer['stage'] = stage
@@ -1,7 +1,7 @@
 from django.http import JsonResponse
 import pandas as pd
 import os, json,requests
-from openai import OpenAI
+from helpers import llm
 from leads import models as leads_models
 from accounts import models as account_models
 from contacts import models as contact_models
@@ -57,8 +57,7 @@ def get_model_fields(model_name):
 def get_column_mappings(list1, list2):
     print("rcvd list1: " ,list1)
     print("rcvd list2: ", list2)
-    client = OpenAI(api_key = os.getenv("OPENAI_API_KEY"))
-    response = client.chat.completions.create(
+    result = llm.chat(
         model = "gpt-4o-mini",
         messages = [
             {
@@ -71,7 +70,6 @@ def get_column_mappings(list1, list2):
             }
         ]
     )
-    result = response.choices[0].message.content
         
         #trim the result
     fin=result.find('{')
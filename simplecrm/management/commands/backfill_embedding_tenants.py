@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from helpers.vectors_views import assign_embedding_tenant
+from tenant.models import Tenant
+
+
+class Command(BaseCommand):
+    help = (
+        "Assigns text_embeddings_anky rows stored before they had a tenant_id to a tenant. "
+        "Until then such rows are matched by every tenant's search"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant')
+        parser.add_argument('--file-path-prefix', help='Only rows of files whose path starts with this')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not Tenant.objects.filter(id=options['tenant']).exists():
+            raise CommandError(f"Tenant {options['tenant']} does not exist")
+        assigned = assign_embedding_tenant(options['tenant'], options['file_path_prefix'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{assigned} rows assigned to tenant {options['tenant']}"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from helpers.embedding_models import EMBEDDING_MODELS, VECTOR_TABLES, EmbeddingBackfill
+
+
+class Command(BaseCommand):
+    help = 'Re-embeds a vector table with another embedding model and switches the table over once done'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(VECTOR_TABLES))
+        parser.add_argument('model', choices=sorted(EMBEDDING_MODELS))
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--rows-per-minute', type=int, default=None, help='Throttle, defaults to unlimited')
+
+    def handle(self, *args, **options):
+        backfill = EmbeddingBackfill(
+            options['table'], options['model'],
+            batch_size=options['batch_size'], rows_per_minute=options['rows_per_minute'],
+        )
+        try:
+            report = backfill.run()
+        except Exception as e:
+            raise CommandError(f"Backfill stopped after {backfill.rows_done} rows, run again to resume: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['table']}: {report['status']} to {report['model']} ({report['rows']} rows re-embedded)"
+        ))
@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.reports import generate_reports, get_yesterday
+
+
+class Command(BaseCommand):
+    help = (
+        "Stores the daily report snapshots of past days from the daily metrics rollup. Rows are counted with "
+        "their current stage and amount, so leads_amount and revenue of past days are approximate"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Number of days up to --until')
+        parser.add_argument('--since', type=date.fromisoformat, help='First day, YYYY-MM-DD (instead of --days)')
+        parser.add_argument('--until', type=date.fromisoformat, help='Last day, YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--tenant', action='append', help='Only this tenant, can be repeated')
+        parser.add_argument('--workers', type=int, help='Tenant batches run at the same time')
+        parser.add_argument('--batch-size', type=int, help='Tenants per batch')
+
+    def handle(self, *args, **options):
+        until = options['until'] or get_yesterday()
+        since = options['since'] or until - timedelta(days=options['days'] - 1)
+        if since > until:
+            raise CommandError('--since is after --until')
+        days = [since + timedelta(days=i) for i in range((until - since).days + 1)]
+
+        done, failed = generate_reports(days, options['tenant'], options['workers'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{since} to {until}: {done} tenants, {len(days)} days each'))
+        self.stdout.write('leads_amount and revenue use current stages and amounts, they are approximate for past days')
+        if failed:
+            self.stdout.write(self.style.ERROR(f'failed: {", ".join(map(str, failed))}'))
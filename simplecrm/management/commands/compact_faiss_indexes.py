@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from analytics.models import FAISSIndex
+from helpers.faiss_registry import faiss_registry
+from helpers.faiss_segments import compact_index
+
+
+class Command(BaseCommand):
+    help = 'Merges the small segments of FAISS indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', help='Only compact the indexes of this tenant')
+
+    def handle(self, *args, **options):
+        indexes = FAISSIndex.objects.all()
+        if options['tenant']:
+            indexes = indexes.filter(tenant_id=options['tenant'])
+
+        for index_id, name in indexes.values_list('id', 'name'):
+            try:
+                merged = compact_index(index_id, faiss_registry.embeddings)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'{name}: {e}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(f'{name}: merged {merged} segments'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from simplecrm.column_mapping import forget_column_mappings
+from tenant.models import Tenant
+
+
+class Command(BaseCommand):
+    help = "Deletes stored upload column mappings of a tenant, so a wrong mapping is matched again on the next upload"
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant')
+        parser.add_argument('--table', help='Only mappings of this table')
+        parser.add_argument('--column', action='append', help='Only mappings of header sets with this column, repeatable')
+
+    def handle(self, *args, **options):
+        if not Tenant.objects.filter(id=options['tenant']).exists():
+            raise CommandError(f"Tenant {options['tenant']} does not exist")
+        deleted = forget_column_mappings(options['tenant'], options['table'], options['column'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} column mappings deleted for tenant {options['tenant']}"))
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from leads.reports import generate_reports, get_today
+
+
+class Command(BaseCommand):
+    help = "Stores every tenant's daily report snapshot (today by default), tenants in parallel batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Day of the snapshot, YYYY-MM-DD')
+        parser.add_argument('--tenant', action='append', help='Only this tenant, can be repeated')
+        parser.add_argument('--workers', type=int, help='Tenant batches run at the same time')
+        parser.add_argument('--batch-size', type=int, help='Tenants per batch')
+
+    def handle(self, *args, **options):
+        day = options['date'] or get_today()
+        done, failed = generate_reports([day], options['tenant'], options['workers'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{day}: {done} tenants'))
+        if failed:
+            self.stdout.write(self.style.ERROR(f'failed: {", ".join(map(str, failed))}'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from helpers.vector_index import VECTOR_INDEX_SETTINGS, ensure_vector_index
+
+
+class Command(BaseCommand):
+    help = 'Builds, rebuilds or drops vector indexes of the embedding tables based on their estimated row counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tables', nargs='*', help='Tables to maintain, defaults to VECTOR_INDEX["TABLES"]')
+
+    def handle(self, *args, **options):
+        for table_name in options['tables'] or VECTOR_INDEX_SETTINGS['TABLES']:
+            try:
+                report = ensure_vector_index(table_name)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'{table_name}: {e}'))
+                continue
+            if report['action'] == 'skipped':
+                self.stdout.write(self.style.WARNING(f"{table_name}: skipped, maintained by another worker right now"))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{table_name}: {report['action']} ({report['method']}, {report['rows']} rows, lists={report['lists']})"
+            ))
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from analytics.rollup import METRICS, metric_model, rollup
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily metrics rollup for rows created or dated in the last days, or rebuilds it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Recompute days touched by rows of the last N days')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every day of every tenant')
+        parser.add_argument('--tenant', help='Only this tenant')
+        parser.add_argument('--metric', choices=sorted(METRICS), help='Only this metric')
+
+    def handle(self, *args, **options):
+        metrics = [options['metric']] if options['metric'] else list(METRICS)
+        since = timezone.now() - timedelta(days=options['days'])
+
+        for metric in metrics:
+            if options['rebuild']:
+                tenants = metric_model(metric).objects.exclude(tenant_id=None).values_list('tenant_id', flat=True).distinct()
+                work = {str(tenant_id): None for tenant_id in tenants}
+            else:
+                work = rollup.delta_days(metric, since)
+            if options['tenant']:
+                work = {tenant_id: days for tenant_id, days in work.items() if tenant_id == options['tenant']}
+
+            for tenant_id, days in work.items():
+                try:
+                    rows = rollup.refresh(metric, tenant_id, days)
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'{metric} for {tenant_id}: {e}'))
+                    continue
+                scope = 'all days' if days is None else f'{len(days)} days'
+                self.stdout.write(self.style.SUCCESS(f'{metric} for {tenant_id}: {scope}, {rows} rows'))
@@ -1,19 +1,49 @@
-from django.db import connections, DatabaseError
+from contextlib import ExitStack
+from django.db import DatabaseError
 from django.utils.deprecation import MiddlewareMixin
 from django.http import HttpResponse
-from .models import Tenant  # Ensure this is the correct path to your Tenant model
+from tenant.cache import get_cached_tenant
 import logging
 from datetime import datetime
 from helpers.tables import get_db_connection
+from .tenant_pool import tenant_connection, PoolExhausted
+from helpers.llm import current_tenant
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.exceptions import AuthenticationFailed
 
 
 logger = logging.getLogger(__name__)
 
+# Process-wide counters that name every tenant, only readable by staff users
+STAFF_ONLY_PATHS = ['/metrics/']
+
+
+def _request_user(request):
+    """The session user, or the user of HTTP Basic credentials; None when neither is valid."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    try:
+        user_auth = BasicAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return user_auth[0] if user_auth else None
+
+
 class TenantMiddleware(MiddlewareMixin):
-    current_tenant_id = None
 
     def process_request(self, request):
         logger.debug("Processing request in TenantMiddleware")
+        if any(request.path.startswith(path) for path in STAFF_ONLY_PATHS):
+            user = _request_user(request)
+            if user is None:
+                response = HttpResponse('Authentication required', status=401)
+                response['WWW-Authenticate'] = 'Basic realm="api"'
+                return response
+            if not user.is_staff:
+                logger.error(f"Non-staff user {user.pk} denied access to {request.path}")
+                return HttpResponse('Staff access required', status=403)
+
         paths_to_skip = [
             '/login/',
             '/register/',
@@ -29,7 +59,8 @@ class TenantMiddleware(MiddlewareMixin):
             '/verifyTenant/',
             '/change-password/',
             '/password_reset/',
-            '/reset/'
+            '/reset/',
+            '/metrics/',
         ]
         
         # Check if the request path starts with any of the paths to skip
@@ -44,47 +75,46 @@ class TenantMiddleware(MiddlewareMixin):
         if not tenant_id:
             logger.error("No Tenant ID found in headers")
             return HttpResponse('No Tenant ID provided', status=400)
-        print("current tenant " , TenantMiddleware.current_tenant_id)
-        if TenantMiddleware.current_tenant_id == tenant_id:
-            logger.debug(f"Tenant ID {tenant_id} already connected. Skipping reconnection.")
-            return
 
-        # Retrieve tenant's username and password from database
-        try:
-            tenant = Tenant.objects.get(id=tenant_id)  # Use the 'id' field for tenant_id
-            print("tenant: " ,tenant)
-            tenant_username = tenant.db_user
-            print("username: " ,tenant_username)
-            tenant_password = tenant.db_user_password
-            print("pw: " ,tenant_password)
-            logger.debug(f"Tenant found: {tenant}")
-        except Tenant.DoesNotExist:
+        # Retrieve tenant's username and password, served from the tenant cache
+        tenant = get_cached_tenant(tenant_id)
+        if tenant is None:
             # Handle case where tenant does not exist
             logger.error(f"Tenant does not exist for Tenant ID: {tenant_id}")
             print("tenant doesnt exist: ", tenant_id)
             return HttpResponse('Tenant does not exist', status=404)
-        
+        tenant_username = tenant.db_user
+        tenant_password = tenant.db_user_password
+        logger.debug(f"Tenant found: {tenant}")
+        # Views read the resolved tenant from here instead of querying it again
+        request.tenant = tenant
+
+        # Borrow a connection logged in as the tenant's role for the rest of this
+        # request, other tenants' pooled connections stay open.
+        tenant_db = ExitStack()
         try:
-            # Set the database connection settings for the tenant
-            connection = connections['default']
-            connection.settings_dict['USER'] = tenant_username
-            connection.settings_dict['PASSWORD'] = tenant_password
-            logger.debug(f"Set database user to: {tenant_username}")
-
-            # Ensure the connection is re-established
-            connection.close()
-            connection.connect()
-            logger.debug("Database connection re-established")
-
+            tenant_db.enter_context(tenant_connection(tenant_id, tenant_username, tenant_password))
+            logger.debug(f"Using pooled database connection for user: {tenant_username}")
+        except PoolExhausted as e:
+            logger.error(str(e))
+            return HttpResponse('Too many concurrent requests for tenant', status=503)
         except DatabaseError as e:
             logger.error(f"Database error occurred: {e}")
-            # Handle database-related errors here
-        except Exception as e:
-            logger.error(f"An unexpected error occurred at tenant iddleware: {e}")
-            # Handle any other unexpected errors here
-
-        # Update the current tenant ID
-        TenantMiddleware.current_tenant_id = tenant_id
+            return HttpResponse('Database connection error', status=503)
+        request._tenant_db = tenant_db
+        # LLM requests made while handling this request count against the tenant's limit
+        request._llm_tenant = current_tenant.set(tenant_id)
+
+    def process_response(self, request, response):
+        tenant_db = getattr(request, '_tenant_db', None)
+        if tenant_db is not None:
+            request._tenant_db = None
+            tenant_db.close()
+        llm_tenant = getattr(request, '_llm_tenant', None)
+        if llm_tenant is not None:
+            request._llm_tenant = None
+            current_tenant.reset(llm_tenant)
+        return response
 
 
 class LogRequestTimeMiddleware:
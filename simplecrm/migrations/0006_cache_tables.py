@@ -0,0 +1,39 @@
+# Generated by Django 4.1 on 2026-10-18 18:40
+
+from django.db import migrations
+
+# Tables of helpers.embedding_cache and helpers.answer_cache, read and written with raw SQL through the admin pool.
+# IF NOT EXISTS: deployments that ran the caches before this migration already have them.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simplecrm', '0005_columnmapping'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    model TEXT NOT NULL,
+                    content_hash CHAR(64) NOT NULL,
+                    embedding REAL[] NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (model, content_hash)
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS embedding_cache",
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS answer_cache (
+                    cache_key CHAR(64) PRIMARY KEY,
+                    payload JSONB NOT NULL,
+                    compute_seconds REAL NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS answer_cache",
+        ),
+    ]
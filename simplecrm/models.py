@@ -30,3 +30,23 @@ class CustomUser(AbstractUser):
         return self.username
     
 
+
+
+class ColumnMapping(models.Model):
+    """
+    Cached spreadsheet header -> table column mapping of an upload, so the
+    same header set is never sent to the LLM twice.
+    """
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True)
+    table_name = models.CharField(max_length=255)
+    header_signature = models.CharField(max_length=64)
+    mapping = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('tenant', 'table_name', 'header_signature')
+
+    def __str__(self):
+        return f"{self.table_name} ({self.header_signature[:8]})"
@@ -179,6 +179,143 @@ DATABASES = {
     }
 }
 
+# Per-tenant connection pools used by simplecrm.middleware.TenantMiddleware
+TENANT_DB_POOL = {
+    'MAX_SIZE': 10,
+    'MAX_IDLE': 300,
+    'CHECKOUT_TIMEOUT': 10,
+}
+
+# Tenant rows resolved by TenantMiddleware are cached in-process (seconds / entries)
+TENANT_CACHE_TTL = 300
+TENANT_CACHE_MAX_SIZE = 1024
+
+# Per-tenant stage dictionaries (stage.cache)
+STAGE_CACHE_TTL = 300
+STAGE_CACHE_MAX_TENANTS = 1024
+
+# Shared psycopg2 pool behind helpers.tables.get_db_connection
+HELPERS_DB_POOL = {
+    'MIN_SIZE': 2,
+    'MAX_SIZE': 20,
+    'MAX_IDLE': 300,
+    'CHECKOUT_TIMEOUT': 30,
+    'STALE_AFTER': 60,
+}
+
+# Batched embedding requests (helpers.embeddings)
+EMBEDDINGS = {
+    'BATCH_SIZE': 100,
+    'MAX_CONCURRENCY': 4,
+    'MAX_RETRIES': 5,
+}
+
+# Embeddings keyed by (model, sha256 of normalized text), LRU in front of a Postgres table
+EMBEDDING_CACHE = {
+    'MEMORY_ENTRIES': 5000,
+}
+
+# Vector index lifecycle (helpers.vector_index, manage.py maintain_vector_indexes)
+VECTOR_INDEX = {
+    'METHOD': 'ivfflat',
+    'MIN_ROWS': 10000,
+    'REBUILD_GROWTH': 2.0,
+    'TABLES': ['text_embeddings', 'text_embeddings_anky'],
+}
+
+# Embedding model each vector table starts with, switched later with `manage.py backfill_embeddings`
+VECTOR_TABLES = {
+    'text_embeddings': {'model': 'text-embedding-3-small', 'text_column': 'chunk'},
+    'text_embeddings_anky': {'model': 'text-embedding-ada-002', 'text_column': 'document'},
+}
+
+# Deserialized FAISS indexes kept resident per process (helpers.faiss_registry)
+FAISS_REGISTRY = {
+    'MAX_BYTES': 512 * 1024 * 1024,
+    'VERSION_CHECK_INTERVAL': 5,
+}
+
+# Shared OpenAI chat gateway (helpers.llm), BASE_URL points it at a local stub server in tests
+LLM = {
+    'MODEL': 'gpt-4o-mini',
+    'TIMEOUT': 60.0,
+    'TENANT_CONCURRENCY': 4,
+    'MAX_RETRIES': 3,
+}
+
+# Per-tenant daily metrics read by the dashboards (analytics.rollup), kept current by model signals
+# and the rollup_metrics command
+ROLLUP = {
+    'FLUSH_DELAY': 2,
+}
+
+# Per-tenant report snapshots stored by the generate_reports / backfill_reports commands (leads.reports)
+DAILY_REPORTS = {
+    'WORKERS': 4,
+    'BATCH_SIZE': 50,
+}
+
+# Per-tenant RFM analysis of /opportunity/rfm/ (opportunities.utils), accounts re-read when their opportunities change
+RFM = {
+    'TTL': 900,
+    'TENANTS': 256,
+}
+
+# Row reports of /report/<id>/?stream=ndjson|json (helpers.report_stream)
+REPORT_STREAM = {
+    'CHUNK_SIZE': 2000,
+    'MAX_LIMIT': 100000,
+}
+
+# Limits for running generated SQL of /execute-query/ (analytics.sql_sandbox)
+SQL_SANDBOX = {
+    'STATEMENT_TIMEOUT_MS': 5000,
+    'MAX_COST': 1000000,
+    'MAX_ROWS': 5000,
+}
+
+# Table descriptions in the NL->SQL prompts, built from the models and each tenant's dynamic entities (analytics.schema_context)
+SCHEMA_CONTEXT = {
+    'CHECK_INTERVAL': 60,
+}
+
+# Generated SQL of /execute-query/ prompts, per tenant (analytics.plan_cache)
+PLAN_CACHE = {
+    'PLAN_TTL': 7 * 24 * 60 * 60,
+    'RESULT_TTL': 30,
+}
+
+# WhatsApp query retrieval: vector + full-text search fused by rank (helpers.hybrid_search)
+HYBRID_SEARCH = {
+    'CANDIDATES': 20,
+    'RRF_K': 60,
+}
+
+# Cached chunks and answers of WhatsApp queries (helpers.answer_cache)
+ANSWER_CACHE = {
+    'TTL': 24 * 60 * 60,
+    'MEMORY_ENTRIES': 2000,
+}
+
+# Default search width of pgvector queries (helpers.vector_search), requests may override it
+VECTOR_SEARCH = {
+    'EF_SEARCH': 40,
+    'PROBES': 10,
+}
+
+# FAISS indexes are stored as append-only segments, small ones are merged in the background
+FAISS_SEGMENTS = {
+    'SMALL_SEGMENT_BYTES': 8 * 1024 * 1024,
+    'COMPACT_MIN_SEGMENTS': 8,
+}
+
+# FAISS segments this big are memory-mapped read-only from DIR instead of loaded per worker
+FAISS_MMAP = {
+    'ENABLED': True,
+    'MIN_BYTES': 64 * 1024 * 1024,
+    'DIR': os.path.join(BASE_DIR, 'faiss_segments'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.utils import load_backend
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+logger = logging.getLogger(__name__)
+
+POOL_SETTINGS = {
+    'MAX_SIZE': 10,         # connections per (tenant, db role)
+    'MAX_IDLE': 300,        # seconds an idle connection is kept before eviction
+    'CHECKOUT_TIMEOUT': 10, # seconds to wait for a free connection when the pool is full
+}
+POOL_SETTINGS.update(getattr(settings, 'TENANT_DB_POOL', {}))
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class TenantConnectionPool:
+    """
+    Pool of Django database wrappers logged in as one tenant's database role.
+
+    Connections are created lazily up to MAX_SIZE, handed out one borrower at a
+    time, health checked on borrow and closed after MAX_IDLE seconds unused.
+    """
+
+    def __init__(self, tenant_id, db_user, db_password):
+        self.tenant_id = tenant_id
+        self.db_user = db_user
+        self.max_size = POOL_SETTINGS['MAX_SIZE']
+        self.max_idle = POOL_SETTINGS['MAX_IDLE']
+        self.timeout = POOL_SETTINGS['CHECKOUT_TIMEOUT']
+
+        self.settings_dict = dict(settings.DATABASES[DEFAULT_DB_ALIAS])
+        self.settings_dict['USER'] = db_user
+        self.settings_dict['PASSWORD'] = db_password
+        # The pool owns the connection lifetime, Django must not close it at request end.
+        self.settings_dict['CONN_MAX_AGE'] = None
+
+        self._idle = []  # list of (wrapper, last_used)
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def _new_wrapper(self):
+        backend = load_backend(self.settings_dict['ENGINE'])
+        return backend.DatabaseWrapper(dict(self.settings_dict), DEFAULT_DB_ALIAS)
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        keep = []
+        for wrapper, last_used in self._idle:
+            if now - last_used > self.max_idle:
+                self._close(wrapper)
+            else:
+                keep.append((wrapper, last_used))
+        self._idle = keep
+
+    @staticmethod
+    def _close(wrapper):
+        try:
+            wrapper.close()
+        except Exception as e:
+            logger.warning(f"Error closing pooled connection: {e}")
+
+    @staticmethod
+    def _is_healthy(wrapper):
+        if wrapper.connection is None:
+            return True  # not connected yet, Django connects on first cursor
+        return wrapper.is_usable()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._evict_idle()
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhausted(f"No free database connection for tenant {self.tenant_id}")
+                self._cond.wait(remaining)
+            self._in_use += 1
+            wrapper = self._idle.pop()[0] if self._idle else None
+
+        try:
+            if wrapper is not None and not self._is_healthy(wrapper):
+                logger.debug(f"Discarding unusable connection for tenant {self.tenant_id}")
+                self._close(wrapper)
+                wrapper = None
+            if wrapper is None:
+                wrapper = self._new_wrapper()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        # The wrapper may have been created on another thread.
+        wrapper.inc_thread_sharing()
+        return wrapper
+
+    def release(self, wrapper):
+        wrapper.dec_thread_sharing()
+        reusable = True
+        try:
+            if wrapper.connection is not None:
+                if wrapper.in_atomic_block or wrapper.needs_rollback:
+                    reusable = False
+                elif wrapper.connection.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    # A raw BEGIN was left open by a view.
+                    wrapper.connection.rollback()
+                if wrapper.errors_occurred and not wrapper.is_usable():
+                    reusable = False
+        except Exception:
+            reusable = False
+
+        if not reusable:
+            self._close(wrapper)
+
+        with self._cond:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append((wrapper, time.monotonic()))
+            self._evict_idle()
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            for wrapper, _ in self._idle:
+                self._close(wrapper)
+            self._idle = []
+
+    def stats(self):
+        with self._cond:
+            return {'tenant_id': self.tenant_id,
+                    'in_use': self._in_use, 'idle': len(self._idle), 'max_size': self.max_size}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(tenant_id, db_user, db_password):
+    key = (tenant_id, db_user)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.settings_dict['PASSWORD'] != db_password:
+            # Credentials rotated, drop connections logged in with the old password.
+            pool.close_all()
+            pool = None
+        if pool is None:
+            pool = TenantConnectionPool(tenant_id, db_user, db_password)
+            _pools[key] = pool
+        return pool
+
+
+def close_tenant_pools(tenant_id):
+    with _pools_lock:
+        for key in [key for key in _pools if key[0] == tenant_id]:
+            _pools.pop(key).close_all()
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+@contextmanager
+def tenant_connection(tenant_id, db_user, db_password):
+    """
+    Route connections['default'] (and django.db.connection) to a pooled
+    connection of the tenant for the current thread / async context.
+    """
+    pool = get_pool(tenant_id, db_user, db_password)
+    wrapper = pool.acquire()
+    previous = connections[DEFAULT_DB_ALIAS]
+    connections[DEFAULT_DB_ALIAS] = wrapper
+    try:
+        yield wrapper
+    finally:
+        connections[DEFAULT_DB_ALIAS] = previous
+        pool.release(wrapper)
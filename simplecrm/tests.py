@@ -0,0 +1,408 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import openai
+import psycopg2
+from django.test import SimpleTestCase
+
+from helpers import llm
+from helpers.db_pool import PooledConnection
+from helpers.embeddings import BatchEmbedder
+
+
+def completion(text):
+    return {
+        'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': 0, 'model': 'stub',
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': 3, 'completion_tokens': 2, 'total_tokens': 5},
+    }
+
+
+def completion_chunks(pieces):
+    chunk = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'stub'}
+    chunks = [
+        dict(chunk, choices=[{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}])
+        for piece in pieces
+    ]
+    chunks.append(dict(chunk, choices=[], usage={'prompt_tokens': 3, 'completion_tokens': len(pieces),
+                                                 'total_tokens': 3 + len(pieces)}))
+    return chunks
+
+
+def embeddings(body, vector):
+    """Embeddings response for body's inputs, vector(text) per input, listed last to first."""
+    data = [{'object': 'embedding', 'index': i, 'embedding': vector(text)} for i, text in enumerate(body['input'])]
+    return {'object': 'list', 'model': body['model'], 'data': data[::-1],
+            'usage': {'prompt_tokens': len(data), 'total_tokens': len(data)}}
+
+
+def number_vector(text):
+    return [float(text.split()[-1])]
+
+
+def last_message(body):
+    return body['messages'][-1]['content']
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:
+            server.requests.append((self.path, body))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            status, headers, payload = server.respond(self.path, body)
+            time.sleep(server.delay(body))
+        finally:
+            with server.lock:
+                server.active -= 1
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if isinstance(payload, list):
+            # Streamed completion: server-sent events, one chunk each
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for chunk in payload:
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+        else:
+            data = json.dumps(payload).encode()
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    OpenAI-compatible server on localhost. respond(path, body) returns
+    (status, headers, payload), payload being a list of chunks to stream;
+    delay(body) is how long a request is held before the answer.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = []
+        self.active = self.max_active = 0
+        self.respond = lambda path, body: (200, {}, completion(last_message(body)))
+        self.delay = lambda body: 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubServerTestCase(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.reset()
+        patcher = mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class LLMGatewayTests(StubServerTestCase):
+
+    def gateway(self, **kwargs):
+        return llm.LLMGateway(base_url=self.server.base_url, **kwargs)
+
+    def test_chat(self):
+        gateway = self.gateway()
+        self.assertEqual(gateway.chat([{'role': 'user', 'content': 'hello'}], tenant_id=1), 'hello')
+        stats = gateway.stats()['models'][llm.LLM_SETTINGS['MODEL']]
+        self.assertEqual((stats['requests'], stats['prompt_tokens'], stats['completion_tokens']), (1, 3, 2))
+
+    def test_rate_limit_retried_after_retry_after(self):
+        answers = iter([
+            (429, {'Retry-After': '0.2'}, {'error': {'message': 'slow down', 'type': 'rate_limit'}}),
+            (200, {}, completion('done')),
+        ])
+        self.server.respond = lambda path, body: next(answers)
+        gateway = self.gateway(max_retries=2)
+
+        started = time.monotonic()
+        # Retry-After is used as is, without the jittered backoff
+        with mock.patch('helpers.llm.random.uniform', side_effect=AssertionError("jittered backoff used")):
+            answer = gateway.chat([{'role': 'user', 'content': 'hi'}], tenant_id=1)
+        self.assertEqual(answer, 'done')
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(gateway.stats()['models'][llm.LLM_SETTINGS['MODEL']]['retries'], 1)
+
+    def test_server_errors_retried_with_backoff(self):
+        answers = iter([(500, {}, {'error': {'message': 'boom'}})] * 2 + [(200, {}, completion('done'))])
+        self.server.respond = lambda path, body: next(answers)
+        with mock.patch('helpers.llm.random.uniform', return_value=0) as uniform:
+            answer = self.gateway(max_retries=3).chat([{'role': 'user', 'content': 'hi'}], tenant_id=1)
+        self.assertEqual(answer, 'done')
+        self.assertEqual(uniform.call_count, 2)
+
+    def test_retries_exhausted(self):
+        self.server.respond = lambda path, body: (429, {'Retry-After': '0'}, {'error': {'message': 'slow down'}})
+        gateway = self.gateway(max_retries=2)
+        with self.assertRaises(openai.RateLimitError):
+            gateway.chat([{'role': 'user', 'content': 'hi'}], tenant_id=1)
+        self.assertEqual(len(self.server.requests), 3)
+        stats = gateway.stats()['models'][llm.LLM_SETTINGS['MODEL']]
+        self.assertEqual((stats['retries'], stats['failures']), (2, 1))
+
+    def test_client_errors_not_retried(self):
+        self.server.respond = lambda path, body: (400, {}, {'error': {'message': 'bad request'}})
+        with self.assertRaises(openai.BadRequestError):
+            self.gateway(max_retries=3).chat([{'role': 'user', 'content': 'hi'}], tenant_id=1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_tenant_slot_limit(self):
+        self.server.delay = lambda body: 0.2
+        gateway = self.gateway(tenant_concurrency=2)
+        threads = [
+            threading.Thread(target=gateway.chat, args=([{'role': 'user', 'content': str(i)}],), kwargs={'tenant_id': 1})
+            for i in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertEqual(self.server.max_active, 2)
+
+    def test_tenants_do_not_share_slots(self):
+        self.server.delay = lambda body: 0.2
+        gateway = self.gateway(tenant_concurrency=1)
+        threads = [
+            threading.Thread(target=gateway.chat, args=([{'role': 'user', 'content': 'hi'}],), kwargs={'tenant_id': i})
+            for i in (1, 2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.server.max_active, 2)
+
+    def test_tenant_busy(self):
+        gateway = self.gateway(tenant_concurrency=1)
+        with mock.patch.dict(llm.LLM_SETTINGS, {'TENANT_WAIT': 0.05}), gateway._tenant_slot(1):
+            with self.assertRaises(llm.TenantBusy):
+                gateway.chat([{'role': 'user', 'content': 'hi'}], tenant_id=1)
+            [answer] = gateway.chat_many([[{'role': 'user', 'content': 'hi'}]], tenant_id=1)
+            self.assertIsInstance(answer, llm.TenantBusy)
+        self.assertEqual(self.server.requests, [])
+
+    def test_tenant_from_context(self):
+        self.server.delay = lambda body: 0.2
+        gateway = self.gateway(tenant_concurrency=1)
+        token = llm.current_tenant.set(5)
+        try:
+            context = contextvars.copy_context()
+            thread = threading.Thread(target=context.run, args=(gateway.chat, [{'role': 'user', 'content': 'hi'}]))
+            thread.start()
+            time.sleep(0.1)
+            self.assertEqual(gateway.stats()['in_flight'], {'5': 1})
+            thread.join()
+        finally:
+            llm.current_tenant.reset(token)
+
+    def test_chat_many_keeps_order(self):
+        # Later requests are answered first
+        self.server.delay = lambda body: (5 - int(last_message(body))) * 0.05
+        answers = self.gateway().chat_many([[{'role': 'user', 'content': str(i)}] for i in range(5)], tenant_id=1)
+        self.assertEqual(answers, ['0', '1', '2', '3', '4'])
+
+    def test_chat_many_limited_per_tenant(self):
+        self.server.delay = lambda body: 0.1
+        answers = self.gateway(tenant_concurrency=2).chat_many(
+            [[{'role': 'user', 'content': str(i)}] for i in range(6)], tenant_id=1
+        )
+        self.assertEqual(answers, [str(i) for i in range(6)])
+        self.assertEqual(self.server.max_active, 2)
+
+    def test_chat_many_returns_failures_in_place(self):
+        self.server.respond = lambda path, body: (
+            (400, {}, {'error': {'message': 'bad'}}) if last_message(body) == 'bad'
+            else (200, {}, completion(last_message(body)))
+        )
+        answers = self.gateway().chat_many(
+            [[{'role': 'user', 'content': content}] for content in ('a', 'bad', 'c')], tenant_id=1
+        )
+        self.assertEqual((answers[0], answers[2]), ('a', 'c'))
+        self.assertIsInstance(answers[1], openai.BadRequestError)
+
+    def test_stream_chat(self):
+        self.server.respond = lambda path, body: (200, {}, completion_chunks(['Hel', 'lo']))
+        gateway = self.gateway()
+        self.assertEqual(list(gateway.stream_chat([{'role': 'user', 'content': 'hi'}], tenant_id=1)), ['Hel', 'lo'])
+        self.assertTrue(self.server.requests[0][1]['stream'])
+        stats = gateway.stats()['models'][llm.LLM_SETTINGS['MODEL']]
+        self.assertEqual((stats['streams'], stats['completion_tokens']), (1, 2))
+        self.assertEqual(gateway.stats()['in_flight'], {})
+
+
+class SSEResponseTests(StubServerTestCase):
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_framing(self):
+        response = llm.sse_response(iter(['Hel', 'lo\n']))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(
+            self.content(response),
+            'data: {"delta": "Hel"}\n\n'
+            'data: {"delta": "lo\\n"}\n\n'
+            'event: done\ndata: {"text": "Hello\\n"}\n\n',
+        )
+
+    def test_error_event(self):
+        def pieces():
+            yield 'Hel'
+            raise RuntimeError('upstream closed')
+
+        self.assertEqual(
+            self.content(llm.sse_response(pieces())),
+            'data: {"delta": "Hel"}\n\n'
+            'event: error\ndata: {"message": "upstream closed"}\n\n',
+        )
+
+    def test_streamed_chat(self):
+        self.server.respond = lambda path, body: (200, {}, completion_chunks(['a', 'b', 'c']))
+        gateway = llm.LLMGateway(base_url=self.server.base_url)
+        events = self.content(llm.sse_response(gateway.stream_chat([{'role': 'user', 'content': 'hi'}], tenant_id=1)))
+        self.assertEqual(events.split('\n\n')[:-1], [
+            'data: {"delta": "a"}', 'data: {"delta": "b"}', 'data: {"delta": "c"}',
+            'event: done\ndata: {"text": "abc"}',
+        ])
+
+
+class MemoryEmbeddingCache:
+
+    def __init__(self):
+        self.vectors = {}
+
+    def get_many(self, model, hashes):
+        return {digest: self.vectors[(model, digest)] for digest in hashes if (model, digest) in self.vectors}
+
+    def set_many(self, model, items):
+        self.vectors.update({(model, digest): vector for digest, vector in items.items()})
+
+
+class BatchEmbedderTests(StubServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.respond = lambda path, body: (200, {}, embeddings(body, number_vector))
+
+    def embedder(self, **kwargs):
+        client = openai.OpenAI(api_key='test', base_url=self.server.base_url, max_retries=0)
+        kwargs.setdefault('cache', MemoryEmbeddingCache())
+        return BatchEmbedder(client=client, model='stub-embedding', **kwargs)
+
+    def test_batches_limited_to_batch_size(self):
+        texts = [f"text {i}" for i in range(7)]
+        vectors = self.embedder(batch_size=3, max_concurrency=1).embed(texts)
+        self.assertEqual(vectors, [[float(i)] for i in range(7)])
+        self.assertEqual([len(body['input']) for path, body in self.server.requests], [3, 3, 1])
+        self.assertTrue(all(path.endswith('/embeddings') for path, body in self.server.requests))
+
+    def test_order_kept_across_concurrent_batches(self):
+        # Earlier batches are answered last
+        self.server.delay = lambda body: 0.3 - 0.1 * (int(body['input'][0].split()[-1]) // 2)
+        texts = [f"text {i}" for i in range(6)]
+        vectors = self.embedder(batch_size=2, max_concurrency=3).embed(texts)
+        self.assertEqual(vectors, [[float(i)] for i in range(6)])
+        self.assertEqual(self.server.max_active, 3)
+
+    def test_rate_limit_retried(self):
+        answers = iter([(429, {'Retry-After': '0'}, {'error': {'message': 'slow down'}})])
+        self.server.respond = lambda path, body: next(answers, (200, {}, embeddings(body, number_vector)))
+        embedder = self.embedder(batch_size=2, max_concurrency=1, max_retries=2)
+        self.assertEqual(embedder.embed(["text 1", "text 2", "text 3"]), [[1.0], [2.0], [3.0]])
+        self.assertEqual((embedder.requests, embedder.retries), (3, 1))
+
+    def test_retries_exhausted(self):
+        self.server.respond = lambda path, body: (500, {}, {'error': {'message': 'boom'}})
+        embedder = self.embedder(max_retries=1, backoff_base=0)
+        with self.assertRaises(openai.InternalServerError):
+            embedder.embed(["text 1"])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_text_sent_as_given(self):
+        text = "  Hello\u00a0  world 1 "
+        self.embedder().embed([text])
+        self.assertEqual(self.server.requests[0][1]['input'], [text])
+
+    def test_cache_keyed_by_normalized_text(self):
+        embedder = self.embedder()
+        vectors, report = embedder.embed_with_report(["text 1", " text  1", "text 2"])
+        self.assertEqual(vectors, [[1.0], [1.0], [2.0]])
+        self.assertEqual(self.server.requests[0][1]['input'], ["text 1", "text 2"])
+        self.assertEqual((report['unique_chunks'], report['embedded']), (2, 2))
+
+        vectors, report = embedder.embed_with_report(["text 2", "text 3"])
+        self.assertEqual(vectors, [[2.0], [3.0]])
+        self.assertEqual(self.server.requests[1][1]['input'], ["text 3"])
+        self.assertEqual(report['cache_hits'], 1)
+
+
+class PooledConnectionTests(SimpleTestCase):
+
+    def setUp(self):
+        self.pool = mock.Mock()
+        self.raw = mock.Mock(closed=0)
+        self.conn = PooledConnection(self.pool, self.raw)
+
+    def test_block_commits_and_returns_connection(self):
+        with self.conn as conn:
+            conn.autocommit = False
+        self.raw.commit.assert_called_once_with()
+        self.pool.putconn.assert_called_once_with(self.raw)
+
+    def test_block_rolls_back_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.conn:
+                raise ValueError
+        self.raw.rollback.assert_called_once_with()
+        self.raw.commit.assert_not_called()
+        self.pool.putconn.assert_called_once_with(self.raw)
+
+    def test_use_after_release(self):
+        with self.conn:
+            pass
+        self.assertEqual(self.conn.closed, 1)
+        with self.assertRaisesMessage(psycopg2.InterfaceError, "connection already returned to the pool"):
+            self.conn.cursor()
+        with self.assertRaises(psycopg2.InterfaceError):
+            self.conn.autocommit = True
+        self.conn.close()
+        self.pool.putconn.assert_called_once_with(self.raw)
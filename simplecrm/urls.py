@@ -146,6 +146,7 @@ urlpatterns = [
     path('lead/<int:lead_id>/stage/', lviews.lead_stage, name='lead_stage'), 
     path('lead/stage/', lviews.all_stages, name='all_lead_stage'), 
     path('opportunity/stage/', oviews.all_stages, name='all_opportunity_stage'), 
+    path('opportunity/rfm/', oviews.rfm_analysis, name='opportunity_rfm'),
     path('generate-report/', lviews.generate_and_get_report_view, name='generate_report'),#report
     path('retrieve-reports/', lviews.retrieve_all_reports_view, name='retrieve_reports'),
     path('today/', lviews.retrieve_today_report_view, name='retrieve_today_report'),
@@ -224,5 +225,12 @@ urlpatterns = [
     path('whatsapp-media-uploads/', vectorize.handle_media_uploads , name="return_json_object"),
     
     path('verifyTenant/', tenview.verify_tenant, name='verify-tenant'),
+    path('metrics/tenant-cache/', tenview.tenant_cache_stats, name='tenant-cache-stats'),
+    path('metrics/db-pool/', simviews.db_pool_stats, name='db-pool-stats'),
+    path('metrics/faiss-registry/', simviews.faiss_registry_stats, name='faiss-registry-stats'),
+    path('metrics/answer-cache/', simviews.answer_cache_stats, name='answer-cache-stats'),
+    path('metrics/llm/', simviews.llm_stats, name='llm-stats'),
+    path('metrics/plan-cache/', simviews.plan_cache_stats, name='plan-cache-stats'),
+    path('metrics/sql-sandbox/', simviews.sql_sandbox_stats, name='sql-sandbox-stats'),
 ]
 urlpatterns += router.urls
\ No newline at end of file
@@ -67,3 +67,70 @@ def fetch_all_emails(request):
     ]
     
     return Response(email_list, status=status.HTTP_200_OK)
+
+
+def db_pool_stats(request):
+    """
+    Checkout counters and wait times of the shared psycopg2 pool used by helpers.
+    """
+    from helpers.db_pool import pool_stats
+
+    if request.method == 'GET':
+        return JsonResponse({'db_pool': pool_stats()})
+    return JsonResponse({'msg': 'Method not allowed'}, status=405)
+
+
+def faiss_registry_stats(request):
+    """
+    Resident FAISS indexes, memory use and hit/load/eviction counters of the registry.
+    """
+    from helpers.faiss_registry import faiss_registry
+
+    if request.method == 'GET':
+        return JsonResponse({'faiss_registry': faiss_registry.stats()})
+    return JsonResponse({'msg': 'Method not allowed'}, status=405)
+
+
+def answer_cache_stats(request):
+    """
+    Hit ratios and time saved by the WhatsApp query answer cache of this process.
+    """
+    from helpers.answer_cache import answer_cache
+
+    if request.method == 'GET':
+        return JsonResponse({'answer_cache': answer_cache.stats()})
+    return JsonResponse({'msg': 'Method not allowed'}, status=405)
+
+
+def llm_stats(request):
+    """
+    Token usage, latency, retries and in-flight requests per tenant of the LLM gateway in this process.
+    """
+    from helpers.llm import get_gateway
+
+    if request.method == 'GET':
+        return JsonResponse({'llm': get_gateway().stats()})
+    return JsonResponse({'msg': 'Method not allowed'}, status=405)
+
+
+def plan_cache_stats(request):
+    """
+    Hit ratios of the NL->SQL plan cache and result sets held by this process.
+    """
+    from analytics.plan_cache import plan_cache
+
+    if request.method == 'GET':
+        return JsonResponse({'plan_cache': plan_cache.stats()})
+    return JsonResponse({'msg': 'Method not allowed'}, status=405)
+
+
+def sql_sandbox_stats(request):
+    """
+    Outcomes and average runtime of generated SQL run by this process;
+    plans of every query are in the sql_query_log table.
+    """
+    from analytics.sql_sandbox import sql_sandbox
+
+    if request.method == 'GET':
+        return JsonResponse({'sql_sandbox': sql_sandbox.stats()})
+    return JsonResponse({'msg': 'Method not allowed'}, status=405)
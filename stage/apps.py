@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StageConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stage'
+
+    def ready(self):
+        from . import signals  # noqa: F401
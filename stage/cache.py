@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import Stage
+
+STAGE_CACHE_TTL = getattr(settings, 'STAGE_CACHE_TTL', 300)
+STAGE_CACHE_MAX_TENANTS = getattr(settings, 'STAGE_CACHE_MAX_TENANTS', 1024)
+
+_entries = OrderedDict()  # tenant_id -> (stages, expires_at)
+_lock = threading.Lock()
+
+
+def _load_stages(tenant_id):
+    stages = list(Stage.objects.filter(tenant_id=tenant_id).order_by('id').values('id', 'status', 'model_name'))
+    return {
+        'by_id': {stage['id']: stage for stage in stages},
+        'by_model': {
+            model_name: [stage for stage in stages if stage['model_name'] == model_name]
+            for model_name in {stage['model_name'] for stage in stages}
+        },
+    }
+
+
+def _tenant_stages(tenant_id):
+    tenant_id = str(tenant_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(tenant_id)
+        if entry is not None and entry[1] > now:
+            _entries.move_to_end(tenant_id)
+            return entry[0]
+
+    stages = _load_stages(tenant_id)
+    with _lock:
+        _entries[tenant_id] = (stages, now + STAGE_CACHE_TTL)
+        _entries.move_to_end(tenant_id)
+        while len(_entries) > STAGE_CACHE_MAX_TENANTS:
+            _entries.popitem(last=False)
+    return stages
+
+
+def get_stages(tenant_id, model_name):
+    """All stages of a tenant for 'lead' or 'opportunity', ordered by id, as dicts."""
+    return _tenant_stages(tenant_id)['by_model'].get(model_name, [])
+
+
+def get_stage(tenant_id, stage_id):
+    return _tenant_stages(tenant_id)['by_id'].get(stage_id)
+
+
+def invalidate_stages(tenant_id=None):
+    with _lock:
+        if tenant_id is None:
+            _entries.clear()
+        else:
+            _entries.pop(str(tenant_id), None)
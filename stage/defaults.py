@@ -1,4 +1,5 @@
 from .models import Stage
+from .cache import invalidate_stages
 
 DEFAULT_LEAD_STAGES = [
     {'stage': 'assigned'},
@@ -20,22 +21,24 @@ DEFAULT_OPPORTUNITY_STAGES = [
     {'stage': 'CLOSED LOST'}
 ]
 
-def get_or_create_default_stages(tenant, model_name):
-    default_stages = []
-
+def missing_default_stages(model_name, existing_stage_names):
     if model_name == 'lead':
         default_stages = DEFAULT_LEAD_STAGES
     elif model_name == 'opportunity':
         default_stages = DEFAULT_OPPORTUNITY_STAGES
     else:
-        return  # Handle other models if needed
+        return []  # Handle other models if needed
 
+    return [stage['stage'] for stage in default_stages if stage['stage'] not in existing_stage_names]
+
+def get_or_create_default_stages(tenant, model_name):
     stages = Stage.objects.filter(tenant=tenant, model_name=model_name)
     existing_stage_names = set(stages.values_list('status', flat=True))
 
-    for stage in default_stages:
-        if stage['stage'] not in existing_stage_names:
-            Stage.objects.create(status=stage['stage'], model_name=model_name, tenant=tenant)
+    missing = missing_default_stages(model_name, existing_stage_names)
+    if missing:
+        Stage.objects.bulk_create([Stage(status=status, model_name=model_name, tenant=tenant) for status in missing])
+        invalidate_stages(tenant.id)
 
     # Retrieve all stages after creation
     stages = Stage.objects.filter(tenant=tenant, model_name=model_name)
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Stage
+from .cache import invalidate_stages
+
+
+@receiver(post_save, sender=Stage)
+def stage_saved(sender, instance, **kwargs):
+    invalidate_stages(instance.tenant_id)
+
+
+@receiver(post_delete, sender=Stage)
+def stage_deleted(sender, instance, **kwargs):
+    invalidate_stages(instance.tenant_id)
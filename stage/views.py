@@ -7,8 +7,9 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import get_object_or_404
 from .models import Stage
-from tenant.models import Tenant
-from .defaults import get_or_create_default_stages
+from tenant.cache import get_cached_tenant
+from .defaults import get_or_create_default_stages, missing_default_stages
+from .cache import get_stages
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.permissions import AllowAny
 from rest_framework.decorators import permission_classes
@@ -16,14 +17,10 @@ import json
 
 
 def get_tenant_from_headers(request):
-    tenant_id = request.headers.get('X-Tenant-Id')
-    if not tenant_id:
-        return None
-    try:
-        tenant = Tenant.objects.get(id=tenant_id)
+    tenant = getattr(request, 'tenant', None)
+    if tenant is not None:
         return tenant
-    except Tenant.DoesNotExist:
-        return None
+    return get_cached_tenant(request.headers.get('X-Tenant-Id'))
     
 @permission_classes([AllowAny])
 @require_http_methods(["GET"])
@@ -33,13 +30,13 @@ def stage_list(request, model_name):
     if tenant is None:
         return JsonResponse({'error': 'Tenant not found'}, status=400)
 
-    # Retrieve or create default stages if they don't exist
-    get_or_create_default_stages(tenant, model_name)
-
-    # Get all stages for the given model_name and tenant
-    all_stages = Stage.objects.filter(tenant=tenant, model_name=model_name).order_by('id')
+    # Stages come from the per-tenant stage cache, defaults are only created when missing
+    all_stages = get_stages(tenant.id, model_name)
+    if missing_default_stages(model_name, {stage['status'] for stage in all_stages}):
+        get_or_create_default_stages(tenant, model_name)
+        all_stages = get_stages(tenant.id, model_name)
 
-    stages_data = [{'id': stage.id, 'status': stage.status} for stage in all_stages]
+    stages_data = [{'id': stage['id'], 'status': stage['status']} for stage in all_stages]
     return JsonResponse(stages_data, safe=False, status=200)
 
 @csrf_exempt
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TenantConfig(AppConfig):
     name = 'tenant'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import Tenant
+
+TENANT_CACHE_TTL = getattr(settings, 'TENANT_CACHE_TTL', 300)
+TENANT_CACHE_MAX_SIZE = getattr(settings, 'TENANT_CACHE_MAX_SIZE', 1024)
+
+
+class TenantCache:
+    """
+    In-process LRU of Tenant rows keyed by tenant id, entries expire after `ttl` seconds.
+    Every worker keeps its own copy, so the TTL bounds how stale another worker can be.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # tenant_id -> (tenant, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, tenant_id):
+        """Return the Tenant, or None if it does not exist."""
+        tenant_id = str(tenant_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(tenant_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        try:
+            tenant = Tenant.objects.get(id=tenant_id)
+        except Tenant.DoesNotExist:
+            return None
+
+        with self._lock:
+            self._entries[tenant_id] = (tenant, now + self.ttl)
+            self._entries.move_to_end(tenant_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return tenant
+
+    def invalidate(self, tenant_id=None):
+        with self._lock:
+            if tenant_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(tenant_id), None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+tenant_cache = TenantCache(TENANT_CACHE_TTL, TENANT_CACHE_MAX_SIZE)
+
+
+def get_cached_tenant(tenant_id):
+    if not tenant_id:
+        return None
+    return tenant_cache.get(tenant_id)
+
+
+def invalidate_tenant(tenant_id=None):
+    tenant_cache.invalidate(tenant_id)
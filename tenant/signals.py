@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Tenant
+from .cache import invalidate_tenant
+
+
+@receiver(post_save, sender=Tenant)
+def tenant_saved(sender, instance, **kwargs):
+    invalidate_tenant(instance.id)
+
+
+@receiver(post_delete, sender=Tenant)
+def tenant_deleted(sender, instance, **kwargs):
+    from simplecrm.tenant_pool import close_tenant_pools
+
+    invalidate_tenant(instance.id)
+    close_tenant_pools(instance.id)
@@ -2,6 +2,7 @@ import json
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from .models import Tenant
+from .cache import invalidate_tenant, tenant_cache
 from .serializers import TenantSerializer
 from django.db import connection
 from django.contrib.auth import password_validation
@@ -59,6 +60,7 @@ def tenant_list(request):
                 # Commit the transaction
                 cursor.execute("COMMIT")
                 print("end")
+                invalidate_tenant(tenant_id)
                 return JsonResponse({'msg': 'Tenant registered successfully'})
         except IntegrityError as e:
             # Rollback the transaction if any error occurs
@@ -110,3 +112,14 @@ def verify_tenant(request):
             return JsonResponse({'success': False, 'message': str(e)}, status=500)
     else:
         return JsonResponse({'success': False, 'message': 'Invalid request method'}, status=405)
+
+
+def tenant_cache_stats(request):
+    """
+    Hit/miss counters of the tenant cache and usage of the tenant connection pools.
+    """
+    from simplecrm.tenant_pool import pool_stats
+
+    if request.method == 'GET':
+        return JsonResponse({'tenant_cache': tenant_cache.stats(), 'connection_pools': pool_stats()})
+    return JsonResponse({'msg': 'Method not allowed'}, status=405)
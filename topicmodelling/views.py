@@ -1,4 +1,3 @@
-import os
 import re
 import json
 import nltk
@@ -8,14 +7,10 @@ from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from topicmodelling.models import TopicModelling
 from communication.models import Conversation
-from openai import OpenAI
+from helpers import llm
 from django.views.decorators.csrf import csrf_exempt
 from django.db import IntegrityError
 
-# Set up your OpenAI API key
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
-
 # Download necessary NLTK data
 nltk.download('stopwords')
 nltk.download('punkt')
@@ -41,6 +36,7 @@ def perform_topic_modeling(preprocessed_text):
         # Split the text into chunks if it's longer than chunk_size
         text_chunks = [preprocessed_text[i:i + chunk_size] for i in range(0, len(preprocessed_text), chunk_size)]
         
+        topic_prompts = []
         for chunk in text_chunks:
             # Construct the prompt for each chunk
             topic_prompt = f"""Analyze the following WhatsApp messages and extract distinct topics.
@@ -50,16 +46,17 @@ def perform_topic_modeling(preprocessed_text):
 
             Please list the distinct topics as "Topic 1: [topic name]", "Topic 2: [topic name]", and so on. Do not provide any explanations or details, just list the topics in that format.
             If the messages do not contain distinct topics, respond with 'No topics'."""
-            
-            # Call OpenAI API
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": topic_prompt}],
-                max_tokens=100 
-            )
+            topic_prompts.append([{"role": "user", "content": topic_prompt}])
+
+        # Call OpenAI API, all chunks at once
+        responses = llm.chat_many(topic_prompts, model="gpt-4", max_tokens=100)
+
+        for response in responses:
+            if isinstance(response, Exception):
+                raise response
 
             # Log the raw response for debugging
-            raw_response_content = response.choices[0].message.content.strip()
+            raw_response_content = response.strip()
             print(f"Raw Response from OpenAI for chunk: {raw_response_content}")
 
             # Split response by lines and clean up the topics
@@ -81,14 +78,14 @@ def perform_topic_modeling(preprocessed_text):
         Please provide a list of unique categories without including any specific topics or explanations. Format your response as a simple list, one category per line."""
         
         # Call OpenAI API for categorization
-        categorization_response = client.chat.completions.create(
+        categorization_response = llm.chat(
             model="gpt-4",
             messages=[{"role": "user", "content": categorization_prompt}],
             max_tokens=100
         )
 
         # Log the raw response for categorization
-        categorized_response = categorization_response.choices[0].message.content.strip()
+        categorized_response = categorization_response.strip()
         print("Categorized Topics Response:", categorized_response)
 
         # Split the response into categories